@@ -0,0 +1,82 @@
+"""add append-only chat_messages table
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-03-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column(
+        'chat_sessions',
+        sa.Column('message_count', sa.BigInteger(), nullable=False, server_default='0')
+    )
+
+    op.create_table(
+        'chat_messages',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('seq', sa.BigInteger(), nullable=False),
+        sa.Column('instance_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('role', sa.String(16), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('session_id', 'seq'),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ondelete='CASCADE'),
+    )
+    op.create_index(
+        'ix_chat_messages_instance_id_created_at',
+        'chat_messages',
+        ['instance_id', 'created_at']
+    )
+
+    # Move messages out of the array column, numbering them per session
+    op.execute("""
+        INSERT INTO chat_messages (session_id, seq, instance_id, role, content, created_at)
+        SELECT s.id,
+               m.ord,
+               s.instance_id,
+               COALESCE(m.msg->>'role', 'user'),
+               COALESCE(m.msg->>'content', ''),
+               COALESCE((m.msg->>'timestamp')::timestamp, s.created_at)
+        FROM chat_sessions s
+        CROSS JOIN LATERAL unnest(s.messages) WITH ORDINALITY AS m(msg, ord)
+    """)
+    op.execute("""
+        UPDATE chat_sessions
+        SET message_count = COALESCE(cardinality(messages), 0)
+    """)
+
+    # The array column is no longer written; it is kept for rollback
+    op.alter_column('chat_sessions', 'messages', nullable=True)
+
+def downgrade() -> None:
+    op.execute("""
+        UPDATE chat_sessions s
+        SET messages = COALESCE(
+            (
+                SELECT array_agg(
+                    jsonb_build_object(
+                        'role', m.role,
+                        'content', m.content,
+                        'timestamp', m.created_at
+                    )
+                    ORDER BY m.seq
+                )
+                FROM chat_messages m
+                WHERE m.session_id = s.id
+            ),
+            '{}'
+        )
+    """)
+    op.alter_column('chat_sessions', 'messages', nullable=False)
+    op.drop_index('ix_chat_messages_instance_id_created_at')
+    op.drop_table('chat_messages')
+    op.drop_column('chat_sessions', 'message_count')
@@ -0,0 +1,121 @@
+"""partition chat_messages by week
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-03-22 10:00:00.000000
+
+"""
+from alembic import op
+
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+# Weekly partitions created beyond the current week
+PARTITIONS_AHEAD = 4
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_unpartitioned")
+    op.execute(
+        "ALTER TABLE chat_messages_unpartitioned "
+        "RENAME CONSTRAINT chat_messages_pkey TO chat_messages_unpartitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_chat_messages_instance_id_created_at "
+        "RENAME TO ix_chat_messages_unpartitioned_instance_id_created_at"
+    )
+
+    # Unique constraints on a partitioned table must include created_at
+    op.execute("""
+        CREATE TABLE chat_messages (
+            session_id uuid NOT NULL REFERENCES chat_sessions (id) ON DELETE CASCADE,
+            seq bigint NOT NULL,
+            instance_id uuid NOT NULL,
+            role varchar(16) NOT NULL,
+            content text NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            PRIMARY KEY (session_id, seq, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.create_index(
+        'ix_chat_messages_instance_id_created_at',
+        'chat_messages',
+        ['instance_id', 'created_at']
+    )
+
+    # One partition per ISO week, from the oldest message to a few weeks ahead
+    op.execute(f"""
+        DO $$
+        DECLARE
+            week date;
+        BEGIN
+            FOR week IN
+                SELECT generate_series(
+                    date_trunc('week', COALESCE(
+                        (SELECT min(created_at) FROM chat_messages_unpartitioned),
+                        now() AT TIME ZONE 'utc'
+                    )),
+                    date_trunc('week', now() AT TIME ZONE 'utc') + interval '{PARTITIONS_AHEAD} weeks',
+                    interval '1 week'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF chat_messages FOR VALUES FROM (%L) TO (%L)',
+                    'chat_messages_w' || to_char(week, 'YYYYMMDD'),
+                    week,
+                    week + 7
+                );
+            END LOOP;
+        END $$
+    """)
+
+    # Catches rows outside every weekly partition if maintenance falls behind
+    op.execute("CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT")
+
+    op.execute("""
+        INSERT INTO chat_messages (session_id, seq, instance_id, role, content, created_at)
+        SELECT session_id, seq, instance_id, role, content, created_at
+        FROM chat_messages_unpartitioned
+    """)
+    op.drop_table('chat_messages_unpartitioned')
+
+    # Per-instance purge of sessions past their retention
+    op.create_index(
+        'ix_chat_sessions_instance_id_updated_at',
+        'chat_sessions',
+        ['instance_id', 'updated_at']
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_sessions_instance_id_updated_at')
+
+    op.execute("""
+        CREATE TABLE chat_messages_unpartitioned (
+            session_id uuid NOT NULL REFERENCES chat_sessions (id) ON DELETE CASCADE,
+            seq bigint NOT NULL,
+            instance_id uuid NOT NULL,
+            role varchar(16) NOT NULL,
+            content text NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            CONSTRAINT chat_messages_unpartitioned_pkey PRIMARY KEY (session_id, seq)
+        )
+    """)
+    op.execute("""
+        INSERT INTO chat_messages_unpartitioned (session_id, seq, instance_id, role, content, created_at)
+        SELECT session_id, seq, instance_id, role, content, created_at
+        FROM chat_messages
+    """)
+    # Dropping the parent drops its partitions
+    op.drop_table('chat_messages')
+
+    op.execute("ALTER TABLE chat_messages_unpartitioned RENAME TO chat_messages")
+    op.execute(
+        "ALTER TABLE chat_messages "
+        "RENAME CONSTRAINT chat_messages_unpartitioned_pkey TO chat_messages_pkey"
+    )
+    op.create_index(
+        'ix_chat_messages_instance_id_created_at',
+        'chat_messages',
+        ['instance_id', 'created_at']
+    )
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from typing import Optional
+
+from app.core.cache import cache_manager
+from app.core.config import get_settings
+
+settings = get_settings()
+router = APIRouter()
+
+@router.get("/cache/hot-keys")
+async def get_hot_cache_keys(
+    limit: int = Query(20, ge=1, le=settings.CACHE_HOT_KEYS_TOP_K),
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    """Most requested cache keys in this worker, with approximate lookup counts. Requires admin token."""
+    if not admin_token or admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid admin token"
+        )
+    
+    return {
+        "keys": [
+            {"key": key, "count": count}
+            for key, count in cache_manager.hot_keys.top(limit)
+        ]
+    }
@@ -1,30 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Awaitable, Optional, TypeVar
 from uuid import UUID
+import asyncio
+import json
 
-from app.models.chat import ChatRequest, ChatResponse
+from app.models.chat import ChatRequest, ChatResponse, ChatBatchRequest
 from app.services.chat_service import ChatService
+from app.core.config import get_settings
 from app.core.security import verify_api_key
+from app.core.exceptions import GenerationCancelledException, ServiceOverloadedException
 
+settings = get_settings()
 router = APIRouter()
 chat_service = ChatService()
 
+T = TypeVar("T")
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def _cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await work, cancelling it if the client goes away first."""
+    task = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if task.cancelled():
+        # Nobody is left to read the response
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return task.result()
+
 @router.post("/message", response_model=ChatResponse)
 async def process_message(
     request: ChatRequest,
+    http_request: Request,
     api_key: str = Depends(verify_api_key)
 ):
     # If client doesn't provide session_id, it will be None and a new one will be generated
     try:
-        response = await chat_service.process_message(
-            instance_id=request.instance_id,
-            message=request.message,
-            session_id=request.session_id,  # Optional
-            context=request.context
+        response = await _cancel_on_disconnect(
+            http_request,
+            chat_service.handle_message(
+                instance_id=request.instance_id,
+                message=request.message,
+                session_id=request.session_id,  # Optional
+                context=request.context
+            )
         )
         return response
+    except HTTPException:
+        raise
+    except (ServiceOverloadedException, GenerationCancelledException) as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.message,
+            headers=getattr(e, "headers", None)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@router.post("/message/stream")
+async def stream_message(
+    request: ChatRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """Stream the response as Server-Sent Events, one event per token batch"""
+    chunks = chat_service.stream_message(
+        instance_id=request.instance_id,
+        message=request.message,
+        session_id=request.session_id,
+        context=request.context
+    )
+    
+    # Wait for the first chunk before committing to a 200 so that shed
+    # requests still get a proper 503 with Retry-After
+    try:
+        first_chunk = await chunks.__anext__()
+    except (ServiceOverloadedException, GenerationCancelledException) as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.message,
+            headers=getattr(e, "headers", None)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield f"data: {first_chunk.json()}\n\n"
+            async for chunk in chunks:
+                yield f"data: {chunk.json()}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            # Stops the generation if the client disconnected mid-stream
+            await chunks.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.post("/batch")
+async def process_batch(
+    request: ChatBatchRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """Process many messages and stream one NDJSON result line per message.
+
+    Results arrive in completion order; each line carries the index of its
+    message. Batch work runs in the low-priority LLM lane.
+    """
+    if len(request.messages) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.BATCH_MAX_ITEMS} messages"
+        )
+    
+    async def result_stream() -> AsyncIterator[str]:
+        async for result in chat_service.process_batch(
+            request.messages,
+            parallelism=request.parallelism
+        ):
+            yield result.json() + "\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
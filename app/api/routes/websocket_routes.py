@@ -1,12 +1,17 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict
+from typing import Dict, Optional
 from uuid import UUID
 import json
 import asyncio
 
+from pydantic import ValidationError
+
 from app.models.websocket import WebSocketMessage, WebSocketResponse
 from app.services.chat_service import ChatService
 from app.core.security import verify_websocket_token
+from app.core.exceptions import GenerationCancelledException, ServiceOverloadedException
+from app.core.logging import logger
+from app.services.generation_tracker import generation_tracker
 
 router = APIRouter()
 active_connections: Dict[UUID, WebSocket] = {}
@@ -20,43 +25,98 @@ async def websocket_endpoint(
     await websocket.accept()
     active_connections[instance_id] = websocket
     chat_service = ChatService()
+    reply: Optional[asyncio.Task] = None
     
     try:
         while True:
             data = await websocket.receive_text()
-            message = WebSocketMessage.parse_raw(data)
+            try:
+                message = WebSocketMessage.parse_raw(data)
+            except ValidationError as e:
+                await websocket.send_json(
+                    WebSocketResponse(
+                        type="error",
+                        content=str(e)
+                    ).dict()
+                )
+                continue
             
-            # Send typing indicator
-            await websocket.send_json(
-                WebSocketResponse(
-                    type="typing",
-                    content="Assistant is typing..."
-                ).dict()
-            )
+            # A newer message supersedes the reply still being generated
+            if reply is not None:
+                generation_tracker.supersede(reply)
             
-            # Process message
-            response = await chat_service.process_message(
-                instance_id=instance_id,
-                message=message.content,
-                session_id=message.session_id,
-                context=message.metadata
-            )
-            
-            # Send response
-            await websocket.send_json(
-                WebSocketResponse(
-                    type="message",
-                    content=response.response,
-                    metadata={"session_id": str(response.session_id)}
-                ).dict()
+            # Keep reading while replying so disconnects are noticed at once
+            reply = asyncio.create_task(
+                _send_reply(websocket, chat_service, instance_id, message)
             )
+            reply.add_done_callback(_log_reply_error)
             
     except WebSocketDisconnect:
-        del active_connections[instance_id]
+        active_connections.pop(instance_id, None)
+    finally:
+        if reply is not None and not reply.done():
+            reply.cancel()
+
+def _log_reply_error(reply: asyncio.Task) -> None:
+    # Retrieve the exception so a failed reply is logged, not lost
+    if not reply.cancelled() and reply.exception() is not None:
+        logger.error(f"WebSocket reply failed: {str(reply.exception())}")
+
+async def _send_reply(
+    websocket: WebSocket,
+    chat_service: ChatService,
+    instance_id: UUID,
+    message: WebSocketMessage
+) -> None:
+    try:
+        # Send typing indicator
+        await websocket.send_json(
+            WebSocketResponse(
+                type="typing",
+                content="Assistant is typing..."
+            ).dict()
+        )
+        
+        # Stream response tokens as they are generated
+        async for chunk in chat_service.stream_message(
+            instance_id=instance_id,
+            message=message.content,
+            session_id=message.session_id,
+            context=message.metadata
+        ):
+            if chunk.done:
+                # Send complete response
+                await websocket.send_json(
+                    WebSocketResponse(
+                        type="message",
+                        content=chunk.response,
+                        metadata={"session_id": str(chunk.session_id)}
+                    ).dict()
+                )
+            else:
+                await websocket.send_json(
+                    WebSocketResponse(
+                        type="chunk",
+                        content=chunk.delta,
+                        metadata={"session_id": str(chunk.session_id)}
+                    ).dict()
+                )
+    
+    except GenerationCancelledException:
+        # A newer message for the session is being answered instead
+        pass
+    except ServiceOverloadedException as e:
+        await websocket.send_json(
+            WebSocketResponse(
+                type="error",
+                content=e.message,
+                metadata={"retry_after": e.retry_after}
+            ).dict()
+        )
     except Exception as e:
         await websocket.send_json(
             WebSocketResponse(
                 type="error",
                 content=str(e)
             ).dict()
-        ) 
\ No newline at end of file
+        )
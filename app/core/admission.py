@@ -0,0 +1,190 @@
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import asyncio
+
+from app.core.config import get_settings
+from app.core.exceptions import ServiceOverloadedException
+from app.core.metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_SHED_REQUESTS
+
+settings = get_settings()
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(lane: str) -> Iterator[None]:
+    """Run LLM calls made in this block (and tasks spawned from it) in a lane."""
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-limited wait queue.
+
+    Up to ``max_concurrency`` callers run at once. Further callers wait in a
+    FIFO queue of at most ``max_queue`` entries for at most ``queue_timeout``
+    seconds. Anything beyond that is shed immediately with a
+    ServiceOverloadedException so latency stays bounded under overload.
+
+    Callers in the batch lane have their own queue and may hold at most
+    ``batch_max_concurrency`` slots. Freed slots always go to interactive
+    waiters first, so batch work only ever uses spare capacity.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+        batch_max_concurrency: Optional[int] = None,
+        batch_max_queue: Optional[int] = None,
+        batch_queue_timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.batch_max_concurrency = min(
+            batch_max_concurrency or max_concurrency,
+            max_concurrency
+        )
+        self.batch_max_queue = batch_max_queue if batch_max_queue is not None else max_queue
+        self.batch_queue_timeout = batch_queue_timeout or queue_timeout
+        self._in_flight = 0
+        self._batch_in_flight = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {
+            INTERACTIVE: deque(),
+            BATCH: deque()
+        }
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        lane = current_priority()
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    async def acquire(self, lane: Optional[str] = None) -> None:
+        lane = lane or current_priority()
+        if self._has_free_slot(lane) and not self._waiting_ahead(lane):
+            self._take_slot(lane)
+            self._update_gauges()
+            return
+
+        batch = lane == BATCH
+        waiters = self._waiters[lane]
+        if len(waiters) >= (self.batch_max_queue if batch else self.max_queue):
+            self._shed("queue_full", lane)
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(
+                waiter,
+                self.batch_queue_timeout if batch else self.queue_timeout
+            )
+        except asyncio.TimeoutError:
+            self._discard(waiter, lane)
+            self._shed("queue_timeout", lane)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed to us just before we were cancelled
+                self.release(lane)
+            else:
+                self._discard(waiter, lane)
+            raise
+        finally:
+            self._update_gauges()
+
+    def release(self, lane: Optional[str] = None) -> None:
+        lane = lane or current_priority()
+        self._in_flight -= 1
+        if lane == BATCH:
+            self._batch_in_flight -= 1
+
+        # Hand the slot directly to the oldest live waiter, interactive first
+        for waiting_lane in (INTERACTIVE, BATCH):
+            waiters = self._waiters[waiting_lane]
+            while waiters and self._has_free_slot(waiting_lane):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._take_slot(waiting_lane)
+                    waiter.set_result(None)
+                    self._update_gauges()
+                    return
+
+        self._update_gauges()
+
+    def _has_free_slot(self, lane: str) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        return lane != BATCH or self._batch_in_flight < self.batch_max_concurrency
+
+    def _waiting_ahead(self, lane: str) -> bool:
+        # Interactive callers never queue behind batch work
+        if lane == INTERACTIVE:
+            return bool(self._waiters[INTERACTIVE])
+        return bool(self._waiters[INTERACTIVE] or self._waiters[BATCH])
+
+    def _take_slot(self, lane: str) -> None:
+        self._in_flight += 1
+        if lane == BATCH:
+            self._batch_in_flight += 1
+
+    def _discard(self, waiter: asyncio.Future, lane: str) -> None:
+        try:
+            self._waiters[lane].remove(waiter)
+        except ValueError:
+            pass
+
+    def _shed(self, reason: str, lane: str) -> None:
+        LLM_SHED_REQUESTS.labels(backend=self.name, lane=lane, reason=reason).inc()
+        raise ServiceOverloadedException(
+            f"LLM backend {self.name} is overloaded",
+            retry_after=self.retry_after
+        )
+
+    def _update_gauges(self) -> None:
+        LLM_IN_FLIGHT.labels(backend=self.name).set(self._in_flight)
+        for lane, waiters in self._waiters.items():
+            LLM_QUEUE_DEPTH.labels(backend=self.name, lane=lane).set(len(waiters))
+
+_controllers: Dict[str, AdmissionController] = {}
+
+def get_admission_controller(backend: str) -> AdmissionController:
+    """Return the process-wide admission controller for an LLM backend."""
+    if backend not in _controllers:
+        _controllers[backend] = AdmissionController(
+            name=backend,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            max_queue=settings.LLM_MAX_QUEUE,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+            retry_after=settings.LLM_SHED_RETRY_AFTER,
+            batch_max_concurrency=settings.LLM_BATCH_MAX_CONCURRENCY,
+            batch_max_queue=settings.LLM_BATCH_MAX_QUEUE,
+            batch_queue_timeout=settings.LLM_BATCH_QUEUE_TIMEOUT
+        )
+    return _controllers[backend]
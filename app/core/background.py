@@ -0,0 +1,30 @@
+from typing import Coroutine, Set
+import asyncio
+
+from app.core.logging import logger
+
+# Strong references so fire-and-forget tasks are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+def run_in_background(coro: Coroutine, name: str) -> asyncio.Task:
+    """Run a coroutine off the request path, logging any failure."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+def _on_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(
+            f"Background task {task.get_name()} failed: {str(error)}",
+            extra={"error_type": error.__class__.__name__}
+        )
+
+async def cancel_background_tasks() -> None:
+    for task in list(_background_tasks):
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
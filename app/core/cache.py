@@ -1,65 +1,547 @@
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, Dict, List, Sequence, Set, Tuple
+from collections import OrderedDict
 from functools import wraps
+import asyncio
 import json
 import hashlib
+import math
+import random
+import time
 from datetime import timedelta
 
+from redis.exceptions import RedisError
+
+from app.core.admission import BATCH, priority
+from app.core.background import run_in_background
+from app.core.cache_codecs import CacheEntry, EntryCodec
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.hot_keys import HotKeyTracker
+from app.core.metrics import (
+    CACHE_EVICTIONS,
+    CACHE_GETTER_LATENCY,
+    CACHE_REFRESHES,
+    CACHE_REQUESTS,
+    CACHE_VALUE_BYTES
+)
 from app.core.redis import redis_client
+from app.core.singleflight import single_flight
+
+settings = get_settings()
+
+def refresh_due(entry: CacheEntry, beta: float, now: float) -> bool:
+    """XFetch: refresh early with a probability that grows near expiry.
+
+    Values that are slow to compute (large ``delta``) start refreshing
+    sooner; ``beta`` > 1 favours earlier refreshes.
+    """
+    return now - entry.delta * beta * math.log(1.0 - random.random()) >= entry.expires_at
+
+class LocalCache:
+    """Size- and TTL-bounded in-process LRU of serialized values.
+
+    Values are kept as the bytes stored in Redis and decoded on every hit,
+    so callers never share (and mutate) the same object.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, name: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        # key -> (expires_at, serialized value), in LRU order
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS.labels(prefix=self.name, reason="expired").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.labels(prefix=self.name, reason="size").inc()
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
 
 class CacheManager:
-    def __init__(self, default_ttl: int = 300):
+    """Redis-backed cache with an optional in-process L1 tier.
+
+    Keys whose prefix (the part before the first ``:``) has an L1 policy are
+    also kept in a per-prefix LocalCache, so hot keys are served without a
+    network hop. ``invalidate`` deletes keys from Redis and broadcasts them
+    over pub/sub so every worker drops its L1 copy. L1 TTLs are capped at
+    ``l1_max_staleness``, which bounds how long a worker that missed an
+    invalidation can serve a stale value.
+
+    Stampedes on expiry are prevented per call: ``single_flight_enabled``
+    takes a Redis lease so one caller recomputes a missing value,
+    ``early_refresh`` (XFetch beta) refreshes hot values before they expire,
+    and ``stale_ttl`` keeps serving an expired value for that many seconds
+    while one background task refreshes it.
+
+    Values are encoded by ``entry_codec``; ``codec`` picks another codec
+    for a call, which readers detect from the stored header.
+
+    Entries cached with ``tags`` embed each tag's generation counter in
+    their key, so ``invalidate_tags`` drops every entry under a tag with one
+    INCR; the orphaned keys expire on their own. Workers keep generations
+    locally for at most ``l1_max_staleness`` seconds and learn about bumps
+    over the invalidation channel.
+    """
+
+    def __init__(
+        self,
+        default_ttl: int = 300,
+        l1_policies: Optional[Dict[str, Dict[str, float]]] = None,
+        l1_max_staleness: float = 30.0,
+        invalidation_channel: str = "cache:invalidate",
+        refresh_lease_ttl: float = 30.0,
+        entry_codec: Optional[EntryCodec] = None,
+        hot_keys: Optional[HotKeyTracker] = None
+    ):
         self.default_ttl = default_ttl
+        self.entry_codec = entry_codec or EntryCodec()
+        self.hot_keys = hot_keys or HotKeyTracker()
+        self.invalidation_channel = invalidation_channel
+        self.refresh_lease_ttl = refresh_lease_ttl
+        self.tag_ttl = l1_max_staleness
+        self._refreshing: Set[str] = set()
+        # tag -> (expires_at, generation)
+        self._tag_generations: Dict[str, Tuple[float, int]] = {}
+        self._tag_listeners: List[Callable[[str], None]] = []
+        self._clear_listeners: List[Callable[[], None]] = []
+        self._l1: Dict[str, LocalCache] = {
+            prefix: LocalCache(
+                int(policy.get("max_entries", 1000)),
+                min(float(policy.get("ttl", l1_max_staleness)), l1_max_staleness),
+                name=prefix
+            )
+            for prefix, policy in (l1_policies or {}).items()
+        }
     
     async def get_or_set(
         self,
         key: str,
         getter: Callable,
-        ttl: Optional[int] = None
+        ttl: Optional[int] = None,
+        single_flight_enabled: bool = False,
+        stale_ttl: int = 0,
+        early_refresh: float = 0.0,
+        codec: Optional[str] = None,
+        tags: Sequence[str] = (),
+        refresher: Optional[Callable] = None
     ) -> Any:
-        # Try to get from cache
-        cached = await redis_client.get(key)
-        if cached:
-            return json.loads(cached)
+        """Return the cached value of ``key``, computing it with ``getter`` on a miss.
+
+        Background refreshes (``early_refresh``, ``stale_ttl``) outlive the
+        request that triggered them; pass ``refresher`` to recompute the
+        value there without the caller's request state.
+        """
+        ttl = ttl or self.default_ttl
+        key, entry, token = await self._lookup(key, tags, lease=single_flight_enabled)
+        prefix = self._prefix(key)
+        
+        async def compute(load: Callable = getter) -> Any:
+            # Get fresh data
+            started = time.monotonic()
+            data = await load()
+            entry = CacheEntry(data, time.time() + ttl, time.monotonic() - started)
+            CACHE_GETTER_LATENCY.labels(prefix=prefix).observe(entry.delta)
+            
+            # Cache the result; Redis keeps it through the stale window
+            serialized = self.entry_codec.encode(entry, codec)
+            CACHE_VALUE_BYTES.labels(prefix=prefix).observe(len(serialized))
+            await redis_client.set_bytes_with_ttl(key, serialized, ttl + stale_ttl)
+            self._set_local(key, serialized)
+            
+            return data
+        
+        refresh = (lambda: compute(refresher)) if refresher else compute
+        
+        if entry is not None:
+            now = time.time()
+            if now < entry.expires_at:
+                if early_refresh and refresh_due(entry, early_refresh, now):
+                    self._refresh_in_background(key, refresh, "early")
+                return entry.value
+            if now < entry.expires_at + stale_ttl:
+                self._refresh_in_background(key, refresh, "stale")
+                return entry.value
+        
+        if single_flight_enabled:
+            # Concurrent misses for the same key share one computation
+            return await single_flight.do(key, compute, lambda: self._load(key), token)
         
-        # Get fresh data
-        data = await getter()
+        return await compute()
+    
+    async def contains(self, key: str, tags: Sequence[str] = ()) -> bool:
+        """Whether a fresh value is cached; not counted as a lookup."""
+        fetched, cached = False, None
+        if tags:
+            key, fetched, cached = await self._tagged_key(key, tags)
+        if not fetched:
+            cached = await redis_client.get_bytes(key)
+        entry = self._decode(key, cached) if cached else None
+        return entry is not None and entry.expires_at > time.time()
+    
+    async def invalidate(self, *keys: str) -> None:
+        """Delete keys from Redis and from every worker's L1."""
+        if not keys:
+            return
+        for key in keys:
+            self._drop_local(key)
+        await redis_client.redis.delete(*keys)
+        if self._l1:
+            await redis_client.redis.publish(
+                self.invalidation_channel,
+                json.dumps({"keys": keys})
+            )
+    
+    async def invalidate_tags(self, *tags: str) -> None:
+        """Invalidate every entry cached under any of ``tags``."""
+        if not tags:
+            return
+        async with redis_client.redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self._tag_key(tag))
+            generations = await pipe.execute()
+        
+        bumped = dict(zip(tags, generations))
+        self._apply_tag_generations(bumped)
+        await redis_client.redis.publish(
+            self.invalidation_channel,
+            json.dumps({"tags": bumped})
+        )
+    
+    def on_tag_invalidated(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener`` with each tag invalidated by any worker."""
+        self._tag_listeners.append(listener)
+    
+    def on_clear_local(self, listener: Callable[[], None]) -> None:
+        """Call ``listener`` whenever local state is dropped by ``clear_local``."""
+        self._clear_listeners.append(listener)
+    
+    async def listen_for_invalidations(self) -> None:
+        """Apply invalidations broadcast by other workers until cancelled."""
+        while True:
+            pubsub = redis_client.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                # Invalidations sent while unsubscribed were missed
+                self.clear_local()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self._apply_invalidation(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener failed: {str(e)}")
+                self.clear_local()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except RedisError:
+                    pass
+    
+    def clear_local(self) -> None:
+        for local in self._l1.values():
+            local.clear()
+        self._tag_generations.clear()
+        for listener in self._clear_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"Cache clear listener failed: {str(e)}")
+    
+    def _apply_invalidation(self, data: Any) -> None:
+        if isinstance(data, list):
+            # Sent by workers predating tag invalidation
+            data = {"keys": data}
+        for key in data.get("keys", []):
+            self._drop_local(key)
+        self._apply_tag_generations(data.get("tags", {}))
+    
+    def _apply_tag_generations(self, generations: Dict[str, int]) -> None:
+        expires_at = time.monotonic() + self.tag_ttl
+        for tag, generation in generations.items():
+            current = self._tag_generations.get(tag)
+            if current is not None and current[1] >= generation:
+                continue
+            self._tag_generations[tag] = (expires_at, generation)
+            for listener in self._tag_listeners:
+                try:
+                    listener(tag)
+                except Exception as e:
+                    logger.warning(f"Cache tag listener failed for {tag}: {str(e)}")
+    
+    async def _tagged_key(
+        self,
+        key: str,
+        tags: Sequence[str]
+    ) -> Tuple[str, bool, Optional[bytes]]:
+        """Resolve ``key`` under the current generations of ``tags``.
+
+        If any generation is not known locally, all of them are read in one
+        MGET together with the value stored under the generations last seen,
+        which is the right key unless a tag was bumped since. Returns the key,
+        whether its value was read, and that value.
+        """
+        now = time.monotonic()
+        known = [self._tag_generations.get(tag) for tag in tags]
+        if all(cached is not None and cached[0] > now for cached in known):
+            return self._generation_key(key, [cached[1] for cached in known]), False, None
         
-        # Cache the result
-        await redis_client.set_with_ttl(
+        guessed_key = self._generation_key(
             key,
-            json.dumps(data),
-            ttl or self.default_ttl
+            [cached[1] if cached is not None else 0 for cached in known]
+        )
+        *values, cached_value = await redis_client.mget_bytes(
+            [self._tag_key(tag) for tag in tags] + [guessed_key]
         )
+        generations = [int(value or 0) for value in values]
+        for tag, generation in zip(tags, generations):
+            self._tag_generations[tag] = (now + self.tag_ttl, generation)
         
-        return data
+        key = self._generation_key(key, generations)
+        if key != guessed_key:
+            return key, False, None
+        return key, True, cached_value
+    
+    @staticmethod
+    def _generation_key(key: str, generations: Sequence[int]) -> str:
+        # The prefix stays first so L1 policies still apply
+        prefix, _, rest = key.partition(":")
+        return f"{prefix}:g{'.'.join(str(generation) for generation in generations)}:{rest}"
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"cache:tag:{tag}"
+    
+    async def _load(self, key: str) -> Optional[Any]:
+        # Single-flight followers wait for a fresh value
+        entry = await self._load_entry(key)
+        if entry is None or entry.expires_at <= time.time():
+            return None
+        return entry.value
+    
+    async def _lookup(
+        self,
+        key: str,
+        tags: Sequence[str] = (),
+        lease: bool = False
+    ) -> Tuple[str, Optional[CacheEntry], Optional[str]]:
+        """Read ``key`` in at most one Redis round trip in the common case.
+
+        With ``lease``, a miss also takes the single-flight lease in that
+        round trip. Returns the resolved key, the entry and the lease token.
+        """
+        fetched, cached = False, None
+        if tags:
+            key, fetched, cached = await self._tagged_key(key, tags)
+        prefix = self._prefix(key)
+        self.hot_keys.add(key)
+        local = self._local(key)
+        if local is not None and not fetched:
+            local_value = local.get(key)
+            if local_value is not None:
+                CACHE_REQUESTS.labels(prefix=prefix, tier="l1", result="hit").inc()
+                return key, self._decode(key, local_value), None
+            CACHE_REQUESTS.labels(prefix=prefix, tier="l1", result="miss").inc()
+        
+        token = None
+        if lease and not cached:
+            # Read and lease together; after a speculative miss this is a
+            # second round trip, taken only by callers about to compute
+            cached, token = await single_flight.get_or_lease(key)
+        elif not fetched:
+            cached = await redis_client.get_bytes(key)
+        CACHE_REQUESTS.labels(
+            prefix=prefix,
+            tier="l2",
+            result="hit" if cached else "miss"
+        ).inc()
+        if cached:
+            if local is not None:
+                local.set(key, cached)
+            return key, self._decode(key, cached), None
+        return key, None, token
+    
+    async def _load_entry(self, key: str) -> Optional[CacheEntry]:
+        prefix = self._prefix(key)
+        self.hot_keys.add(key)
+        local = self._local(key)
+        if local is not None:
+            cached = local.get(key)
+            if cached is not None:
+                CACHE_REQUESTS.labels(prefix=prefix, tier="l1", result="hit").inc()
+                return self._decode(key, cached)
+            CACHE_REQUESTS.labels(prefix=prefix, tier="l1", result="miss").inc()
+        
+        cached = await redis_client.get_bytes(key)
+        CACHE_REQUESTS.labels(
+            prefix=prefix,
+            tier="l2",
+            result="hit" if cached else "miss"
+        ).inc()
+        if cached:
+            if local is not None:
+                local.set(key, cached)
+            return self._decode(key, cached)
+        return None
+    
+    def _decode(self, key: str, cached: bytes) -> Optional[CacheEntry]:
+        try:
+            return self.entry_codec.decode(cached)
+        except Exception as e:
+            # Treat undecodable values as misses; the next write replaces them
+            logger.warning(f"Could not decode cached value for {key}: {str(e)}")
+            return None
+    
+    def _refresh_in_background(
+        self,
+        key: str,
+        compute: Callable,
+        reason: str
+    ) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        
+        async def refresh() -> None:
+            try:
+                if not await self._acquire_refresh_lease(key):
+                    return
+                CACHE_REFRESHES.labels(prefix=self._prefix(key), reason=reason).inc()
+                # Refreshes must not compete with requests that are waiting
+                with priority(BATCH):
+                    await compute()
+            finally:
+                self._refreshing.discard(key)
+        
+        run_in_background(refresh(), name=f"cache_refresh:{key}")
+    
+    async def _acquire_refresh_lease(self, key: str) -> bool:
+        # One refresh per key across workers; the lease is left to expire
+        try:
+            return bool(await redis_client.redis.set(
+                f"cache:refresh:{key}",
+                "1",
+                nx=True,
+                px=int(self.refresh_lease_ttl * 1000)
+            ))
+        except RedisError as e:
+            logger.warning(f"Cache refresh lease unavailable: {str(e)}")
+            return True
+    
+    def _local(self, key: str) -> Optional[LocalCache]:
+        return self._l1.get(self._prefix(key))
+    
+    @staticmethod
+    def _prefix(key: str) -> str:
+        return key.split(":", 1)[0]
+    
+    def _set_local(self, key: str, serialized: bytes) -> None:
+        local = self._local(key)
+        if local is not None:
+            local.set(key, serialized)
+    
+    def _drop_local(self, key: str) -> None:
+        local = self._local(key)
+        if local is not None:
+            local.delete(key)
     
     def cache_response(
         self,
         prefix: str,
         ttl: Optional[int] = None,
-        key_builder: Optional[Callable] = None
+        key_builder: Optional[Callable] = None,
+        single_flight: bool = False,
+        stale_ttl: int = 0,
+        early_refresh: float = 0.0,
+        codec: Optional[str] = None,
+        tags: Optional[Callable[..., Sequence[str]]] = None,
+        refresh: Optional[Callable] = None
     ):
         def decorator(func):
-            @wraps(func)
-            async def wrapper(*args, **kwargs):
+            def build_key(*args, **kwargs) -> str:
                 # Build cache key
                 if key_builder:
-                    cache_key = f"{prefix}:{key_builder(*args, **kwargs)}"
-                else:
-                    # Default key builder uses arguments
-                    key_parts = [
-                        str(arg) for arg in args
-                    ] + [
-                        f"{k}={v}" for k, v in sorted(kwargs.items())
-                    ]
-                    cache_key = f"{prefix}:{hashlib.sha256(':'.join(key_parts).encode()).hexdigest()}"
-                
+                    return f"{prefix}:{key_builder(*args, **kwargs)}"
+                # Default key builder uses arguments
+                key_parts = [
+                    str(arg) for arg in args
+                ] + [
+                    f"{k}={v}" for k, v in sorted(kwargs.items())
+                ]
+                return f"{prefix}:{hashlib.sha256(':'.join(key_parts).encode()).hexdigest()}"
+            
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
                 return await self.get_or_set(
-                    cache_key,
+                    build_key(*args, **kwargs),
                     lambda: func(*args, **kwargs),
-                    ttl
+                    ttl,
+                    single_flight_enabled=single_flight,
+                    stale_ttl=stale_ttl,
+                    early_refresh=early_refresh,
+                    codec=codec,
+                    tags=tags(*args, **kwargs) if tags else (),
+                    refresher=(lambda: refresh(*args, **kwargs)) if refresh else None
+                )
+            
+            async def is_cached(*args, **kwargs) -> bool:
+                return await self.contains(
+                    build_key(*args, **kwargs),
+                    tags=tags(*args, **kwargs) if tags else ()
+                )
+            
+            async def warm(*args, **kwargs) -> Any:
+                # Fill the entry through ``refresh``, without the call's side effects
+                return await self.get_or_set(
+                    build_key(*args, **kwargs),
+                    lambda: refresh(*args, **kwargs),
+                    ttl,
+                    single_flight_enabled=single_flight,
+                    stale_ttl=stale_ttl,
+                    codec=codec,
+                    tags=tags(*args, **kwargs) if tags else ()
                 )
+            
+            wrapper.is_cached = is_cached
+            if refresh:
+                wrapper.warm = warm
             return wrapper
         return decorator
 
-cache_manager = CacheManager() 
\ No newline at end of file
+cache_manager = CacheManager(
+    l1_policies=settings.CACHE_L1_POLICIES if settings.CACHE_L1_ENABLED else None,
+    l1_max_staleness=settings.CACHE_L1_MAX_STALENESS,
+    invalidation_channel=settings.CACHE_INVALIDATION_CHANNEL,
+    refresh_lease_ttl=settings.CACHE_REFRESH_LEASE_TTL,
+    entry_codec=EntryCodec(
+        codec=settings.CACHE_CODEC,
+        compression=settings.CACHE_COMPRESSION,
+        compression_min_bytes=settings.CACHE_COMPRESSION_MIN_BYTES
+    ),
+    hot_keys=HotKeyTracker(k=settings.CACHE_HOT_KEYS_TOP_K)
+)
@@ -0,0 +1,234 @@
+"""Binary encoding of cached values.
+
+A stored value starts with a fixed header naming its codec and compression,
+followed by the soft expiry and compute time used for stampede protection:
+
+    magic (0xC1) | codec id | compression id | expires_at (f64) | delta (f64)
+
+The header makes values self-describing, so workers on either side of a
+rolling deploy can read each other's values whatever codec they write.
+Values without the magic byte are legacy JSON. orjson, msgpack, zstandard
+and lz4 are optional; without them values use stdlib JSON and are stored
+uncompressed.
+"""
+from typing import Any, Callable, Dict, NamedTuple, Optional
+import importlib
+import json
+import math
+import struct
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.core.logging import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# 0xC1 is neither valid UTF-8 nor used by msgpack, so it never starts JSON
+_MAGIC = 0xC1
+# magic, codec, compression, expires_at, delta
+_HEADER = struct.Struct("<BBBdd")
+
+class CacheEntry(NamedTuple):
+    value: Any
+    expires_at: float  # epoch seconds after which the value is stale
+    delta: float  # seconds the value took to compute
+
+class Codec:
+    id: int
+    name: str
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+class JSONCodec(Codec):
+    """JSON through orjson when installed, else the standard library."""
+    id = 1
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(
+                value,
+                default=jsonable_encoder,
+                option=orjson.OPT_SERIALIZE_NUMPY
+            )
+        return json.dumps(value, default=jsonable_encoder).encode()
+
+    def decode(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+class MsgpackCodec(Codec):
+    id = 2
+    name = "msgpack"
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=jsonable_encoder, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+class PydanticCodec(Codec):
+    """Pydantic models, decoded back into their class.
+
+    The payload is the model's import path, a NUL byte and its JSON. Only
+    models defined in this application are loaded.
+    """
+    id = 3
+    name = "pydantic"
+
+    def __init__(self):
+        self._models: Dict[str, type] = {}
+
+    def encode(self, value: BaseModel) -> bytes:
+        model = type(value)
+        path = f"{model.__module__}:{model.__qualname__}"
+        self._models.setdefault(path, model)
+        return path.encode() + b"\0" + value.model_dump_json().encode()
+
+    def decode(self, data: bytes) -> Any:
+        path, _, payload = data.partition(b"\0")
+        return self._model(path.decode()).model_validate_json(payload)
+
+    def _model(self, path: str) -> type:
+        model = self._models.get(path)
+        if model is None:
+            module, _, name = path.partition(":")
+            if not module.startswith("app."):
+                raise ValueError(f"Refusing to load cached model {path}")
+            model = getattr(importlib.import_module(module), name)
+            if not (isinstance(model, type) and issubclass(model, BaseModel)):
+                raise ValueError(f"{path} is not a pydantic model")
+            self._models[path] = model
+        return model
+
+class Compression(NamedTuple):
+    id: int
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+_NO_COMPRESSION = Compression(0, "none", bytes, bytes)
+
+def _compressions() -> Dict[str, Compression]:
+    available = {"none": _NO_COMPRESSION}
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=3)
+        decompressor = zstandard.ZstdDecompressor()
+        available["zstd"] = Compression(
+            1,
+            "zstd",
+            compressor.compress,
+            # Frames written by compress() always record their size
+            decompressor.decompress
+        )
+    if lz4_frame is not None:
+        available["lz4"] = Compression(2, "lz4", lz4_frame.compress, lz4_frame.decompress)
+    return available
+
+_CODECS: Dict[str, Codec] = {
+    codec.name: codec
+    for codec in (JSONCodec(), PydanticCodec())
+}
+if msgpack is not None:
+    _CODECS["msgpack"] = MsgpackCodec()
+_CODECS_BY_ID = {codec.id: codec for codec in _CODECS.values()}
+_COMPRESSIONS = _compressions()
+_COMPRESSIONS_BY_ID = {compression.id: compression for compression in _COMPRESSIONS.values()}
+
+class EntryCodec:
+    """Encodes CacheEntry values with a default codec and compression.
+
+    Pydantic models always use the pydantic codec. Payloads shorter than
+    ``compression_min_bytes`` are stored uncompressed, where compression
+    costs more CPU than it saves.
+    """
+
+    def __init__(
+        self,
+        codec: str = "json",
+        compression: str = "none",
+        compression_min_bytes: int = 1024
+    ):
+        self.codec = self._codec(codec)
+        self.compression = _COMPRESSIONS.get(compression)
+        if self.compression is None:
+            logger.warning(f"Cache compression {compression} unavailable, storing uncompressed")
+            self.compression = _NO_COMPRESSION
+        self.compression_min_bytes = compression_min_bytes
+
+    def encode(self, entry: CacheEntry, codec: Optional[str] = None) -> bytes:
+        if isinstance(entry.value, BaseModel):
+            selected = _CODECS["pydantic"]
+        elif codec is not None:
+            selected = self._codec(codec)
+        else:
+            selected = self.codec
+
+        payload = selected.encode(entry.value)
+        compression = _NO_COMPRESSION
+        if len(payload) >= self.compression_min_bytes:
+            compression = self.compression
+            payload = compression.compress(payload)
+
+        return _HEADER.pack(
+            _MAGIC,
+            selected.id,
+            compression.id,
+            entry.expires_at,
+            entry.delta
+        ) + payload
+
+    def decode(self, blob: bytes) -> Optional[CacheEntry]:
+        """Decode a stored value; None if it was written in an unknown format."""
+        if not blob or blob[0] != _MAGIC:
+            return self._decode_legacy(blob)
+        if len(blob) < _HEADER.size:
+            return None
+
+        _, codec_id, compression_id, expires_at, delta = _HEADER.unpack_from(blob)
+        codec = _CODECS_BY_ID.get(codec_id)
+        compression = _COMPRESSIONS_BY_ID.get(compression_id)
+        if codec is None or compression is None:
+            # Written by a worker with a codec this one lacks
+            return None
+
+        payload = compression.decompress(blob[_HEADER.size:])
+        return CacheEntry(codec.decode(payload), expires_at, delta)
+
+    @staticmethod
+    def _decode_legacy(blob: bytes) -> CacheEntry:
+        # Plain JSON written before values carried an expiry; fresh until
+        # Redis expires it
+        return CacheEntry(json.loads(blob), math.inf, 0.0)
+
+    @staticmethod
+    def _codec(name: str) -> Codec:
+        codec = _CODECS.get(name)
+        if codec is None:
+            logger.warning(f"Cache codec {name} unavailable, using json")
+            return _CODECS["json"]
+        return codec
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -17,18 +17,120 @@ class Settings(BaseSettings):
     
     # LLM Configuration
     OLLAMA_BASE_URL: str = "http://ollama:11434"
+    OLLAMA_BASE_URLS: List[str] = []  # multiple backends; overrides OLLAMA_BASE_URL
     LLM_MODEL: str = "llama2"  # or any other model available in Ollama
     LLM_TEMPERATURE: float = 0.7
+    # Models per route (greeting, concise, balanced, detailed) in fallback
+    # order; LLM_MODEL is always the last fallback
+    LLM_MODEL_ROUTES: Dict[str, List[str]] = {}
+    EMBEDDING_MODEL: str = "nomic-embed-text"
+    LLM_CONTEXT_TOKENS: int = 2048  # model context window used for prompt budgeting
+    LLM_RESPONSE_TOKENS: int = 512  # tokens reserved for the generated answer
+    
+    # Ollama HTTP connection pool
+    OLLAMA_MAX_CONNECTIONS: int = 100
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OLLAMA_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    OLLAMA_HTTP2: bool = False  # requires the optional "h2" package
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0
+    OLLAMA_READ_TIMEOUT: float = 30.0
+    OLLAMA_WRITE_TIMEOUT: float = 10.0  # seconds to send a request body
+    OLLAMA_POOL_TIMEOUT: float = 10.0
+    
+    # Ollama backend routing and circuit breaking
+    OLLAMA_CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive failures before ejection
+    OLLAMA_CIRCUIT_RECOVERY_TIMEOUT: float = 30.0  # seconds before a trial request
+    OLLAMA_CIRCUIT_RAMP_UP: float = 60.0  # seconds to regain full weight
+    OLLAMA_MODEL_MISS_PENALTY: float = 4.0  # score multiplier if model not loaded
+    OLLAMA_HEALTH_CHECK_INTERVAL: int = 15  # seconds
     
     # Redis Configuration (for rate limiting and caching)
     REDIS_URL: Optional[str] = "redis://redis:6379"
     
+    # LLM admission control (per backend)
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_MAX_QUEUE: int = 32
+    LLM_QUEUE_TIMEOUT: float = 10.0  # seconds a request may wait for a slot
+    LLM_SHED_RETRY_AFTER: int = 5  # Retry-After seconds sent with 503s
+    LLM_BATCH_MAX_CONCURRENCY: int = 1  # slots the batch lane may hold
+    LLM_BATCH_MAX_QUEUE: int = 256
+    LLM_BATCH_QUEUE_TIMEOUT: float = 300.0  # seconds
+    
+    # Bulk chat endpoint
+    BATCH_MAX_ITEMS: int = 5000
+    BATCH_MAX_PARALLELISM: int = 4  # concurrent messages per batch request
+    
+    # Single-flight de-duplication of identical in-flight requests
+    SINGLE_FLIGHT_LEASE_TTL: float = 90.0  # seconds
+    SINGLE_FLIGHT_WAIT_TIMEOUT: float = 90.0  # seconds
+    
+    # In-process L1 cache in front of Redis, per key prefix
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_POLICIES: Dict[str, Dict[str, float]] = {
+        "instance_settings": {"max_entries": 10000, "ttl": 30},
+        "chat_reply": {"max_entries": 5000, "ttl": 30},
+        "rate_limit_key": {"max_entries": 10000, "ttl": 30},
+        "rate_limit_policy": {"max_entries": 10000, "ttl": 30}
+    }
+    CACHE_L1_MAX_STALENESS: float = 30.0  # seconds; caps every L1 TTL
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_REFRESH_LEASE_TTL: float = 30.0  # seconds between background refreshes of a key
+    CACHE_CODEC: str = "json"  # json or msgpack; pydantic models use their own codec
+    CACHE_COMPRESSION: str = "none"  # zstd or lz4 need the "cache" extra
+    CACHE_COMPRESSION_MIN_BYTES: int = 1024  # smaller values are stored uncompressed
+    CACHE_HOT_KEYS_TOP_K: int = 50  # hot keys tracked for the admin endpoint
+    
+    # Pre-generation of replies to frequent questions
+    CACHE_WARMUP_ENABLED: bool = True
+    CACHE_WARMUP_TOP_QUESTIONS: int = 20  # per instance
+    CACHE_WARMUP_LOOKBACK_HOURS: int = 24
+    CACHE_WARMUP_CONCURRENCY: int = 2  # replies generated at once per instance
+    CACHE_WARMUP_STARTUP_DELAY: float = 30.0  # seconds after startup
+    
+    # Chat history
+    CHAT_HISTORY_LIMIT: int = 50  # newest messages loaded for a prompt
+    CHAT_HISTORY_TTL: int = 3600  # seconds an idle session's buffer is kept
+    
+    # Chat data retention (weekly chat_messages partitions)
+    CHAT_RETENTION_MAX_DAYS: int = 365  # upper bound on any instance's retention
+    CHAT_PARTITIONS_AHEAD: int = 4  # weekly partitions created in advance
+    CHAT_PURGE_BATCH_SIZE: int = 5000  # rows deleted per purge chunk
+    CHAT_PURGE_PAUSE: float = 0.5  # seconds between purge chunks
+    CHAT_PARTITION_LOCK_TIMEOUT: float = 5.0  # seconds a partition detach waits for its lock
+    
+    # Write-behind persistence of chat messages through a Redis Stream
+    MESSAGE_WRITE_BEHIND: bool = True
+    MESSAGE_STREAM_KEY: str = "chat_messages:stream"
+    MESSAGE_STREAM_MAXLEN: int = 1000000  # approximate cap on unflushed entries
+    MESSAGE_DEAD_LETTER_STREAM: str = "chat_messages:dead_letter"  # entries that can never be written
+    MESSAGE_FLUSH_BATCH_SIZE: int = 500  # stream entries per Postgres insert
+    MESSAGE_FLUSH_BLOCK_MS: int = 1000
+    MESSAGE_FLUSH_CLAIM_IDLE_MS: int = 60000  # reclaim entries of dead workers after
+    
+    # Rolling conversation summaries
+    SUMMARY_TRIGGER_TOKENS: int = 1024  # unsummarized history size that triggers a summary
+    SUMMARY_KEEP_RECENT_MESSAGES: int = 6  # newest messages always kept verbatim
+    SUMMARY_TTL: int = 86400  # seconds
+    
+    # Semantic response cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # cosine similarity required for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000  # per instance
+    SEMANTIC_CACHE_TTL: int = 3600  # seconds
+    
+    # Per-session reuse of Ollama's returned context tokens
+    SESSION_CONTEXT_REUSE: bool = True
+    SESSION_CONTEXT_TTL: int = 1800  # seconds
+    
     # Debug mode
     DEBUG: bool = False
     
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 100
     RATE_LIMIT_PER_HOUR: int = 1000
+    RATE_LIMIT_ALGORITHM: str = "sliding_window"  # or "token_bucket"
+    RATE_LIMIT_POLICY_TTL: int = 60  # seconds an instance's quotas are cached
+    RATE_LIMIT_KEY_LOOKUPS_PER_MINUTE: int = 20  # uncached API keys a client IP may resolve
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -47,6 +47,34 @@ class LLMServiceException(ChatbotError):
             details=details
         )
 
+class LLMBackendException(LLMServiceException):
+    """Raised when Ollama fails with a server error; counts against backend health"""
+
+class LLMRequestException(LLMServiceException):
+    """Raised when Ollama rejects a request, e.g. for a model that isn't pulled"""
+
+class ServiceOverloadedException(ChatbotError):
+    """Raised when a request is shed because the LLM backend is saturated"""
+    def __init__(self, message: str = "Service overloaded", retry_after: int = 5):
+        self.retry_after = retry_after
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            details={"retry_after": retry_after}
+        )
+    
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+class GenerationCancelledException(ChatbotError):
+    """Raised when a reply is abandoned because a newer message superseded it"""
+    def __init__(self, message: str = "Superseded by a newer message"):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_409_CONFLICT
+        )
+
 class InstanceNotFoundException(ChatbotError):
     """Raised when an instance is not found"""
     def __init__(self, message: str = "Instance not found"):
@@ -84,13 +112,17 @@ def setup_exception_handlers(app: FastAPI):
             }
         )
         
-        return {
-            "error": {
-                "message": exc.message,
-                "type": exc.__class__.__name__,
-                "details": exc.details
-            }
-        }
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={
+                "error": {
+                    "message": exc.message,
+                    "type": exc.__class__.__name__,
+                    "details": exc.details
+                }
+            },
+            headers=getattr(exc, "headers", None)
+        )
     
     @app.exception_handler(Exception)
     async def general_exception_handler(
@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple
+import hashlib
+
+import numpy as np
+
+class CountMinSketch:
+    """Approximate frequency counts in ``depth`` x ``width`` counters.
+
+    Estimates never undercount; with the default size they overcount by at
+    most about 0.1% of all additions with 99% probability.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 5):
+        self.width = width
+        self.depth = depth
+        self._counts = np.zeros((depth, width), dtype=np.uint32)
+        self._rows = np.arange(depth)
+
+    def add(self, key: str) -> int:
+        """Count ``key`` once and return its new estimate."""
+        columns = self._columns(key)
+        self._counts[self._rows, columns] += 1
+        return int(self._counts[self._rows, columns].min())
+
+    def estimate(self, key: str) -> int:
+        return int(self._counts[self._rows, self._columns(key)].min())
+
+    def halve(self) -> None:
+        self._counts >>= 1
+
+    def _columns(self, key: str) -> np.ndarray:
+        # Double hashing: row i uses h1 + i * h2
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return np.array(
+            [(h1 + i * h2) % self.width for i in range(self.depth)],
+            dtype=np.int64
+        )
+
+class HotKeyTracker:
+    """Top-K most requested keys, counted with a Count-Min sketch.
+
+    Memory is fixed: the sketch plus at most ``k`` candidate keys. Every
+    ``decay_every`` additions all counts are halved, so the ranking follows
+    recent traffic rather than all-time totals.
+    """
+
+    def __init__(
+        self,
+        k: int = 50,
+        width: int = 2048,
+        depth: int = 5,
+        decay_every: int = 100000
+    ):
+        self.k = k
+        self.decay_every = decay_every
+        self._sketch = CountMinSketch(width, depth)
+        self._top: Dict[str, int] = {}
+        self._additions = 0
+
+    def add(self, key: str) -> None:
+        count = self._sketch.add(key)
+        if key in self._top or len(self._top) < self.k:
+            self._top[key] = count
+        else:
+            coldest = min(self._top, key=self._top.get)
+            if count > self._top[coldest]:
+                del self._top[coldest]
+                self._top[key] = count
+
+        self._additions += 1
+        if self._additions >= self.decay_every:
+            self._decay()
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        ranked = sorted(self._top.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def _decay(self) -> None:
+        self._additions = 0
+        self._sketch.halve()
+        self._top = {key: count >> 1 for key, count in self._top.items()}
@@ -0,0 +1,112 @@
+from typing import Dict, Optional
+import httpx
+
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import OLLAMA_POOL_CONNECTIONS, OLLAMA_POOL_PENDING
+
+settings = get_settings()
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class OllamaHTTPClient:
+    """Process-wide pooled HTTP client used for all Ollama traffic.
+
+    The underlying httpx.AsyncClient is created lazily on first use so that
+    it binds to the running event loop, and is closed on application shutdown.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._stats_warned = False
+
+        OLLAMA_POOL_CONNECTIONS.labels(state="active").set_function(
+            lambda: self.pool_stats()["active"]
+        )
+        OLLAMA_POOL_CONNECTIONS.labels(state="idle").set_function(
+            lambda: self.pool_stats()["idle"]
+        )
+        OLLAMA_POOL_PENDING.set_function(lambda: self.pool_stats()["pending"])
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._transport = self._create_transport()
+            self._client = self._create_client(self._transport)
+        return self._client
+
+    def _create_transport(self) -> httpx.AsyncHTTPTransport:
+        http2 = settings.OLLAMA_HTTP2
+        if http2 and not _http2_available():
+            logger.warning(
+                "OLLAMA_HTTP2 is enabled but the 'h2' package is not installed; "
+                "falling back to HTTP/1.1"
+            )
+            http2 = False
+
+        # Owning the transport keeps pool_stats off the client's internals
+        return httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY
+            ),
+            http2=http2
+        )
+
+    def _create_client(self, transport: httpx.AsyncHTTPTransport) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                connect=settings.OLLAMA_CONNECT_TIMEOUT,
+                read=settings.OLLAMA_READ_TIMEOUT,
+                write=settings.OLLAMA_WRITE_TIMEOUT,
+                pool=settings.OLLAMA_POOL_TIMEOUT
+            )
+        )
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Return active/idle connection and pending request counts.
+
+        httpx does not expose its pool, so this reads httpcore's connection
+        pool behind the transport. Those reads are guarded: if a release
+        changes them, the counts drop to zero instead of failing scrapes.
+        """
+        stats = {"active": 0, "idle": 0, "pending": 0}
+        if self._client is None or self._client.is_closed:
+            return stats
+
+        try:
+            pool = getattr(self._transport, "_pool", None)
+            if pool is None:
+                return stats
+            # ``connections`` and ``is_idle`` are public httpcore API
+            for connection in pool.connections:
+                if connection.is_idle():
+                    stats["idle"] += 1
+                else:
+                    stats["active"] += 1
+            stats["pending"] = sum(
+                1 for request in getattr(pool, "_requests", [])
+                if getattr(request, "connection", None) is None
+            )
+        except Exception as e:
+            if not self._stats_warned:
+                logger.warning(f"Ollama connection pool stats unavailable: {str(e)}")
+                self._stats_warned = True
+            return {"active": 0, "idle": 0, "pending": 0}
+        return stats
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._transport = None
+
+ollama_http_client = OllamaHTTPClient()
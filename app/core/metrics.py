@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, generate_latest
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
 from fastapi import Request
 import time
 
@@ -26,6 +26,202 @@ LLM_LATENCY = Histogram(
     'LLM request latency'
 )
 
+OLLAMA_POOL_CONNECTIONS = Gauge(
+    'ollama_http_pool_connections',
+    'Connections held by the shared Ollama HTTP pool',
+    ['state']
+)
+
+OLLAMA_POOL_PENDING = Gauge(
+    'ollama_http_pool_pending_requests',
+    'Requests waiting for a free connection in the Ollama HTTP pool'
+)
+
+OLLAMA_REQUESTS_IN_PROGRESS = Gauge(
+    'ollama_http_requests_in_progress',
+    'Requests currently in flight to Ollama'
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by key prefix, tier (l1 in-process, l2 Redis) and result',
+    ['prefix', 'tier', 'result']
+)
+
+CACHE_REFRESHES = Counter(
+    'cache_refreshes_total',
+    'Background cache refreshes by key prefix and reason (early, stale)',
+    ['prefix', 'reason']
+)
+
+CACHE_GETTER_LATENCY = Histogram(
+    'cache_getter_duration_seconds',
+    'Time to compute a value on a cache miss or refresh',
+    ['prefix'],
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+CACHE_VALUE_BYTES = Histogram(
+    'cache_value_bytes',
+    'Encoded size of values written to the cache',
+    ['prefix'],
+    buckets=[64, 256, 1024, 4096, 16384, 65536, 262144, 1048576]
+)
+
+CACHE_EVICTIONS = Counter(
+    'cache_l1_evictions_total',
+    'Entries removed from the in-process cache by reason (size, expired)',
+    ['prefix', 'reason']
+)
+
+CACHE_WARMUP_QUESTIONS = Counter(
+    'cache_warmup_questions_total',
+    'Questions processed by cache warm-up by result (generated, cached, failed)',
+    ['result']
+)
+
+CACHE_WARMUP_PENDING = Gauge(
+    'cache_warmup_pending_questions',
+    'Questions queued for cache warm-up'
+)
+
+CACHE_WARMUP_GENERATION_SECONDS = Counter(
+    'cache_warmup_generation_seconds_total',
+    'Reply generation time moved off the request path by cache warm-up'
+)
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    'single_flight_requests_total',
+    'Single-flight calls by role (leader, local_follower, remote_follower, fallback)',
+    ['role']
+)
+
+SEMANTIC_CACHE_REQUESTS = Counter(
+    'semantic_cache_requests_total',
+    'Semantic response cache lookups by tier and result',
+    ['tier', 'result']
+)
+
+LLM_IN_FLIGHT = Gauge(
+    'llm_in_flight_requests',
+    'LLM generations currently admitted per backend',
+    ['backend']
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    'llm_queue_depth',
+    'Requests waiting for LLM admission per backend and priority lane',
+    ['backend', 'lane']
+)
+
+LLM_SHED_REQUESTS = Counter(
+    'llm_shed_requests_total',
+    'Requests rejected by LLM admission control',
+    ['backend', 'lane', 'reason']
+)
+
+LLM_BACKEND_OUTSTANDING = Gauge(
+    'llm_backend_outstanding_requests',
+    'Outstanding requests routed to each Ollama backend',
+    ['backend']
+)
+
+LLM_BACKEND_STATE = Gauge(
+    'llm_backend_circuit_state',
+    'Circuit breaker state per Ollama backend (0=closed, 1=half-open, 2=open)',
+    ['backend']
+)
+
+LLM_BACKEND_REQUESTS = Counter(
+    'llm_backend_requests_total',
+    'Requests completed per Ollama backend by result',
+    ['backend', 'result']
+)
+
+CONVERSATION_SUMMARIES = Counter(
+    'conversation_summaries_total',
+    'Background conversation summarizations by status',
+    ['status']
+)
+
+LLM_MODEL_REQUESTS = Counter(
+    'llm_model_requests_total',
+    'LLM generations per model by result',
+    ['model', 'result']
+)
+
+LLM_MODEL_LATENCY = Histogram(
+    'llm_model_duration_seconds',
+    'LLM generation latency per model',
+    ['model']
+)
+
+LLM_MODEL_TOKENS_PER_SECOND = Histogram(
+    'llm_model_tokens_per_second',
+    'Generated tokens per second per model',
+    ['model'],
+    buckets=[1, 2, 5, 10, 20, 40, 80, 160, 320]
+)
+
+LLM_MODEL_FALLBACKS = Counter(
+    'llm_model_fallbacks_total',
+    'Generations retried on the next model after a failure',
+    ['model']
+)
+
+LLM_CANCELLED_GENERATIONS = Counter(
+    'llm_cancelled_generations_total',
+    'LLM generations aborted before completion per model',
+    ['model']
+)
+
+CHAT_CANCELLATIONS = Counter(
+    'chat_cancellations_total',
+    'Chat replies cancelled by reason',
+    ['reason']
+)
+
+LLM_PREFILL_TOKENS = Histogram(
+    'llm_prefill_tokens',
+    'Prompt tokens Ollama had to evaluate per generation',
+    ['mode'],
+    buckets=[16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+)
+
+MESSAGE_FLUSH_BATCH_SIZE = Histogram(
+    'chat_message_flush_batch_size',
+    'Stream entries written to Postgres per write-behind flush',
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000]
+)
+
+MESSAGE_FLUSH_LAG = Histogram(
+    'chat_message_flush_lag_seconds',
+    'Time from enqueueing a chat turn to its Postgres commit',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+)
+
+MESSAGE_FLUSH_FAILURES = Counter(
+    'chat_message_flush_failures_total',
+    'Write-behind flushes that failed and will be retried'
+)
+
+MESSAGE_DEAD_LETTERS = Counter(
+    'chat_message_dead_letters_total',
+    'Stream entries moved to the dead-letter stream because they cannot be written'
+)
+
+CHAT_RETENTION_REMOVED = Counter(
+    'chat_retention_removed_total',
+    'Chat data removed by retention: dropped partitions or purged rows',
+    ['kind']
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    'rate_limit_rejections_total',
+    'Requests rejected by rate limiting, by the window that was exceeded',
+    ['window']
+)
+
 async def metrics_middleware(request: Request, call_next):
     start_time = time.time()
     
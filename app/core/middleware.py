@@ -1,8 +1,12 @@
-from fastapi import Request, HTTPException
+import math
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime
 
-from app.core.redis import redis_client
+from app.core.logging import logger
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+from app.core.rate_limit import KeyLookupLimitExceeded, rate_limit_policy, rate_limiter
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -15,21 +19,27 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         if not api_key:
             return await call_next(request)
         
-        # Rate limit key includes API key and current minute
-        current_minute = datetime.utcnow().strftime("%Y-%m-%d-%H-%M")
-        rate_limit_key = f"rate_limit:{api_key}:{current_minute}"
-        
-        # Check rate limit (100 requests per minute)
-        is_allowed = await redis_client.increment_and_check(
-            rate_limit_key,
-            ttl_seconds=60,
-            max_requests=100
-        )
+        client_ip = request.client.host if request.client else "unknown"
+        try:
+            identity, limits = await rate_limit_policy(api_key, client_ip)
+            result = await rate_limiter.hit(identity, limits)
+        except KeyLookupLimitExceeded as e:
+            result = e.result
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            logger.warning(f"Rate limiting unavailable: {str(e)}")
+            return await call_next(request)
         
-        if not is_allowed:
-            raise HTTPException(
+        headers = result.headers()
+        if not result.allowed:
+            RATE_LIMIT_REJECTIONS.labels(window=str(result.limit.window)).inc()
+            headers["Retry-After"] = str(max(math.ceil(result.retry_after), 1))
+            return JSONResponse(
                 status_code=429,
-                detail="Rate limit exceeded. Please try again later."
+                content={"detail": "Rate limit exceeded. Please try again later."},
+                headers=headers
             )
         
-        return await call_next(request) 
\ No newline at end of file
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
@@ -0,0 +1,237 @@
+"""Per-instance request quotas enforced atomically in Redis.
+
+Each API key is checked against one or more windows at once (by default
+RATE_LIMIT_PER_MINUTE and RATE_LIMIT_PER_HOUR); a request is admitted only
+if every window has room, and only then is it counted. Windows use either
+algorithm:
+
+* ``sliding_window``: a sliding-window counter. The previous fixed window's
+  count is weighted by how much of it still overlaps the sliding window, so
+  bursts at window edges cannot double the quota.
+* ``token_bucket``: the bucket holds up to ``limit`` tokens and refills
+  evenly over ``window``, which spreads admissions out instead of letting a
+  tenant spend the whole quota at once.
+
+Instances override the defaults in their ``rate_limits`` settings.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+import hashlib
+import math
+
+from pydantic import ValidationError
+
+from app.core.cache import cache_manager
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import InstanceNotFoundException, RateLimitError
+from app.core.logging import logger
+from app.core.redis import redis_client
+from app.models.instance_settings import RateLimitSettings
+from app.services.instance_service import InstanceService
+
+settings = get_settings()
+
+SLIDING_WINDOW = "sliding_window"
+TOKEN_BUCKET = "token_bucket"
+
+# KEYS: one per window. ARGV: algorithm, limit, window (ms) per window.
+# Returns admitted (0/1), then remaining, reset (ms) and retry (ms) per window.
+_RATE_LIMIT_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local admitted = 1
+local checks = {}
+
+for i, key in ipairs(KEYS) do
+    local algorithm = ARGV[i * 3 - 2]
+    local limit = tonumber(ARGV[i * 3 - 1])
+    local window = tonumber(ARGV[i * 3])
+    local check = {key = key, algorithm = algorithm, limit = limit, window = window}
+
+    if algorithm == "token_bucket" then
+        local state = redis.call("HMGET", key, "tokens", "ts")
+        local rate = limit / window
+        local tokens = tonumber(state[1]) or limit
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(limit, tokens + math.max(0, now - updated) * rate)
+        check.tokens = tokens
+        check.remaining = tokens - 1
+        check.reset = (limit - math.max(tokens - 1, 0)) / rate
+        check.retry = 0
+        if tokens < 1 then
+            check.retry = (1 - tokens) / rate
+        end
+    else
+        local index = math.floor(now / window)
+        local elapsed = now - index * window
+        local counts = redis.call("HMGET", key, index - 1, index)
+        local previous = tonumber(counts[1]) or 0
+        local current = tonumber(counts[2]) or 0
+        check.index = index
+        check.remaining = limit - (previous * (1 - elapsed / window) + current) - 1
+        check.reset = window - elapsed
+        check.retry = 0
+        if check.remaining < 0 and current + 1 <= limit then
+            -- Wait for enough of the previous window to slide out
+            check.retry = window * (1 - (limit - 1 - current) / previous) - elapsed
+        elseif check.remaining < 0 then
+            -- Wait for the next window, then for the current one to slide out
+            check.retry = window - elapsed + window * (1 - (limit - 1) / current)
+        end
+    end
+
+    if check.remaining < 0 then
+        admitted = 0
+    end
+    checks[i] = check
+end
+
+local reply = {admitted}
+for i, check in ipairs(checks) do
+    if admitted == 1 then
+        if check.algorithm == "token_bucket" then
+            redis.call("HSET", check.key, "tokens", check.tokens - 1, "ts", now)
+            redis.call("PEXPIRE", check.key, check.window)
+        else
+            redis.call("HINCRBY", check.key, check.index, 1)
+            redis.call("HDEL", check.key, check.index - 2)
+            redis.call("PEXPIRE", check.key, check.window * 2)
+        end
+    end
+    table.insert(reply, math.max(math.floor(check.remaining), 0))
+    table.insert(reply, math.ceil(check.reset))
+    table.insert(reply, math.max(math.ceil(check.retry), 0))
+end
+return reply
+"""
+
+class RateLimit(NamedTuple):
+    limit: int
+    window: int  # seconds
+    algorithm: str = SLIDING_WINDOW
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: RateLimit  # the most constraining window
+    remaining: int
+    reset_after: float  # seconds until that window has fully recovered
+    retry_after: float  # seconds until a request would be admitted
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+            "X-RateLimit-Policy": f"{self.limit.limit};w={self.limit.window};algorithm={self.limit.algorithm}"
+        }
+
+class KeyLookupLimitExceeded(RateLimitError):
+    """Raised when a client resolves too many uncached API keys."""
+    def __init__(self, result: RateLimitResult):
+        self.result = result
+        super().__init__("Too many API key lookups. Please try again later.")
+
+class RateLimiter:
+    """Checks and counts a request against several windows in one script call."""
+
+    def __init__(self, prefix: str = "rate_limit"):
+        self.prefix = prefix
+        self._script = redis_client.redis.register_script(_RATE_LIMIT_SCRIPT)
+
+    async def hit(self, identity: str, limits: Sequence[RateLimit]) -> RateLimitResult:
+        keys = [
+            f"{self.prefix}:{identity}:{limit.algorithm}:{limit.window}"
+            for limit in limits
+        ]
+        args = []
+        for limit in limits:
+            args.extend([limit.algorithm, limit.limit, limit.window * 1000])
+
+        reply = await self._script(keys=keys, args=args)
+        allowed = bool(reply[0])
+        results = [
+            RateLimitResult(
+                allowed,
+                limit,
+                int(reply[i * 3 + 1]),
+                reply[i * 3 + 2] / 1000,
+                reply[i * 3 + 3] / 1000
+            )
+            for i, limit in enumerate(limits)
+        ]
+
+        if not allowed:
+            # Report the window that keeps the caller waiting longest
+            return max(
+                (result for result in results if result.retry_after > 0),
+                key=lambda result: result.retry_after,
+                default=results[0]
+            )
+        return min(results, key=lambda result: result.remaining)
+
+def default_limits(overrides: Optional[RateLimitSettings] = None) -> List[RateLimit]:
+    overrides = overrides or RateLimitSettings()
+    algorithm = overrides.algorithm or settings.RATE_LIMIT_ALGORITHM
+    return [
+        RateLimit(overrides.requests_per_minute or settings.RATE_LIMIT_PER_MINUTE, 60, algorithm),
+        RateLimit(overrides.requests_per_hour or settings.RATE_LIMIT_PER_HOUR, 3600, algorithm)
+    ]
+
+async def rate_limit_policy(
+    api_key: str,
+    client_ip: str = "unknown"
+) -> Tuple[str, List[RateLimit]]:
+    """The identity to count requests under and the windows that apply.
+
+    The key is first resolved to its instance. Misses are cached too, and
+    each client may resolve only RATE_LIMIT_KEY_LOOKUPS_PER_MINUTE uncached
+    keys, so cycling through made-up keys cannot turn every request into a
+    database query. The instance's limits are cached under its
+    ``instance:`` tag and follow settings changes at once.
+    """
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+
+    async def find_instance() -> Optional[str]:
+        result = await rate_limiter.hit(
+            f"key_lookup:{client_ip}",
+            [RateLimit(settings.RATE_LIMIT_KEY_LOOKUPS_PER_MINUTE, 60)]
+        )
+        if not result.allowed:
+            raise KeyLookupLimitExceeded(result)
+        async with AsyncSessionLocal() as db:
+            instance = await InstanceService(db).get_instance_by_api_key(api_key)
+        return str(instance.id) if instance else None
+
+    instance_id = await cache_manager.get_or_set(
+        f"rate_limit_key:{key_hash}",
+        find_instance,
+        settings.RATE_LIMIT_POLICY_TTL
+    )
+    if instance_id is None:
+        # Unknown keys are still limited, under the server defaults
+        return f"key:{key_hash}", default_limits()
+
+    async def load() -> List[RateLimit]:
+        try:
+            async with AsyncSessionLocal() as db:
+                instance = await InstanceService(db).get_instance(UUID(instance_id))
+        except InstanceNotFoundException:
+            # Deleted since its key was resolved
+            return default_limits()
+        try:
+            overrides = RateLimitSettings(**(instance.settings.get("rate_limits") or {}))
+        except ValidationError as e:
+            logger.warning(f"Invalid rate limits for instance {instance_id}: {str(e)}")
+            overrides = None
+        return default_limits(overrides)
+
+    limits = await cache_manager.get_or_set(
+        f"rate_limit_policy:{instance_id}",
+        load,
+        settings.RATE_LIMIT_POLICY_TTL,
+        tags=[f"instance:{instance_id}"]
+    )
+    return f"instance:{instance_id}", [RateLimit(*limit) for limit in limits]
+
+rate_limiter = RateLimiter()
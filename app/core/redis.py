@@ -1,4 +1,4 @@
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List, Sequence, Tuple
 import json
 from redis import asyncio as aioredis
 from fastapi import HTTPException
@@ -7,13 +7,48 @@ from app.core.config import get_settings
 
 settings = get_settings()
 
+# INCR with the TTL set in the same step, so no key is ever left without one
+_INCREMENT_SCRIPT = """
+local current = redis.call("INCR", KEYS[1])
+if current == 1 or redis.call("PTTL", KEYS[1]) == -1 then
+    redis.call("PEXPIRE", KEYS[1], ARGV[1])
+end
+return current
+"""
+
+# Return the cached value, or take the lease to compute it if it is missing
+_GET_OR_LEASE_SCRIPT = """
+local value = redis.call("GET", KEYS[1])
+if value then
+    return {value, 0}
+end
+if redis.call("SET", KEYS[2], ARGV[1], "NX", "PX", ARGV[2]) then
+    return {false, 1}
+end
+return {false, 0}
+"""
+
 class RedisClient:
+    """Async Redis access shared by the application.
+
+    Multi-step operations run as server-side Lua scripts, which are atomic
+    and cost one round trip; ``mget``/``mset_with_ttl`` and their bytes
+    variants pipeline many keys into one round trip.
+    """
+    
     def __init__(self):
         self.redis = aioredis.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
             decode_responses=True
         )
+        # Separate connection for binary payloads (packed arrays, compressed blobs)
+        self.raw = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False
+        )
+        self._increment = self.redis.register_script(_INCREMENT_SCRIPT)
+        self._get_or_lease = self.raw.register_script(_GET_OR_LEASE_SCRIPT)
     
     async def set_with_ttl(
         self,
@@ -30,6 +65,61 @@ class RedisClient:
     async def get(self, key: str) -> Optional[str]:
         return await self.redis.get(key)
     
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        return await self.raw.get(key)
+    
+    async def mget(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return await self.redis.mget(keys)
+    
+    async def mget_bytes(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self.raw.mget(keys)
+    
+    async def mset_with_ttl(self, values: Dict[str, Any], ttl_seconds: int) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.setex(
+                    key,
+                    ttl_seconds,
+                    value if isinstance(value, str) else json.dumps(value)
+                )
+            await pipe.execute()
+    
+    async def mset_bytes_with_ttl(self, values: Dict[str, bytes], ttl_seconds: int) -> None:
+        async with self.raw.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.setex(key, ttl_seconds, value)
+            await pipe.execute()
+    
+    async def get_bytes_or_lease(
+        self,
+        key: str,
+        lease_key: str,
+        token: str,
+        lease_ttl_ms: int
+    ) -> Tuple[Optional[bytes], bool]:
+        """Return ``key``'s value, or take ``lease_key`` if it is missing.
+
+        The second element is True when this caller now holds the lease and
+        should compute the value.
+        """
+        value, leased = await self._get_or_lease(
+            keys=[key, lease_key],
+            args=[token, lease_ttl_ms]
+        )
+        return value, bool(leased)
+    
+    async def set_bytes_with_ttl(
+        self,
+        key: str,
+        value: bytes,
+        ttl_seconds: int
+    ) -> None:
+        await self.raw.setex(key, ttl_seconds, value)
+    
     async def delete(self, key: str) -> None:
         await self.redis.delete(key)
     
@@ -39,9 +129,7 @@ class RedisClient:
         ttl_seconds: int,
         max_requests: int
     ) -> bool:
-        current = await self.redis.incr(key)
-        if current == 1:
-            await self.redis.expire(key, ttl_seconds)
+        current = await self._increment(keys=[key], args=[ttl_seconds * 1000])
         return current <= max_requests
 
 redis_client = RedisClient() 
\ No newline at end of file
@@ -0,0 +1,215 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import time
+from uuid import uuid4
+
+from redis.exceptions import RedisError
+
+from app.core.admission import current_priority
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import SINGLE_FLIGHT_REQUESTS
+from app.core.redis import redis_client
+
+settings = get_settings()
+
+# Delete the lease only if this worker still holds it
+_RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """De-duplicates concurrent computations of the same key.
+
+    Within a process, callers for a key that is already being computed await
+    the leader's future. Across workers, a Redis lease elects one leader and
+    the others wait for a pub/sub notification, then read the shared result
+    through ``load`` instead of computing it again.
+
+    Flights are per admission lane: a batch leader may wait a long time for
+    an LLM slot, so interactive callers never follow one.
+    """
+
+    def __init__(
+        self,
+        lease_ttl: float = 90.0,
+        wait_timeout: float = 90.0
+    ):
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_lease(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Read the cached bytes of ``key``; on a miss, also take its lease.
+
+        Both happen in one round trip. Returns the value and, if this caller
+        took the lease, the token to pass to ``do``.
+        """
+        token = uuid4().hex
+        value, leased = await redis_client.get_bytes_or_lease(
+            key,
+            self._lease_key(self._flight_key(key)),
+            token,
+            int(self.lease_ttl * 1000)
+        )
+        return value, token if leased else None
+
+    async def do(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        load: Callable[[], Awaitable[Optional[Any]]],
+        token: Optional[str] = None
+    ) -> Any:
+        """Return the result for ``key``, computing it at most once.
+
+        ``compute`` must produce the value and store it where ``load`` can
+        read it; ``load`` returns None while no result is available. Pass
+        the ``token`` from ``get_or_lease`` when the lease is already held.
+        """
+        key = self._flight_key(key)
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+
+            if token is not None:
+                # A local leader runs without a Redis lease; give ours back
+                await self._release(self._lease_key(key), self._channel(key), token)
+                token = None
+            SINGLE_FLIGHT_REQUESTS.labels(role="local_follower").inc()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: try to take over
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_distributed(key, compute, load, token)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers receive the exception; avoid "never retrieved" warnings
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _do_distributed(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        load: Callable[[], Awaitable[Optional[Any]]],
+        token: Optional[str] = None
+    ) -> Any:
+        lease_key = self._lease_key(key)
+        channel = self._channel(key)
+
+        if token is not None:
+            acquired = True
+        else:
+            token = uuid4().hex
+            try:
+                acquired = await redis_client.redis.set(
+                    lease_key,
+                    token,
+                    nx=True,
+                    px=int(self.lease_ttl * 1000)
+                )
+            except RedisError as e:
+                # Without Redis we can only de-duplicate within this process
+                logger.warning(f"Single-flight lease unavailable: {str(e)}")
+                acquired = True
+                token = None
+
+        if acquired:
+            SINGLE_FLIGHT_REQUESTS.labels(role="leader").inc()
+            try:
+                return await compute()
+            finally:
+                if token is not None:
+                    await self._release(lease_key, channel, token)
+
+        SINGLE_FLIGHT_REQUESTS.labels(role="remote_follower").inc()
+        result = await self._wait_for_leader(lease_key, channel, load)
+        if result is not None:
+            return result
+
+        # The leader failed or is too slow; compute ourselves
+        SINGLE_FLIGHT_REQUESTS.labels(role="fallback").inc()
+        return await compute()
+
+    async def _wait_for_leader(
+        self,
+        lease_key: str,
+        channel: str,
+        load: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        deadline = time.monotonic() + self.wait_timeout
+        pubsub = redis_client.redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+
+            while True:
+                # Check after subscribing so a notification sent in between
+                # is not missed
+                result = await load()
+                if result is not None:
+                    return result
+                if not await redis_client.redis.exists(lease_key):
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=min(remaining, 1.0)
+                )
+        except RedisError as e:
+            logger.warning(f"Single-flight wait failed: {str(e)}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+            except RedisError:
+                pass
+
+    @staticmethod
+    def _flight_key(key: str) -> str:
+        return f"{current_priority()}:{key}"
+
+    @staticmethod
+    def _lease_key(key: str) -> str:
+        return f"singleflight:lease:{key}"
+
+    @staticmethod
+    def _channel(key: str) -> str:
+        return f"singleflight:done:{key}"
+
+    async def _release(self, lease_key: str, channel: str, token: str) -> None:
+        try:
+            await redis_client.redis.eval(_RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+            await redis_client.redis.publish(channel, "done")
+        except RedisError as e:
+            logger.warning(f"Single-flight release failed: {str(e)}")
+
+single_flight = SingleFlight(
+    lease_ttl=settings.SINGLE_FLIGHT_LEASE_TTL,
+    wait_timeout=settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+)
@@ -1,11 +1,18 @@
+from datetime import datetime, timezone
+
 from fastapi import FastAPI
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
 from app.core.database import AsyncSessionLocal
+from app.services.backend_pool import backend_pool
+from app.services.chat_retention_service import ChatRetentionService
 from app.services.session_service import SessionService
 
+settings = get_settings()
+
 scheduler = AsyncIOScheduler()
 
 async def cleanup_expired_sessions():
@@ -13,6 +20,29 @@ async def cleanup_expired_sessions():
         session_service = SessionService(db)
         await session_service.cleanup_expired_sessions()
 
+def _chat_retention_service(db: AsyncSession) -> ChatRetentionService:
+    return ChatRetentionService(
+        db,
+        max_retention_days=settings.CHAT_RETENTION_MAX_DAYS,
+        partitions_ahead=settings.CHAT_PARTITIONS_AHEAD,
+        batch_size=settings.CHAT_PURGE_BATCH_SIZE,
+        pause=settings.CHAT_PURGE_PAUSE,
+        lock_timeout=settings.CHAT_PARTITION_LOCK_TIMEOUT
+    )
+
+async def maintain_chat_partitions():
+    async with AsyncSessionLocal() as db:
+        retention_service = _chat_retention_service(db)
+        await retention_service.ensure_partitions()
+        await retention_service.drop_expired_partitions()
+
+async def purge_expired_chat_data():
+    async with AsyncSessionLocal() as db:
+        await _chat_retention_service(db).purge_expired()
+
+async def probe_ollama_backends():
+    await backend_pool.probe()
+
 def setup_periodic_tasks(app: FastAPI):
     # Clean up expired sessions every hour
     scheduler.add_job(
@@ -22,6 +52,35 @@ def setup_periodic_tasks(app: FastAPI):
         name="Clean up expired sessions",
         replace_existing=True
     )
+    
+    # Create upcoming chat partitions and drop expired ones, also at startup
+    scheduler.add_job(
+        maintain_chat_partitions,
+        trigger=IntervalTrigger(hours=6),
+        id="maintain_chat_partitions",
+        name="Maintain chat message partitions",
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True
+    )
+    
+    # Purge chat data past shorter per-instance retention periods
+    scheduler.add_job(
+        purge_expired_chat_data,
+        trigger=IntervalTrigger(hours=1),
+        id="purge_expired_chat_data",
+        name="Purge expired chat data",
+        max_instances=1,
+        replace_existing=True
+    )
+    
+    # Health-check Ollama backends and refresh their loaded models
+    scheduler.add_job(
+        probe_ollama_backends,
+        trigger=IntervalTrigger(seconds=settings.OLLAMA_HEALTH_CHECK_INTERVAL),
+        id="probe_ollama_backends",
+        name="Probe Ollama backends",
+        replace_existing=True
+    )
 
     @app.on_event("startup")
     async def start_scheduler():
@@ -6,9 +6,14 @@ from app.core.docs import setup_docs
 from app.core.logging import RequestLoggingMiddleware, logger
 from app.core.exceptions import setup_exception_handlers
 from app.core.middleware import RateLimitMiddleware
-from app.api.routes import chat_routes, instance_routes, api_key_routes, auth_routes, profile_routes
+from app.api.routes import chat_routes, instance_routes, api_key_routes, auth_routes, profile_routes, admin_routes
 from app.core.config import get_settings
 from app.core.tasks import setup_periodic_tasks
+from app.core.http_client import ollama_http_client
+from app.core.background import cancel_background_tasks, run_in_background
+from app.core.cache import cache_manager
+from app.services.cache_warmer import cache_warmer
+from app.services.message_writer import message_writer
 
 settings = get_settings()
 
@@ -76,13 +81,32 @@ app.include_router(
     tags=["profiles"]
 )
 
+app.include_router(
+    admin_routes.router,
+    prefix=f"{settings.API_V1_STR}/admin",
+    tags=["admin"]
+)
+
 # Setup periodic tasks
 setup_periodic_tasks(app)
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application starting up")
+    if settings.MESSAGE_WRITE_BEHIND:
+        run_in_background(message_writer.run(), name="message_writer")
+    run_in_background(
+        cache_manager.listen_for_invalidations(),
+        name="cache_invalidation_listener"
+    )
+    if settings.CACHE_WARMUP_ENABLED:
+        run_in_background(
+            cache_warmer.warm_all(delay=settings.CACHE_WARMUP_STARTUP_DELAY),
+            name="cache_warmup"
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("Application shutting down") 
\ No newline at end of file
+    logger.info("Application shutting down")
+    await cancel_background_tasks()
+    await ollama_http_client.aclose() 
\ No newline at end of file
@@ -25,4 +25,25 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     session_id: UUID
     response: str
-    context: Optional[Dict] = None 
\ No newline at end of file
+    context: Optional[Dict] = None
+
+class ChatStreamChunk(BaseModel):
+    session_id: UUID
+    delta: str = ""
+    done: bool = False
+    response: Optional[str] = None
+
+class ConversationSummary(BaseModel):
+    summary: str
+    covered_until: datetime = Field(..., description="Timestamp of the last summarized message")
+
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatRequest] = Field(..., min_items=1)
+    parallelism: Optional[int] = Field(None, ge=1, description="Messages processed concurrently")
+
+class ChatBatchResult(BaseModel):
+    index: int = Field(..., description="Position of the message in the request")
+    status: str = Field(..., description="success, shed or error")
+    session_id: Optional[UUID] = None
+    response: Optional[str] = None
+    error: Optional[str] = None
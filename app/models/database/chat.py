@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, BigInteger, Text, Index, DDL, event
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 import uuid
 from datetime import datetime
@@ -7,10 +7,48 @@ from app.core.database import Base
 
 class DBChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_instance_id_updated_at", "instance_id", "updated_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     instance_id = Column(UUID(as_uuid=True), ForeignKey("instances.id"), nullable=False)
-    messages = Column(ARRAY(JSON), nullable=False, default=list)
-    metadata = Column(JSON, nullable=False, default=dict)
+    # Deprecated: messages live in chat_messages since migration 009
+    messages = Column(ARRAY(JSON), nullable=True, default=list)
+    # "metadata" is reserved on declarative models
+    session_metadata = Column("metadata", JSON, nullable=False, default=dict)
+    # Number of messages stored in chat_messages for this session
+    message_count = Column(BigInteger, nullable=False, default=0)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow) 
\ No newline at end of file
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DBChatMessage(Base):
+    """Chat message, stored in weekly range partitions on ``created_at``.
+
+    Partitions are named ``chat_messages_w<monday>`` and are created ahead of
+    time and dropped on expiry by ChatRetentionService.
+    """
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_instance_id_created_at", "instance_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    session_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    seq = Column(BigInteger, primary_key=True)
+    instance_id = Column(UUID(as_uuid=True), nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    # Part of the key because unique constraints must include the partition key
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+# Schemas built from metadata (tests) have no partition maintenance
+event.listen(
+    DBChatMessage.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS chat_messages_default PARTITION OF chat_messages DEFAULT")
+)
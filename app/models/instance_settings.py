@@ -53,6 +53,10 @@ class BehaviorSettings(BaseModel):
         default="I'm not sure I understand. Could you please rephrase your question or request?"
     )
     proactivity_level: Literal["low", "medium", "high"] = Field(default="medium")
+    model_routes: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description="Ollama models per route (greeting, concise, balanced, detailed), in fallback order"
+    )
 
 
 class ElementPermissionSettings(BaseModel):
@@ -113,6 +117,13 @@ class ComplianceSettings(BaseModel):
     require_consent: bool = Field(default=True)
 
 
+class RateLimitSettings(BaseModel):
+    """Request quotas for the instance's API key; unset values use the server defaults."""
+    requests_per_minute: Optional[int] = Field(default=None, ge=1)
+    requests_per_hour: Optional[int] = Field(default=None, ge=1)
+    algorithm: Optional[Literal["sliding_window", "token_bucket"]] = None
+
+
 class InstanceSettings(BaseModel):
     """Complete settings structure for an AI Agent instance."""
     version: str = Field(default="1.0")
@@ -123,6 +134,7 @@ class InstanceSettings(BaseModel):
     appearance: WidgetSettings = Field(default_factory=WidgetSettings)
     integration: IntegrationSettings = Field(default_factory=IntegrationSettings)
     compliance: ComplianceSettings = Field(default_factory=ComplianceSettings)
+    rate_limits: RateLimitSettings = Field(default_factory=RateLimitSettings)
 
     class Config:
         use_enum_values = True
@@ -9,6 +9,6 @@ class WebSocketMessage(BaseModel):
     metadata: Optional[Dict] = None
 
 class WebSocketResponse(BaseModel):
-    type: Literal["message", "typing", "error"]
+    type: Literal["message", "typing", "chunk", "error"]
     content: str
     metadata: Optional[Dict] = None 
\ No newline at end of file
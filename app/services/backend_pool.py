@@ -0,0 +1,227 @@
+from typing import AsyncIterator, List, Optional, Set
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+import httpx
+
+from app.core.admission import AdmissionController, get_admission_controller
+from app.core.config import get_settings
+from app.core.exceptions import LLMBackendException, LLMServiceException
+from app.core.http_client import ollama_http_client
+from app.core.logging import logger
+from app.core.metrics import (
+    LLM_BACKEND_OUTSTANDING,
+    LLM_BACKEND_REQUESTS,
+    LLM_BACKEND_STATE
+)
+
+settings = get_settings()
+
+class CircuitBreaker:
+    """Ejects a failing backend and readmits it gradually.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and no
+    traffic is routed to the backend. Once ``recovery_timeout`` has passed it
+    goes half-open and admits a single trial request (or health probe). A
+    success closes it again, after which its routing weight ramps linearly
+    from 10% to 100% over ``ramp_up_period`` seconds.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        ramp_up_period: float = 60.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.ramp_up_period = ramp_up_period
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._closed_at = 0.0
+        self._trial_in_progress = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        # Half-open: let exactly one trial through at a time
+        return not self._trial_in_progress
+
+    def on_request_start(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._trial_in_progress = True
+
+    def record_ignored(self) -> None:
+        """End a request whose outcome says nothing about backend health."""
+        self._trial_in_progress = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._trial_in_progress = False
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self._closed_at = time.monotonic()
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_progress = False
+        if (
+            self.state == self.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    @property
+    def weight(self) -> float:
+        """Routing weight in (0, 1]; low right after readmission."""
+        if self.state != self.CLOSED:
+            return 0.1
+        if not self._closed_at or self.ramp_up_period <= 0:
+            return 1.0
+        elapsed = time.monotonic() - self._closed_at
+        return min(1.0, 0.1 + 0.9 * elapsed / self.ramp_up_period)
+
+class OllamaBackend:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.admission: AdmissionController = get_admission_controller(self.url)
+        self.outstanding = 0
+        # Models reported by the last successful health probe
+        self.models: Set[str] = set()
+
+    def has_model(self, model: str) -> bool:
+        return model in self.models or f"{model}:latest" in self.models
+
+    def score(self, model: Optional[str], model_miss_penalty: float) -> float:
+        """Lower is better: outstanding requests scaled by weight and model fit."""
+        score = (self.outstanding + 1) / self.breaker.weight
+        # Steer retries away from a backend that just failed
+        score *= 1 + self.breaker.consecutive_failures
+        if model and self.models and not self.has_model(model):
+            score *= model_miss_penalty
+        return score
+
+class BackendPool:
+    """Routes Ollama requests across backends by least outstanding requests."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        ramp_up_period: float = 60.0,
+        model_miss_penalty: float = 4.0
+    ):
+        self.model_miss_penalty = model_miss_penalty
+        self.backends = [
+            OllamaBackend(
+                url,
+                CircuitBreaker(failure_threshold, recovery_timeout, ramp_up_period)
+            )
+            for url in urls
+        ]
+
+    def select(self, model: Optional[str] = None) -> OllamaBackend:
+        candidates = [
+            backend for backend in self.backends
+            if backend.breaker.allow_request()
+        ]
+        if not candidates:
+            raise LLMServiceException("No healthy Ollama backends available")
+
+        return min(
+            candidates,
+            key=lambda backend: backend.score(model, self.model_miss_penalty)
+        )
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        model: Optional[str] = None,
+        track_health: bool = True
+    ) -> AsyncIterator[OllamaBackend]:
+        """Pick a backend for one request and record its outcome.
+
+        Only connection errors, timeouts and Ollama server errors count as
+        failures. Requests made with ``track_health=False`` never move the
+        breaker, so auxiliary calls cannot eject a backend from generation.
+        """
+        backend = self.select(model)
+        if track_health:
+            backend.breaker.on_request_start()
+        backend.outstanding += 1
+        self._update_gauges(backend)
+        try:
+            yield backend
+        except (httpx.TransportError, LLMBackendException):
+            if track_health:
+                backend.breaker.record_failure()
+            LLM_BACKEND_REQUESTS.labels(backend=backend.url, result="failure").inc()
+            raise
+        except BaseException:
+            # Shedding, cancellation and rejected requests (unknown model,
+            # bad payload) say nothing about backend health
+            if track_health:
+                backend.breaker.record_ignored()
+            raise
+        else:
+            if track_health:
+                backend.breaker.record_success()
+            LLM_BACKEND_REQUESTS.labels(backend=backend.url, result="success").inc()
+        finally:
+            backend.outstanding -= 1
+            self._update_gauges(backend)
+
+    async def probe(self) -> None:
+        """Health-check every backend and refresh its model list."""
+        await asyncio.gather(*[self._probe(backend) for backend in self.backends])
+
+    async def _probe(self, backend: OllamaBackend) -> None:
+        if backend.breaker.state == CircuitBreaker.OPEN and not backend.breaker.allow_request():
+            return
+
+        try:
+            response = await ollama_http_client.client.get(f"{backend.url}/api/tags")
+            response.raise_for_status()
+            backend.models = {
+                model["name"] for model in response.json().get("models", [])
+            }
+            backend.breaker.record_success()
+        except Exception as e:
+            logger.warning(
+                "Ollama backend health probe failed",
+                extra={"backend": backend.url, "error": str(e)}
+            )
+            backend.breaker.record_failure()
+        finally:
+            self._update_gauges(backend)
+
+    def _update_gauges(self, backend: OllamaBackend) -> None:
+        LLM_BACKEND_OUTSTANDING.labels(backend=backend.url).set(backend.outstanding)
+        LLM_BACKEND_STATE.labels(backend=backend.url).set(
+            {
+                CircuitBreaker.CLOSED: 0,
+                CircuitBreaker.HALF_OPEN: 1,
+                CircuitBreaker.OPEN: 2
+            }[backend.breaker.state]
+        )
+
+backend_pool = BackendPool(
+    settings.OLLAMA_BASE_URLS or [settings.OLLAMA_BASE_URL],
+    failure_threshold=settings.OLLAMA_CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.OLLAMA_CIRCUIT_RECOVERY_TIMEOUT,
+    ramp_up_period=settings.OLLAMA_CIRCUIT_RAMP_UP,
+    model_miss_penalty=settings.OLLAMA_MODEL_MISS_PENALTY
+)
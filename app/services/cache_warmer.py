@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional, Set
+from datetime import datetime, timedelta
+from uuid import UUID
+import asyncio
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.core.admission import BATCH, priority
+from app.core.background import run_in_background
+from app.core.cache import cache_manager
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import logger
+from app.core.metrics import (
+    CACHE_WARMUP_GENERATION_SECONDS,
+    CACHE_WARMUP_PENDING,
+    CACHE_WARMUP_QUESTIONS
+)
+from app.core.redis import redis_client
+from app.models.database.instance import DBInstance
+from app.services.chat_message_repository import ChatMessageRepository
+from app.services.chat_service import ChatService
+from app.services.semantic_cache import normalize_message
+
+settings = get_settings()
+
+class CacheWarmer:
+    """Pre-generates cached replies to each instance's most asked questions.
+
+    Questions are the most frequent user messages of the last
+    ``lookback_hours``. Replies are generated on the batch admission lane,
+    at most ``concurrency`` at a time, into the cache entries live requests
+    read, so warmed answers are served as ordinary cache hits. Warm-ups are
+    counted by CACHE_WARMUP_QUESTIONS, not as chat messages. A
+    Redis lease per instance keeps workers from warming the same instance
+    at the same time after a deploy or settings change.
+    """
+
+    def __init__(
+        self,
+        top_questions: int = 20,
+        lookback_hours: int = 24,
+        concurrency: int = 2,
+        lease_ttl: int = 600
+    ):
+        self.top_questions = top_questions
+        self.lookback_hours = lookback_hours
+        self.concurrency = concurrency
+        self.lease_ttl = lease_ttl
+        self._chat_service: Optional[ChatService] = None
+        self._running: Set[UUID] = set()
+
+    @property
+    def chat_service(self) -> ChatService:
+        if self._chat_service is None:
+            self._chat_service = ChatService()
+        return self._chat_service
+
+    def schedule(self, instance_id: UUID) -> None:
+        """Warm one instance in the background unless it is already warming."""
+        if instance_id in self._running:
+            return
+        self._running.add(instance_id)
+        task = run_in_background(self.warm_instance(instance_id), name=f"cache_warmup:{instance_id}")
+        task.add_done_callback(lambda _: self._running.discard(instance_id))
+
+    async def warm_all(self, delay: float = 0.0) -> None:
+        """Warm every active instance, after ``delay`` seconds."""
+        await asyncio.sleep(delay)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(DBInstance.id).where(DBInstance.is_active == True)
+            )
+            instance_ids = list(result.scalars().all())
+        for instance_id in instance_ids:
+            self.schedule(instance_id)
+
+    async def warm_instance(self, instance_id: UUID) -> Dict[str, int]:
+        if not await self._acquire_lease(instance_id):
+            return {}
+        try:
+            return await self._warm(instance_id)
+        finally:
+            await self._release_lease(instance_id)
+
+    async def _warm(self, instance_id: UUID) -> Dict[str, int]:
+        questions = await self._questions(instance_id)
+        results = {"generated": 0, "cached": 0, "failed": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        CACHE_WARMUP_PENDING.inc(len(questions))
+
+        async def warm(question: str) -> None:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    generated = await self.chat_service.warm_reply(instance_id, question)
+                except Exception as e:
+                    logger.warning(f"Cache warm-up failed for instance {instance_id}: {str(e)}")
+                    result = "failed"
+                else:
+                    result = "generated" if generated else "cached"
+                    if generated:
+                        # Time the first user asking this would have waited
+                        CACHE_WARMUP_GENERATION_SECONDS.inc(time.monotonic() - started)
+                finally:
+                    CACHE_WARMUP_PENDING.dec()
+                results[result] += 1
+                CACHE_WARMUP_QUESTIONS.labels(result=result).inc()
+
+        with priority(BATCH):
+            await asyncio.gather(*[warm(question) for question in questions])
+
+        logger.info(
+            f"Cache warm-up for instance {instance_id}: "
+            + ", ".join(f"{count} {result}" for result, count in results.items())
+        )
+        return results
+
+    async def _questions(self, instance_id: UUID) -> List[str]:
+        since = datetime.utcnow() - timedelta(hours=self.lookback_hours)
+        async with AsyncSessionLocal() as db:
+            active = await db.scalar(
+                select(DBInstance.is_active).where(DBInstance.id == instance_id)
+            )
+            if not active:
+                # Deleted or deactivated since the warm-up was scheduled
+                return []
+            # Fetch extra rows: variants differing in punctuation share a key
+            rows = await ChatMessageRepository(db).top_user_messages(
+                instance_id,
+                since,
+                self.top_questions * 2
+            )
+
+        counts: Dict[str, int] = {}
+        representative: Dict[str, str] = {}
+        for message, count in rows:
+            key = normalize_message(message)
+            if not key:
+                continue
+            counts[key] = counts.get(key, 0) + count
+            representative.setdefault(key, message)
+
+        ranked = sorted(counts, key=counts.get, reverse=True)[:self.top_questions]
+        return [representative[key] for key in ranked]
+
+    async def _acquire_lease(self, instance_id: UUID) -> bool:
+        try:
+            return bool(await redis_client.redis.set(
+                self._lease_key(instance_id),
+                "1",
+                nx=True,
+                ex=self.lease_ttl
+            ))
+        except RedisError as e:
+            logger.warning(f"Cache warm-up lease unavailable: {str(e)}")
+            return False
+
+    async def _release_lease(self, instance_id: UUID) -> None:
+        # Later runs find warmed replies cached and generate nothing
+        try:
+            await redis_client.redis.delete(self._lease_key(instance_id))
+        except RedisError as e:
+            logger.warning(f"Could not release cache warm-up lease: {str(e)}")
+
+    @staticmethod
+    def _lease_key(instance_id: UUID) -> str:
+        return f"cache_warmup:lease:{instance_id}"
+
+cache_warmer = CacheWarmer(
+    top_questions=settings.CACHE_WARMUP_TOP_QUESTIONS,
+    lookback_hours=settings.CACHE_WARMUP_LOOKBACK_HOURS,
+    concurrency=settings.CACHE_WARMUP_CONCURRENCY
+)
+
+def _warm_instance(tag: str) -> None:
+    # The instance's settings changed and its cached replies were retired
+    kind, _, instance_id = tag.partition(":")
+    if kind == "instance":
+        cache_warmer.schedule(UUID(instance_id))
+
+if settings.CACHE_WARMUP_ENABLED:
+    cache_manager.on_tag_invalidated(_warm_instance)
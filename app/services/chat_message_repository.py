@@ -0,0 +1,218 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from collections import Counter
+from datetime import datetime
+import random
+import time
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import Message
+from app.models.database.chat import DBChatMessage, DBChatSession
+
+# Rows per INSERT; keeps statements far below Postgres's 32767 bind parameters
+_INSERT_CHUNK_ROWS = 1000
+
+def message_seq(millis: int, counter: int, index: int) -> int:
+    """Seq of the ``index``-th message of a write made at ``millis`` (epoch ms).
+
+    Both the synchronous and the write-behind path number messages this
+    way, so seqs follow write order within a session whichever path wrote
+    them. ``counter`` tells apart writes in the same millisecond and the low
+    4 bits number the messages of one write. Seqs allocated before this
+    scheme are small integers and sort before every derived seq.
+    """
+    return (millis << 20) | ((counter & 0xFFFF) << 4) | (index & 0xF)
+
+class ChatMessageRepository:
+    """Append-only storage of chat messages in ``chat_messages``.
+
+    Messages are numbered with time-derived seqs (see ``message_seq``), so
+    an append costs one session upsert and one insert regardless of
+    conversation length, and the newest messages are read from the
+    ``(session_id, seq)`` primary key. Seqs are ordered but not gapless;
+    ``chat_sessions.message_count`` counts the stored messages.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def append(
+        self,
+        session_id: UUID,
+        instance_id: UUID,
+        messages: Sequence[Message]
+    ) -> int:
+        """Append messages to a session; returns the seq of the last one."""
+        return (await self.append_many([(session_id, instance_id, messages)]))[session_id]
+
+    async def append_many(
+        self,
+        batches: Sequence[Tuple[UUID, UUID, Sequence[Message]]]
+    ) -> Dict[UUID, int]:
+        """Append messages for several sessions with a single bulk insert.
+
+        The caller commits. Returns the last allocated seq per session.
+        """
+        rows = []
+        last_seq: Dict[UUID, int] = {}
+        millis = int(time.time() * 1000)
+        for session_id, instance_id, messages in batches:
+            if not messages:
+                continue
+            await self._count(session_id, instance_id, len(messages))
+            counter = random.getrandbits(16)
+            seqs = [
+                # Writes longer than 16 messages continue on the next counter
+                message_seq(millis, counter + offset // 16, offset % 16)
+                for offset in range(len(messages))
+            ]
+            rows.extend(
+                {
+                    "session_id": session_id,
+                    "seq": seq,
+                    "instance_id": instance_id,
+                    "role": message.role,
+                    "content": message.content,
+                    "created_at": message.timestamp
+                }
+                for seq, message in zip(seqs, messages)
+            )
+            last_seq[session_id] = seqs[-1]
+
+        if rows:
+            await self.db.execute(insert(DBChatMessage), rows)
+        return last_seq
+
+    async def insert_messages(self, rows: Sequence[Dict[str, Any]]) -> Dict[UUID, int]:
+        """Insert rows that already carry their ``seq``, skipping duplicates.
+
+        Used for redelivered writes: a row whose (session_id, seq,
+        created_at) exists is ignored, so replaying a batch is harmless. Sessions are created as
+        needed. The caller commits. Returns rows inserted per session.
+        """
+        if not rows:
+            return {}
+
+        now = datetime.utcnow()
+        sessions = list({row["session_id"]: row["instance_id"] for row in rows}.items())
+        for chunk in _chunks(sessions):
+            session_upsert = pg_insert(DBChatSession).values([
+                {
+                    "id": session_id,
+                    "instance_id": instance_id,
+                    "session_metadata": {},
+                    "message_count": 0,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for session_id, instance_id in chunk
+            ])
+            await self.db.execute(
+                session_upsert.on_conflict_do_update(
+                    index_elements=[DBChatSession.id],
+                    set_={"updated_at": session_upsert.excluded.updated_at}
+                )
+            )
+
+        inserted: Counter = Counter()
+        for chunk in _chunks(list(rows)):
+            statement = (
+                pg_insert(DBChatMessage)
+                .values(chunk)
+                .on_conflict_do_nothing(
+                    index_elements=[DBChatMessage.session_id, DBChatMessage.seq, DBChatMessage.created_at]
+                )
+                .returning(DBChatMessage.session_id)
+            )
+            result = await self.db.execute(statement)
+            inserted.update(result.scalars().all())
+
+        if inserted:
+            # Core table statement: executemany without ORM bulk semantics
+            sessions_table = DBChatSession.__table__
+            await self.db.execute(
+                update(sessions_table)
+                .where(sessions_table.c.id == bindparam("session"))
+                .values(message_count=sessions_table.c.message_count + bindparam("count")),
+                [
+                    {"session": session_id, "count": count}
+                    for session_id, count in inserted.items()
+                ]
+            )
+        return dict(inserted)
+
+    async def last_messages(
+        self,
+        session_id: UUID,
+        limit: int,
+        before_seq: Optional[int] = None
+    ) -> List[DBChatMessage]:
+        """Return up to ``limit`` messages before ``before_seq``, oldest first.
+
+        Pass the seq of the oldest returned message as ``before_seq`` to page
+        further back.
+        """
+        query = select(DBChatMessage).where(DBChatMessage.session_id == session_id)
+        if before_seq is not None:
+            query = query.where(DBChatMessage.seq < before_seq)
+        query = query.order_by(DBChatMessage.seq.desc()).limit(limit)
+
+        result = await self.db.execute(query)
+        return list(reversed(result.scalars().all()))
+
+    async def top_user_messages(
+        self,
+        instance_id: UUID,
+        since: datetime,
+        limit: int
+    ) -> List[Tuple[str, int]]:
+        """Most frequent user messages of an instance since ``since``.
+
+        Messages differing only in case or surrounding whitespace are
+        counted together. Returns ``(message, count)``, most frequent first.
+        """
+        normalized = func.lower(func.btrim(DBChatMessage.content))
+        query = (
+            select(func.min(DBChatMessage.content), func.count())
+            .where(
+                DBChatMessage.instance_id == instance_id,
+                DBChatMessage.role == "user",
+                DBChatMessage.created_at >= since
+            )
+            .group_by(normalized)
+            .order_by(func.count().desc())
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return [(content, count) for content, count in result]
+
+    async def _count(self, session_id: UUID, instance_id: UUID, count: int) -> int:
+        # Upsert so sessions need not be created before their first message
+        now = datetime.utcnow()
+        statement = pg_insert(DBChatSession).values(
+            id=session_id,
+            instance_id=instance_id,
+            session_metadata={},
+            message_count=count,
+            created_at=now,
+            updated_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[DBChatSession.id],
+            set_={
+                "message_count": DBChatSession.message_count + count,
+                "updated_at": now
+            }
+        ).returning(DBChatSession.message_count)
+
+        result = await self.db.execute(statement)
+        return result.scalar_one()
+
+def _chunks(items: List[Any]) -> List[List[Any]]:
+    return [
+        items[start:start + _INSERT_CHUNK_ROWS]
+        for start in range(0, len(items), _INSERT_CHUNK_ROWS)
+    ]
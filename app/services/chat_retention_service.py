@@ -0,0 +1,263 @@
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from uuid import UUID
+import asyncio
+import re
+
+from sqlalchemy import delete, exists, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import CHAT_RETENTION_REMOVED
+from app.models.database.chat import DBChatMessage, DBChatSession
+from app.models.database.instance import DBInstance
+from app.models.instance_settings import ComplianceSettings
+
+settings = get_settings()
+
+PARTITION_WIDTH = timedelta(days=7)
+DEFAULT_PARTITION = "chat_messages_default"
+_PARTITION_NAME = re.compile(r"^chat_messages_w(\d{8})$")
+
+def partition_start(moment: datetime) -> date:
+    """Monday of the week holding ``moment``; partitions follow ISO weeks."""
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+def partition_name(start: date) -> str:
+    return f"chat_messages_w{start:%Y%m%d}"
+
+class ChatRetentionService:
+    """Enforces ``ComplianceSettings.data_retention_days`` on chat data.
+
+    ``chat_messages`` is range-partitioned by week. Messages older than every
+    instance's retention go away by dropping whole partitions, which costs no
+    row deletes or vacuum. Instances with a shorter retention are purged in
+    small committed chunks with a pause in between, so the purge never holds
+    long locks or produces a burst of dead tuples. Sessions are one small row
+    per conversation and are purged the same way, but only once their
+    messages are gone: deleting a session cascades to its messages row by
+    row, which is exactly the churn partition drops avoid.
+
+    Rows written while no weekly partition covered them land in the DEFAULT
+    partition; ``ensure_partitions`` creates their weeks and moves them out.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        max_retention_days: int = 365,
+        partitions_ahead: int = 4,
+        batch_size: int = 5000,
+        pause: float = 0.5,
+        lock_timeout: float = 5.0
+    ):
+        self.db = db
+        self.max_retention_days = max_retention_days
+        self.partitions_ahead = partitions_ahead
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lock_timeout = lock_timeout
+
+    async def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Create this week's partition and ``partitions_ahead`` more.
+
+        Weeks with rows in the DEFAULT partition get their partition too.
+        """
+        start = partition_start(now or datetime.utcnow())
+        weeks = {start + week * PARTITION_WIDTH for week in range(self.partitions_ahead + 1)}
+        has_default = await self._has_default_partition()
+        if has_default:
+            weeks.update(await self._default_partition_weeks())
+
+        existing = set(await self._partitions())
+        created = []
+        for day in sorted(weeks):
+            name = partition_name(day)
+            if name in existing:
+                continue
+            await self._create_partition(name, day, has_default)
+            created.append(name)
+        await self.db.commit()
+
+        if created:
+            logger.info(f"Created chat message partitions: {', '.join(created)}")
+        return created
+
+    async def drop_expired_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Drop partitions whose whole week is past every instance's retention."""
+        days = self._drop_days(await self._instance_retention())
+        cutoff = (now or datetime.utcnow()).date() - timedelta(days=days)
+
+        has_default = await self._has_default_partition()
+        dropped = []
+        for name, start in (await self._partitions()).items():
+            if start + PARTITION_WIDTH > cutoff:
+                continue
+            try:
+                # Dropping an attached partition would lock the whole table
+                await self._detach_partition(name, has_default)
+            except DBAPIError as e:
+                await self.db.rollback()
+                logger.warning(f"Could not detach {name}, retrying next run: {str(e)}")
+                continue
+            await self.db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            await self.db.commit()
+            dropped.append(name)
+
+        if dropped:
+            CHAT_RETENTION_REMOVED.labels(kind="partitions").inc(len(dropped))
+            logger.info(f"Dropped expired chat message partitions: {', '.join(dropped)}")
+        return dropped
+
+    async def purge_expired(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Delete chat data past each instance's own retention, in chunks."""
+        now = now or datetime.utcnow()
+        retention = await self._instance_retention()
+        drop_days = self._drop_days(retention)
+
+        removed = {"messages": 0, "sessions": 0}
+        for instance_id, days in retention.items():
+            cutoff = now - timedelta(days=min(days, self.max_retention_days))
+            if days < drop_days:
+                # Partition drops only cover the longest retention
+                removed["messages"] += await self._purge_messages(instance_id, cutoff)
+            removed["sessions"] += await self._purge_sessions(instance_id, cutoff)
+        return removed
+
+    def _drop_days(self, retention: Dict[UUID, int]) -> int:
+        # Whole partitions may go once every instance's retention has passed
+        return min(max(retention.values(), default=self.max_retention_days), self.max_retention_days)
+
+    async def _purge_messages(self, instance_id: UUID, cutoff: datetime) -> int:
+        # Partitioned tables have no unique ctid, so chunks are chosen by key
+        chunk = (
+            select(DBChatMessage.session_id, DBChatMessage.seq, DBChatMessage.created_at)
+            .where(
+                DBChatMessage.instance_id == instance_id,
+                DBChatMessage.created_at < cutoff
+            )
+            .limit(self.batch_size)
+            .subquery()
+        )
+        statement = delete(DBChatMessage).where(
+            DBChatMessage.session_id == chunk.c.session_id,
+            DBChatMessage.seq == chunk.c.seq,
+            DBChatMessage.created_at == chunk.c.created_at
+        )
+        return await self._delete_in_chunks(statement, "messages")
+
+    async def _purge_sessions(self, instance_id: UUID, cutoff: datetime) -> int:
+        # Sessions still holding messages wait for their partition to be
+        # dropped, so the delete never cascades
+        chunk = (
+            select(DBChatSession.id)
+            .where(
+                DBChatSession.instance_id == instance_id,
+                DBChatSession.updated_at < cutoff,
+                ~exists().where(DBChatMessage.session_id == DBChatSession.id)
+            )
+            .limit(self.batch_size)
+        )
+        statement = delete(DBChatSession).where(DBChatSession.id.in_(chunk))
+        return await self._delete_in_chunks(statement, "sessions")
+
+    async def _delete_in_chunks(self, statement, kind: str) -> int:
+        total = 0
+        while True:
+            result = await self.db.execute(
+                statement,
+                execution_options={"synchronize_session": False}
+            )
+            await self.db.commit()
+            total += result.rowcount
+            CHAT_RETENTION_REMOVED.labels(kind=kind).inc(result.rowcount)
+            if result.rowcount < self.batch_size:
+                return total
+            await asyncio.sleep(self.pause)
+
+    async def _create_partition(self, name: str, day: date, has_default: bool) -> None:
+        bounds = f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + PARTITION_WIDTH).isoformat()}')"
+        if not has_default:
+            await self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF chat_messages {bounds}"
+            ))
+            return
+
+        # Attaching fails while the DEFAULT partition holds rows of this week,
+        # so move them into the new table first
+        await self.db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} (LIKE chat_messages INCLUDING DEFAULTS)"
+        ))
+        await self.db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= '{day.isoformat()}'
+                  AND created_at < '{(day + PARTITION_WIDTH).isoformat()}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """))
+        await self.db.execute(text(f"ALTER TABLE chat_messages ATTACH PARTITION {name} {bounds}"))
+
+    async def _detach_partition(self, name: str, has_default: bool) -> None:
+        if has_default:
+            # Postgres refuses DETACH CONCURRENTLY next to a DEFAULT partition;
+            # give up quickly rather than queue every query behind the lock
+            await self.db.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout * 1000)}"))
+            await self.db.execute(text(f"ALTER TABLE chat_messages DETACH PARTITION {name}"))
+            await self.db.commit()
+            return
+
+        # CONCURRENTLY cannot run inside a transaction block, and waits for
+        # every open transaction, including this session's
+        await self.db.commit()
+        async with self.db.bind.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            await connection.execute(text(
+                f"ALTER TABLE chat_messages DETACH PARTITION {name} CONCURRENTLY"
+            ))
+
+    async def _has_default_partition(self) -> bool:
+        result = await self.db.execute(text(f"SELECT to_regclass('{DEFAULT_PARTITION}')"))
+        return result.scalar() is not None
+
+    async def _default_partition_weeks(self) -> List[date]:
+        result = await self.db.execute(text(
+            f"SELECT DISTINCT date_trunc('week', created_at)::date FROM {DEFAULT_PARTITION}"
+        ))
+        return [week for (week,) in result]
+
+    async def _partitions(self) -> Dict[str, date]:
+        result = await self.db.execute(text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'chat_messages'::regclass
+        """))
+        partitions = {}
+        for (name,) in result:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                partitions[name] = datetime.strptime(match.group(1), "%Y%m%d").date()
+        return partitions
+
+    async def _instance_retention(self) -> Dict[UUID, int]:
+        default = ComplianceSettings().data_retention_days
+        result = await self.db.execute(select(DBInstance.id, DBInstance.settings))
+        retention = {}
+        for instance_id, instance_settings in result:
+            try:
+                days = int(
+                    ((instance_settings or {}).get("compliance") or {}).get(
+                        "data_retention_days",
+                        default
+                    )
+                )
+            except (AttributeError, TypeError, ValueError):
+                logger.warning(f"Invalid data_retention_days for instance {instance_id}, using {default}")
+                days = default
+            retention[instance_id] = max(days, 1)
+        return retention
@@ -1,14 +1,35 @@
-from typing import Optional, Dict, List
+from typing import Any, AsyncIterator, Optional, Dict, List, Tuple
 from uuid import UUID, uuid4
 import asyncio
+from contextlib import aclosing
 from datetime import datetime
 
+import numpy as np
+
 from app.core.config import get_settings
 from app.core.cache import cache_manager
+from app.core.database import AsyncSessionLocal
+from app.core.logging import logger
 from app.core.metrics import CHAT_MESSAGES, LLM_LATENCY
-from app.models.chat import ChatSession, Message, ChatResponse
+from app.core.admission import BATCH, priority
+from app.models.chat import (
+    ChatSession,
+    Message,
+    ChatRequest,
+    ChatResponse,
+    ChatStreamChunk,
+    ChatBatchResult
+)
+from app.models.instance_settings import get_default_settings
+from app.services.chat_message_repository import ChatMessageRepository
+from app.services.generation_tracker import generation_tracker
+from app.services.history_buffer import session_history_buffer
+from app.services.message_writer import message_writer
+from app.services.instance_service import InstanceService
 from app.services.llm_service import LLMService
-from app.core.exceptions import ChatbotError
+from app.services.semantic_cache import semantic_cache, normalize_message
+from app.services.summary_service import conversation_summarizer
+from app.core.exceptions import ChatbotError, ServiceOverloadedException
 from app.core.redis import redis_client
 
 settings = get_settings()
@@ -16,12 +37,35 @@ settings = get_settings()
 class ChatService:
     def __init__(self):
         self.llm_service = LLMService()
+        self.semantic_cache = semantic_cache
+        self.summarizer = conversation_summarizer
+        self.generations = generation_tracker
+        self.message_writer = message_writer
+        self.history_buffer = session_history_buffer
+    
+    async def handle_message(
+        self,
+        instance_id: UUID,
+        message: str,
+        session_id: Optional[UUID] = None,
+        context: Optional[Dict] = None
+    ) -> ChatResponse:
+        """process_message as a cancellable reply.
+
+        A newer message for the same session cancels this one, which then
+        raises GenerationCancelledException; cancelling the caller aborts
+        the LLM request.
+        """
+        return await self.generations.run(
+            session_id,
+            self.process_message(
+                instance_id,
+                message,
+                session_id=session_id,
+                context=context
+            )
+        )
     
-    @cache_manager.cache_response(
-        prefix="chat_response",
-        ttl=300,
-        key_builder=lambda self, instance_id, message, **kwargs: f"{instance_id}:{message}"
-    )
     async def process_message(
         self,
         instance_id: UUID,
@@ -29,16 +73,59 @@ class ChatService:
         session_id: Optional[UUID] = None,
         context: Optional[Dict] = None
     ) -> ChatResponse:
+        received_at = datetime.utcnow()
+        
+        # If no session_id provided, create new one
+        if not session_id:
+            session_id = uuid4()
+        
+        response = await self._reply(instance_id, message, session_id, context)
+        await self._save_turn(instance_id, session_id, message, received_at, response)
+        
+        return ChatResponse(
+            session_id=session_id,
+            response=response,
+            context=context
+        )
+    
+    @cache_manager.cache_response(
+        prefix="chat_reply",
+        ttl=300,
+        key_builder=lambda self, instance_id, message, *args, **kwargs: f"{instance_id}:{normalize_message(message)}",
+        single_flight=True,
+        stale_ttl=60,
+        early_refresh=1.0,
+        tags=lambda self, instance_id, *args, **kwargs: [f"instance:{instance_id}"],
+        refresh=lambda self, instance_id, message, *args, **kwargs: self._refresh_reply(instance_id, message)
+    )
+    async def _reply(
+        self,
+        instance_id: UUID,
+        message: str,
+        session_id: UUID,
+        context: Optional[Dict]
+    ) -> str:
         try:
-            # If no session_id provided, create new one
-            if not session_id:
-                session_id = uuid4()
-            
-            with LLM_LATENCY.time():
-                response = await self.llm_service.generate_response(
+            response, embedding = await self._lookup_semantic_cache(
+                instance_id,
+                message
+            )
+            if response is None:
+                history, summary = await self._get_prompt_history(session_id)
+                with LLM_LATENCY.time():
+                    response = await self.llm_service.generate_response(
+                        message,
+                        history,
+                        context,
+                        instance_settings=await self._get_instance_settings(instance_id),
+                        summary=summary,
+                        session_id=session_id
+                    )
+                await self._store_semantic_cache(
+                    instance_id,
                     message,
-                    await self._get_message_history(session_id),
-                    context
+                    response,
+                    embedding
                 )
             
             CHAT_MESSAGES.labels(
@@ -46,18 +133,249 @@ class ChatService:
                 status="success"
             ).inc()
             
-            return ChatResponse(
-                session_id=session_id,
-                response=response,
-                context=context
-            )
+            return response
             
+        except ServiceOverloadedException:
+            CHAT_MESSAGES.labels(
+                instance_id=str(instance_id),
+                status="shed"
+            ).inc()
+            raise
+        except Exception as e:
+            CHAT_MESSAGES.labels(
+                instance_id=str(instance_id),
+                status="error"
+            ).inc()
+            raise ChatbotError(f"Error processing message: {str(e)}")
+    
+    async def _refresh_reply(self, instance_id: UUID, message: str) -> str:
+        """Generate a cached reply outside any request (refresh or warm-up).
+
+        Runs after the triggering request has finished, so it uses no
+        session, history or caller context and, unlike ``_reply``, records
+        no chat metrics and writes no semantic cache entry.
+        """
+        return await self.llm_service.generate_response(
+            message,
+            [],
+            instance_settings=await self._get_instance_settings(instance_id)
+        )
+    
+    async def warm_reply(self, instance_id: UUID, message: str) -> bool:
+        """Cache the reply to a common question ahead of traffic.
+
+        Returns False if a fresh reply was already cached. Warm-ups are
+        generated like background refreshes, so they are not counted as
+        chat traffic.
+        """
+        if await self._reply.is_cached(self, instance_id, message):
+            return False
+        await self._reply.warm(self, instance_id, message, None, None)
+        return True
+    
+    async def stream_message(
+        self,
+        instance_id: UUID,
+        message: str,
+        session_id: Optional[UUID] = None,
+        context: Optional[Dict] = None
+    ) -> AsyncIterator[ChatStreamChunk]:
+        """Streaming variant of process_message.
+
+        Yields one chunk per token batch received from the LLM and a final
+        chunk with done=True carrying the complete response. Like
+        handle_message, a newer message for the same session cancels it.
+        """
+        async with aclosing(
+            self.generations.stream(
+                session_id,
+                self._stream_message(instance_id, message, session_id, context)
+            )
+        ) as chunks:
+            async for chunk in chunks:
+                yield chunk
+    
+    async def _stream_message(
+        self,
+        instance_id: UUID,
+        message: str,
+        session_id: Optional[UUID],
+        context: Optional[Dict]
+    ) -> AsyncIterator[ChatStreamChunk]:
+        received_at = datetime.utcnow()
+        if not session_id:
+            session_id = uuid4()
+        
+        cached, embedding = await self._lookup_semantic_cache(instance_id, message)
+        if cached is not None:
+            CHAT_MESSAGES.labels(
+                instance_id=str(instance_id),
+                status="success"
+            ).inc()
+            await self._save_turn(instance_id, session_id, message, received_at, cached)
+            yield ChatStreamChunk(session_id=session_id, delta=cached)
+            yield ChatStreamChunk(session_id=session_id, done=True, response=cached)
+            return
+        
+        parts: List[str] = []
+        try:
+            history, summary = await self._get_prompt_history(session_id)
+            with LLM_LATENCY.time():
+                async for delta in self.llm_service.stream_response(
+                    message,
+                    history,
+                    context,
+                    instance_settings=await self._get_instance_settings(instance_id),
+                    summary=summary,
+                    session_id=session_id
+                ):
+                    parts.append(delta)
+                    yield ChatStreamChunk(session_id=session_id, delta=delta)
+        except ServiceOverloadedException:
+            CHAT_MESSAGES.labels(
+                instance_id=str(instance_id),
+                status="shed"
+            ).inc()
+            raise
         except Exception as e:
             CHAT_MESSAGES.labels(
                 instance_id=str(instance_id),
                 status="error"
             ).inc()
             raise ChatbotError(f"Error processing message: {str(e)}")
+        
+        response = "".join(parts).strip()
+        await self._store_semantic_cache(instance_id, message, response, embedding)
+        await self._save_turn(instance_id, session_id, message, received_at, response)
+        
+        CHAT_MESSAGES.labels(
+            instance_id=str(instance_id),
+            status="success"
+        ).inc()
+        
+        yield ChatStreamChunk(
+            session_id=session_id,
+            done=True,
+            response=response
+        )
+    
+    async def process_batch(
+        self,
+        requests: List[ChatRequest],
+        parallelism: Optional[int] = None
+    ) -> AsyncIterator[ChatBatchResult]:
+        """Process many messages through process_message in the batch lane.
+
+        At most ``parallelism`` messages run concurrently. Results are yielded
+        in completion order and carry the index of their request; a failed
+        message yields an error result instead of aborting the batch.
+        """
+        parallelism = min(
+            parallelism or settings.BATCH_MAX_PARALLELISM,
+            settings.BATCH_MAX_PARALLELISM
+        )
+        pending = iter(enumerate(requests))
+        results: "asyncio.Queue[ChatBatchResult]" = asyncio.Queue()
+        
+        async def worker() -> None:
+            for index, request in pending:
+                await results.put(await self._process_batch_item(index, request))
+        
+        # Workers inherit the batch priority from the context they start in
+        with priority(BATCH):
+            workers = [
+                asyncio.create_task(worker())
+                for _ in range(min(parallelism, len(requests)))
+            ]
+        try:
+            for _ in range(len(requests)):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _process_batch_item(
+        self,
+        index: int,
+        request: ChatRequest
+    ) -> ChatBatchResult:
+        try:
+            response = await self.process_message(
+                request.instance_id,
+                request.message,
+                session_id=request.session_id,
+                context=request.context
+            )
+        except ServiceOverloadedException as e:
+            return ChatBatchResult(index=index, status="shed", error=e.message)
+        except Exception as e:
+            return ChatBatchResult(index=index, status="error", error=str(e))
+        
+        return ChatBatchResult(
+            index=index,
+            status="success",
+            session_id=response.session_id,
+            response=response.response
+        )
+    
+    async def _lookup_semantic_cache(
+        self,
+        instance_id: UUID,
+        message: str
+    ) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None, None
+        return await self.semantic_cache.lookup(instance_id, message)
+    
+    async def _store_semantic_cache(
+        self,
+        instance_id: UUID,
+        message: str,
+        response: str,
+        embedding: Optional[np.ndarray]
+    ) -> None:
+        if settings.SEMANTIC_CACHE_ENABLED:
+            await self.semantic_cache.store(instance_id, message, response, embedding)
+    
+    async def _get_instance_settings(self, instance_id: UUID) -> Dict[str, Any]:
+        try:
+            return await cache_manager.get_or_set(
+                f"instance_settings:{instance_id}",
+                lambda: self._fetch_instance_settings(instance_id),
+                ttl=300,
+                single_flight_enabled=True,
+                stale_ttl=60,
+                early_refresh=1.0,
+                tags=[f"instance:{instance_id}"]
+            )
+        except Exception as e:
+            # Answer with default behavior rather than failing the chat
+            logger.warning(
+                f"Could not load settings for instance {instance_id}: {str(e)}"
+            )
+            return get_default_settings()
+    
+    async def _fetch_instance_settings(self, instance_id: UUID) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            instance = await InstanceService(db).get_instance(instance_id)
+            return instance.settings
+    
+    async def _get_prompt_history(
+        self,
+        session_id: UUID
+    ) -> Tuple[List[Message], Optional[str]]:
+        """Return the messages and running summary to build a prompt from."""
+        history = await self._get_message_history(session_id)
+        summary = await self.summarizer.get(session_id)
+        
+        # Compress older turns in the background once the session grows long
+        self.summarizer.schedule_if_needed(session_id, history, summary)
+        
+        return (
+            self.summarizer.uncovered(history, summary),
+            summary.summary if summary else None
+        )
     
     async def _get_message_history(
         self,
@@ -66,12 +384,80 @@ class ChatService:
         if not session_id:
             return []
         
-        # Get message history from database or cache
-        return await cache_manager.get_or_set(
-            f"chat_history:{session_id}",
-            lambda: self._fetch_message_history(session_id),
-            ttl=3600
-        )
+        history = await self.history_buffer.recent(session_id)
+        if history:
+            return history
+        
+        # Buffer missing or expired: load from the database and refill it
+        try:
+            history = await self._fetch_message_history(session_id)
+        except Exception as e:
+            # Answer without history rather than failing the chat
+            logger.warning(
+                f"Could not load history for session {session_id}: {str(e)}"
+            )
+            return []
+        if history:
+            await self.history_buffer.fill(session_id, history)
+        return history
+    
+    async def _fetch_message_history(self, session_id: UUID) -> List[Message]:
+        async with AsyncSessionLocal() as db:
+            rows = await ChatMessageRepository(db).last_messages(
+                session_id,
+                settings.CHAT_HISTORY_LIMIT
+            )
+        return [
+            Message(role=row.role, content=row.content, timestamp=row.created_at)
+            for row in rows
+        ]
+    
+    async def _save_turn(
+        self,
+        instance_id: UUID,
+        session_id: UUID,
+        message: str,
+        received_at: datetime,
+        response: str
+    ) -> None:
+        """Append the user message and the reply to the session's history."""
+        turn = [
+            Message(role="user", content=message, timestamp=received_at),
+            Message(role="assistant", content=response)
+        ]
+        try:
+            if settings.MESSAGE_WRITE_BEHIND:
+                # Postgres is written in batches by the stream consumer
+                await self.message_writer.enqueue(session_id, instance_id, turn)
+            else:
+                async with AsyncSessionLocal() as db:
+                    await ChatMessageRepository(db).append(session_id, instance_id, turn)
+                    await db.commit()
+        except Exception as e:
+            logger.warning(
+                f"Could not save turn for session {session_id}: {str(e)}"
+            )
+            return
+        
+        await self._remember_turn(session_id, turn)
+    
+    async def _remember_turn(self, session_id: UUID, turn: List[Message]) -> None:
+        # Keep the history buffer current; the database may lag behind
+        if await self.history_buffer.append(session_id, turn):
+            return
+        
+        try:
+            history = await self._fetch_message_history(session_id)
+        except Exception as e:
+            logger.warning(
+                f"Could not rebuild history for session {session_id}: {str(e)}"
+            )
+            return
+        # The turn is already there unless it is still waiting to be flushed
+        persisted = [(m.role, m.content) for m in history[-len(turn):]]
+        if persisted != [(m.role, m.content) for m in turn]:
+            history.extend(turn)
+        await self.history_buffer.fill(session_id, history)
     
     def _get_or_create_session(
         self,
@@ -0,0 +1,130 @@
+from typing import List, Optional
+from array import array
+from uuid import UUID
+import hashlib
+import struct
+import sys
+
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.redis import redis_client
+
+settings = get_settings()
+
+_FORMAT_VERSION = 1
+# version, len(fingerprint), len(marker)
+_HEADER = struct.Struct("<BHH")
+
+class SessionContext:
+    def __init__(self, tokens: List[int], fingerprint: str, marker: str):
+        self.tokens = tokens
+        self.fingerprint = fingerprint
+        self.marker = marker
+
+def response_marker(response: str) -> str:
+    """Short fingerprint of the assistant reply a context ends with."""
+    return hashlib.sha1(response.strip().encode()).hexdigest()[:16]
+
+def pack_context(context: SessionContext) -> bytes:
+    tokens = array("I", context.tokens)
+    if sys.byteorder != "little":
+        tokens.byteswap()
+    fingerprint = context.fingerprint.encode()
+    marker = context.marker.encode()
+    return (
+        _HEADER.pack(_FORMAT_VERSION, len(fingerprint), len(marker))
+        + fingerprint
+        + marker
+        + tokens.tobytes()
+    )
+
+def unpack_context(blob: bytes) -> Optional[SessionContext]:
+    if len(blob) < _HEADER.size:
+        return None
+    version, fingerprint_len, marker_len = _HEADER.unpack_from(blob)
+    if version != _FORMAT_VERSION:
+        return None
+
+    offset = _HEADER.size
+    fingerprint = blob[offset:offset + fingerprint_len].decode()
+    offset += fingerprint_len
+    marker = blob[offset:offset + marker_len].decode()
+    offset += marker_len
+
+    tokens = array("I")
+    tokens.frombytes(blob[offset:])
+    if sys.byteorder != "little":
+        tokens.byteswap()
+    return SessionContext(tokens.tolist(), fingerprint, marker)
+
+class SessionContextStore:
+    """Stores Ollama's returned ``context`` token array per chat session.
+
+    Sending the context back on the next turn means only the new user message
+    has to be prefilled. Contexts are packed as uint32 arrays with a small
+    header and expire after ``ttl`` seconds. A context is only reused when it
+    was produced by the same model and system prompt (``fingerprint``) and
+    ends with the conversation's latest assistant reply (``marker``).
+    """
+
+    def __init__(self, ttl: int = 1800, max_tokens: int = 2048):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+
+    async def get(
+        self,
+        session_id: UUID,
+        fingerprint: str,
+        last_response: Optional[str] = None
+    ) -> Optional[List[int]]:
+        try:
+            blob = await redis_client.get_bytes(self._key(session_id))
+        except RedisError as e:
+            logger.warning(f"Could not load session context: {str(e)}")
+            return None
+        if not blob:
+            return None
+
+        context = unpack_context(blob)
+        if context is None or context.fingerprint != fingerprint:
+            return None
+        if last_response is not None and context.marker != response_marker(last_response):
+            # Turns were answered without this context (e.g. from cache)
+            return None
+        if len(context.tokens) >= self.max_tokens:
+            return None
+        return context.tokens
+
+    async def save(
+        self,
+        session_id: UUID,
+        fingerprint: str,
+        tokens: List[int],
+        response: str
+    ) -> None:
+        context = SessionContext(tokens, fingerprint, response_marker(response))
+        try:
+            await redis_client.set_bytes_with_ttl(
+                self._key(session_id),
+                pack_context(context),
+                self.ttl
+            )
+        except RedisError as e:
+            logger.warning(f"Could not store session context: {str(e)}")
+
+    async def invalidate(self, session_id: UUID) -> None:
+        try:
+            await redis_client.raw.delete(self._key(session_id))
+        except RedisError as e:
+            logger.warning(f"Could not drop session context: {str(e)}")
+
+    @staticmethod
+    def _key(session_id: UUID) -> str:
+        return f"llm_context:{session_id}"
+
+session_context_store = SessionContextStore(
+    ttl=settings.SESSION_CONTEXT_TTL,
+    max_tokens=settings.LLM_CONTEXT_TOKENS - settings.LLM_RESPONSE_TOKENS
+)
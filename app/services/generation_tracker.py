@@ -0,0 +1,114 @@
+from typing import AsyncIterator, Awaitable, Dict, Optional, TypeVar
+from uuid import UUID
+from weakref import WeakSet
+from contextlib import aclosing
+import asyncio
+
+from app.core.exceptions import GenerationCancelledException
+from app.core.metrics import CHAT_CANCELLATIONS
+
+T = TypeVar("T")
+
+_DONE = object()
+
+# Cancel message marking a caller cancelled because a newer message replaced it
+_SUPERSEDED = "superseded"
+
+def _cancel_reason(error: BaseException) -> str:
+    return "superseded" if _SUPERSEDED in error.args else "disconnected"
+
+class GenerationTracker:
+    """Runs chat replies as tasks so they can be cancelled cooperatively.
+
+    Each session has at most one reply in flight: starting a new one cancels
+    the previous reply, whose caller then gets a
+    GenerationCancelledException. Cancelling the caller (client disconnect)
+    cancels the reply task too, which closes the Ollama request and frees
+    the backend slot.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[UUID, asyncio.Task] = {}
+        self._superseded: "WeakSet[asyncio.Task]" = WeakSet()
+
+    async def run(self, session_id: Optional[UUID], work: Awaitable[T]) -> T:
+        task = asyncio.ensure_future(work)
+        self._register(session_id, task)
+        try:
+            # Cancelling the caller propagates into the awaited task
+            return await task
+        except asyncio.CancelledError as e:
+            if task in self._superseded and not asyncio.current_task().cancelling():
+                raise GenerationCancelledException()
+            CHAT_CANCELLATIONS.labels(reason=_cancel_reason(e)).inc()
+            raise
+        finally:
+            self._unregister(session_id, task)
+
+    async def stream(
+        self,
+        session_id: Optional[UUID],
+        chunks: AsyncIterator[T]
+    ) -> AsyncIterator[T]:
+        """Consume ``chunks`` in a cancellable task and re-yield them."""
+        queue: "asyncio.Queue" = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async with aclosing(chunks):
+                    async for chunk in chunks:
+                        queue.put_nowait(chunk)
+            finally:
+                queue.put_nowait(_DONE)
+
+        task = asyncio.ensure_future(pump())
+        self._register(session_id, task)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+
+            if task.cancelled():
+                raise GenerationCancelledException()
+            # Re-raise errors from the producer
+            await task
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            if not task.done():
+                CHAT_CANCELLATIONS.labels(reason=_cancel_reason(e)).inc()
+            raise
+        finally:
+            task.cancel()
+            self._unregister(session_id, task)
+
+    def cancel(self, session_id: UUID) -> bool:
+        """Cancel the session's in-flight reply, if any."""
+        task = self._tasks.get(session_id)
+        if task is None or task.done():
+            return False
+        self._superseded.add(task)
+        task.cancel()
+        CHAT_CANCELLATIONS.labels(reason="superseded").inc()
+        return True
+
+    def supersede(self, caller: asyncio.Task) -> None:
+        """Cancel a caller whose reply a newer message replaces.
+
+        For callers that track their own reply task (a WebSocket connection)
+        rather than a session id; the cancellation is counted as superseded.
+        """
+        if not caller.done():
+            caller.cancel(_SUPERSEDED)
+
+    def _register(self, session_id: Optional[UUID], task: asyncio.Task) -> None:
+        if session_id is None:
+            return
+        self.cancel(session_id)
+        self._tasks[session_id] = task
+
+    def _unregister(self, session_id: Optional[UUID], task: asyncio.Task) -> None:
+        if session_id is not None and self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+
+generation_tracker = GenerationTracker()
@@ -0,0 +1,122 @@
+from typing import List, Optional, Sequence
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+import json
+
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.redis import redis_client
+from app.models.chat import Message
+
+settings = get_settings()
+
+_EPOCH = datetime(1970, 1, 1)
+_ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+_ROLES = {code: role for role, code in _ROLE_CODES.items()}
+
+def epoch_millis(timestamp: datetime) -> int:
+    """Whole milliseconds since the epoch; the precision the buffer keeps."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - _EPOCH) // timedelta(milliseconds=1)
+
+def encode_message(message: Message) -> str:
+    """Compact list entry: ``[role, epoch millis, content]``."""
+    return json.dumps(
+        [_ROLE_CODES.get(message.role, message.role), epoch_millis(message.timestamp), message.content],
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+
+def decode_message(entry: str) -> Optional[Message]:
+    try:
+        role, millis, content = json.loads(entry)
+    except (TypeError, ValueError):
+        return None
+    return Message(
+        role=_ROLES.get(role, role),
+        content=content,
+        timestamp=_EPOCH + timedelta(milliseconds=millis)
+    )
+
+class SessionHistoryBuffer:
+    """Capped per-session list of the newest chat messages in Redis.
+
+    Messages are LPUSHed newest-first and the list is LTRIMmed to
+    ``capacity``, so an append is O(1) and a session never holds more than
+    ``capacity`` entries. Reads fetch the newest messages with one LRANGE.
+    Every append and read refreshes the TTL, so idle sessions expire.
+    """
+
+    def __init__(self, capacity: int = 50, ttl: int = 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+
+    async def recent(self, session_id: UUID, limit: Optional[int] = None) -> List[Message]:
+        """Newest messages, oldest first; empty if the buffer is missing."""
+        count = min(limit or self.capacity, self.capacity)
+        key = self._key(session_id)
+        try:
+            async with redis_client.redis.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, 0, count - 1)
+                pipe.expire(key, self.ttl)
+                entries, _ = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not load history buffer: {str(e)}")
+            return []
+
+        messages = [decode_message(entry) for entry in reversed(entries)]
+        return [message for message in messages if message is not None]
+
+    async def append(self, session_id: UUID, messages: Sequence[Message]) -> bool:
+        """Push messages onto an existing buffer.
+
+        Returns False when the session has no buffer, so the caller can
+        rebuild it with ``fill`` instead of starting it with a partial
+        history.
+        """
+        if not messages:
+            return True
+        key = self._key(session_id)
+        try:
+            async with redis_client.redis.pipeline(transaction=True) as pipe:
+                pipe.lpushx(key, *[encode_message(message) for message in messages])
+                pipe.ltrim(key, 0, self.capacity - 1)
+                pipe.expire(key, self.ttl)
+                length, _, _ = await pipe.execute()
+        except RedisError as e:
+            # Nothing to rebuild while Redis is unavailable
+            logger.warning(f"Could not append to history buffer: {str(e)}")
+            return True
+        return length > 0
+
+    async def fill(self, session_id: UUID, messages: Sequence[Message]) -> None:
+        """Replace the buffer with ``messages`` (oldest first)."""
+        key = self._key(session_id)
+        entries = [encode_message(message) for message in messages[-self.capacity:]]
+        try:
+            async with redis_client.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if entries:
+                    pipe.lpush(key, *entries)
+                    pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not fill history buffer: {str(e)}")
+
+    async def invalidate(self, session_id: UUID) -> None:
+        try:
+            await redis_client.redis.delete(self._key(session_id))
+        except RedisError as e:
+            logger.warning(f"Could not drop history buffer: {str(e)}")
+
+    @staticmethod
+    def _key(session_id: UUID) -> str:
+        return f"chat_history_buffer:{session_id}"
+
+session_history_buffer = SessionHistoryBuffer(
+    capacity=settings.CHAT_HISTORY_LIMIT,
+    ttl=settings.CHAT_HISTORY_TTL
+)
@@ -8,7 +8,9 @@ import copy
 from app.models.instance import Instance, InstanceCreate, InstanceUpdate, InstanceSettingsUpdate
 from app.models.database.instance import DBInstance
 from app.models.instance_settings import get_default_settings, InstanceSettings
+from app.core.cache import cache_manager
 from app.core.exceptions import InstanceNotFoundException
+from app.core.logging import logger
 
 class InstanceService:
     def __init__(self, db: AsyncSession):
@@ -70,6 +72,7 @@ class InstanceService:
         values = instance_data.dict(exclude_unset=True)
         await self.db.execute(query.values(**values))
         await self.db.commit()
+        await self._invalidate_caches(instance_id)
         return await self.get_instance(instance_id)
     
     async def update_instance_settings(
@@ -91,6 +94,7 @@ class InstanceService:
         query = update(DBInstance).where(DBInstance.id == instance_id)
         await self.db.execute(query.values(settings=updated_settings))
         await self.db.commit()
+        await self._invalidate_caches(instance_id)
         
         return await self.get_instance(instance_id)
     
@@ -121,6 +125,7 @@ class InstanceService:
         query = update(DBInstance).where(DBInstance.id == instance_id)
         await self.db.execute(query.values(settings=updated_settings))
         await self.db.commit()
+        await self._invalidate_caches(instance_id)
         
         return await self.get_instance(instance_id)
     
@@ -132,6 +137,7 @@ class InstanceService:
         query = update(DBInstance).where(DBInstance.id == instance_id)
         await self.db.execute(query.values(settings=get_default_settings()))
         await self.db.commit()
+        await self._invalidate_caches(instance_id)
         
         return await self.get_instance(instance_id)
     
@@ -141,12 +147,22 @@ class InstanceService:
         await self.db.commit()
         if result.rowcount == 0:
             raise InstanceNotFoundException(str(instance_id))
+        await self._invalidate_caches(instance_id)
     
     async def list_instances(self, user_id: UUID) -> List[Instance]:
         query = select(DBInstance).where(DBInstance.user_id == user_id)
         result = await self.db.execute(query)
         return [Instance.from_orm(instance) for instance in result.scalars().all()]
 
+    async def _invalidate_caches(self, instance_id: UUID) -> None:
+        # Cached settings and replies were produced under the old settings
+        try:
+            await cache_manager.invalidate_tags(f"instance:{instance_id}")
+        except Exception as e:
+            logger.warning(
+                f"Could not invalidate caches for instance {instance_id}: {str(e)}"
+            )
+    
     def _generate_api_key(self) -> str:
         return f"sk_{secrets.token_urlsafe(32)}"
         
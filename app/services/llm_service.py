@@ -1,65 +1,388 @@
-from typing import List, Optional, Dict
-import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import Any, AsyncIterator, List, Optional, Dict, Tuple
+from uuid import UUID
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from app.core.config import get_settings
+from app.core.http_client import ollama_http_client
+from app.core.logging import logger
+from app.core.metrics import (
+    LLM_CANCELLED_GENERATIONS,
+    LLM_MODEL_FALLBACKS,
+    LLM_MODEL_LATENCY,
+    LLM_MODEL_REQUESTS,
+    LLM_MODEL_TOKENS_PER_SECOND,
+    LLM_PREFILL_TOKENS,
+    OLLAMA_REQUESTS_IN_PROGRESS
+)
 from app.models.chat import Message
-from app.core.exceptions import LLMServiceException
+from app.core.exceptions import (
+    LLMBackendException,
+    LLMRequestException,
+    LLMServiceException,
+    ServiceOverloadedException
+)
+from app.services.backend_pool import backend_pool, OllamaBackend
+from app.services.context_store import session_context_store
+from app.services.model_router import model_router
+from app.services.prompt_builder import prompt_builder
 
 settings = get_settings()
 
 class LLMService:
     def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL
+        self.backends = backend_pool
         self.model = settings.LLM_MODEL
         self.temperature = settings.LLM_TEMPERATURE
+        self.embedding_model = settings.EMBEDDING_MODEL
+        self.http_client = ollama_http_client
+        self.prompt_builder = prompt_builder
+        self.context_store = session_context_store
+        self.router = model_router
+
+    async def generate_response(
+        self,
+        message: str,
+        history: List[Message],
+        context: Optional[Dict] = None,
+        instance_settings: Optional[Dict[str, Any]] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[UUID] = None
+    ) -> str:
+        models = self.router.candidates(message, instance_settings)
+        for attempt, model in enumerate(models):
+            prompt, session_context, fingerprint = await self._prepare_prompt(
+                model,
+                message,
+                history,
+                context,
+                instance_settings,
+                summary,
+                session_id
+            )
+
+            try:
+                result = await self._generate(prompt, session_context, model)
+            except LLMServiceException as e:
+                if attempt == len(models) - 1:
+                    raise
+                self._log_fallback(model, e)
+                continue
+
+            response = result["response"].strip()
+            await self._remember_context(session_id, fingerprint, result, response)
+            return response
+
+    async def summarize(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Message]
+    ) -> str:
+        """Fold older conversation turns into a running summary."""
+        transcript = "\n".join(
+            f"{msg.role.capitalize()}: {msg.content}" for msg in messages
+        )
+        prompt = (
+            "Summarize the conversation below between a website visitor and an "
+            "AI assistant. Keep facts, names, open questions and commitments; "
+            "drop pleasantries. Answer with the summary only.\n\n"
+        )
+        if previous_summary:
+            prompt += f"Summary so far:\n{previous_summary}\n\n"
+        prompt += f"New messages:\n{transcript}\n\nUpdated summary:"
+        return await self.complete(prompt)
+
+    async def complete(self, prompt: str) -> str:
+        """Run a single non-streaming generation for a fully built prompt."""
+        result = await self._generate(prompt)
+        return result["response"].strip()
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
+        # Retrying shed requests would only add load to a saturated backend,
+        # and a cancelled caller no longer wants the result
+        retry=retry_if_not_exception_type(
+            (ServiceOverloadedException, LLMRequestException, asyncio.CancelledError)
+        ),
         reraise=True
     )
-    async def generate_response(
+    async def _generate(
+        self,
+        prompt: str,
+        session_context: Optional[List[int]] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Return Ollama's full non-streaming response body."""
+        model = model or self.model
+        started = time.monotonic()
+        try:
+            async with self.backends.acquire(model) as backend:
+                async with backend.admission.admit():
+                    with OLLAMA_REQUESTS_IN_PROGRESS.track_inprogress():
+                        response = await self.http_client.client.post(
+                            f"{backend.url}/api/generate",
+                            json=self._generate_payload(model, prompt, session_context, False)
+                        )
+
+                if response.status_code != 200:
+                    raise self._api_error(response.status_code, response.text)
+
+            result = response.json()
+            self._observe_generation(model, result, session_context, started)
+            return result
+
+        except asyncio.CancelledError:
+            # Closing the request makes Ollama stop generating
+            LLM_CANCELLED_GENERATIONS.labels(model=model).inc()
+            raise
+        except ServiceOverloadedException:
+            raise
+        except LLMRequestException:
+            LLM_MODEL_REQUESTS.labels(model=model, result="failure").inc()
+            raise
+        except Exception as e:
+            LLM_MODEL_REQUESTS.labels(model=model, result="failure").inc()
+            raise LLMServiceException(f"Error generating response: {str(e)}")
+
+    async def stream_response(
         self,
         message: str,
         history: List[Message],
-        context: Optional[Dict] = None
-    ) -> str:
-        try:
-            # Convert history to context string
-            context_messages = [
-                f"{msg.role}: {msg.content}"
-                for msg in history[-5:]  # Only use last 5 messages for context
-            ]
-            
-            system_prompt = "You are an AI assistant helping users on a website."
-            if context:
-                system_prompt += f"\nWebsite context: {context.get('website_info', '')}."
-                system_prompt += f"\nCurrent page: {context.get('current_page', '')}."
-            
-            # Prepare the prompt
-            full_prompt = f"{system_prompt}\n\nChat history:\n"
-            full_prompt += "\n".join(context_messages)
-            full_prompt += f"\n\nUser: {message}\nAssistant:"
-
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": full_prompt,
-                        "temperature": self.temperature,
-                        "stream": False
-                    },
-                    timeout=30.0
+        context: Optional[Dict] = None,
+        instance_settings: Optional[Dict[str, Any]] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[UUID] = None
+    ) -> AsyncIterator[str]:
+        """Yield response tokens as Ollama produces them.
+
+        Retries are not applied here: once the first token has been sent to
+        the client a restart would duplicate output. Falling back to the next
+        model is only possible until the first token has been yielded.
+        """
+        models = self.router.candidates(message, instance_settings)
+        for attempt, model in enumerate(models):
+            prompt, session_context, fingerprint = await self._prepare_prompt(
+                model,
+                message,
+                history,
+                context,
+                instance_settings,
+                summary,
+                session_id
+            )
+
+            final: Dict[str, Any] = {}
+            parts: List[str] = []
+            started = time.monotonic()
+            try:
+                async with self.backends.acquire(model) as backend:
+                    async with backend.admission.admit():
+                        with OLLAMA_REQUESTS_IN_PROGRESS.track_inprogress():
+                            async with aclosing(
+                                self._stream_generate(
+                                    backend,
+                                    model,
+                                    prompt,
+                                    session_context,
+                                    final
+                                )
+                            ) as tokens:
+                                async for token in tokens:
+                                    parts.append(token)
+                                    yield token
+            except (asyncio.CancelledError, GeneratorExit):
+                LLM_CANCELLED_GENERATIONS.labels(model=model).inc()
+                raise
+            except ServiceOverloadedException:
+                raise
+            except Exception as e:
+                LLM_MODEL_REQUESTS.labels(model=model, result="failure").inc()
+                if parts or attempt == len(models) - 1:
+                    if isinstance(e, LLMServiceException):
+                        raise
+                    raise LLMServiceException(f"Error streaming response: {str(e)}")
+                self._log_fallback(model, e)
+                continue
+
+            self._observe_generation(model, final, session_context, started)
+            await self._remember_context(
+                session_id,
+                fingerprint,
+                final,
+                "".join(parts).strip()
+            )
+            return
+
+    async def _stream_generate(
+        self,
+        backend: OllamaBackend,
+        model: str,
+        prompt: str,
+        session_context: Optional[List[int]],
+        final: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        async with self.http_client.client.stream(
+            "POST",
+            f"{backend.url}/api/generate",
+            json=self._generate_payload(model, prompt, session_context, True)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise self._api_error(
+                    response.status_code,
+                    body.decode(errors='replace')
                 )
-                
-                if response.status_code != 200:
-                    raise LLMServiceException(
-                        f"Ollama API error: {response.text}"
+
+            # Ollama streams one JSON object per line
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise self._api_error(500, chunk["error"])
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    # The final chunk carries the context and eval counts
+                    final.update(chunk)
+                    break
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding vector for text from Ollama's embeddings API."""
+        try:
+            # Embedding failures must not eject backends serving generation
+            async with self.backends.acquire(self.embedding_model, track_health=False) as backend:
+                with OLLAMA_REQUESTS_IN_PROGRESS.track_inprogress():
+                    response = await self.http_client.client.post(
+                        f"{backend.url}/api/embeddings",
+                        json={
+                            "model": self.embedding_model,
+                            "prompt": text
+                        }
                     )
-                
-                return response.json()["response"].strip()
-            
+
+                if response.status_code != 200:
+                    raise self._api_error(response.status_code, response.text)
+
+            return response.json()["embedding"]
+
+        except LLMServiceException:
+            raise
         except Exception as e:
-            raise LLMServiceException(f"Error generating response: {str(e)}") 
\ No newline at end of file
+            raise LLMServiceException(f"Error generating embedding: {str(e)}")
+
+    @staticmethod
+    def _api_error(status_code: int, body: str) -> LLMServiceException:
+        """Classify an Ollama error reply as a bad request or a backend failure."""
+        message = f"Ollama API error: {body}"
+        # Ollama reports models that aren't pulled as "model ... not found"
+        if status_code < 500 or "not found" in body.lower():
+            return LLMRequestException(message)
+        return LLMBackendException(message)
+
+    def _generate_payload(
+        self,
+        model: str,
+        prompt: str,
+        session_context: Optional[List[int]],
+        stream: bool
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "temperature": self.temperature,
+            "stream": stream
+        }
+        if session_context:
+            payload["context"] = session_context
+        return payload
+
+    async def _prepare_prompt(
+        self,
+        model: str,
+        message: str,
+        history: List[Message],
+        context: Optional[Dict],
+        instance_settings: Optional[Dict[str, Any]],
+        summary: Optional[str],
+        session_id: Optional[UUID]
+    ) -> Tuple[str, Optional[List[int]], str]:
+        """Return the prompt, the session's reusable context and its fingerprint.
+
+        When the previous turn's Ollama context is still valid only the new
+        turn is sent; otherwise the full token-budgeted prompt is built.
+        """
+        system_prompt = self.prompt_builder.system_prompt(instance_settings)
+        fingerprint = f"{model}:{system_prompt.version}"
+
+        session_context = None
+        if session_id and settings.SESSION_CONTEXT_REUSE:
+            last_response = next(
+                (msg.content for msg in reversed(history) if msg.role == "assistant"),
+                None
+            )
+            session_context = await self.context_store.get(
+                session_id,
+                fingerprint,
+                last_response
+            )
+
+        if session_context:
+            prompt = self.prompt_builder.build_turn(message, context)
+        else:
+            prompt = self.prompt_builder.build(
+                message,
+                history,
+                system_prompt,
+                context,
+                summary
+            )
+        return prompt, session_context, fingerprint
+
+    async def _remember_context(
+        self,
+        session_id: Optional[UUID],
+        fingerprint: str,
+        result: Dict[str, Any],
+        response: str
+    ) -> None:
+        if not session_id or not settings.SESSION_CONTEXT_REUSE:
+            return
+        if result.get("context"):
+            await self.context_store.save(
+                session_id,
+                fingerprint,
+                result["context"],
+                response
+            )
+
+    @staticmethod
+    def _observe_generation(
+        model: str,
+        result: Dict[str, Any],
+        session_context: Optional[List[int]],
+        started: float
+    ) -> None:
+        LLM_MODEL_REQUESTS.labels(model=model, result="success").inc()
+        LLM_MODEL_LATENCY.labels(model=model).observe(time.monotonic() - started)
+        # Ollama reports eval_duration in nanoseconds
+        if result.get("eval_count") and result.get("eval_duration"):
+            LLM_MODEL_TOKENS_PER_SECOND.labels(model=model).observe(
+                result["eval_count"] / result["eval_duration"] * 1e9
+            )
+        if "prompt_eval_count" in result:
+            LLM_PREFILL_TOKENS.labels(
+                mode="reused" if session_context else "full"
+            ).observe(result["prompt_eval_count"])
+
+    @staticmethod
+    def _log_fallback(model: str, error: Exception) -> None:
+        LLM_MODEL_FALLBACKS.labels(model=model).inc()
+        logger.warning(
+            "LLM model failed, falling back to the next model",
+            extra={"model": model, "error": str(error)}
+        )
@@ -0,0 +1,293 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from datetime import datetime
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.cache import cache_manager
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import InstanceNotFoundException
+from app.core.logging import logger
+from app.core.metrics import (
+    MESSAGE_DEAD_LETTERS,
+    MESSAGE_FLUSH_BATCH_SIZE,
+    MESSAGE_FLUSH_FAILURES,
+    MESSAGE_FLUSH_LAG
+)
+from app.core.redis import redis_client
+from app.models.chat import Message
+from app.models.database.instance import DBInstance
+from app.services.chat_message_repository import ChatMessageRepository, message_seq
+
+settings = get_settings()
+
+# Errors that retrying can never fix: bad payloads and constraint violations
+_POISON_ERRORS = (IntegrityError, DataError, ValueError, KeyError, TypeError)
+
+def stream_seq(entry_id: str, index: int) -> int:
+    """Message seq derived from a stream entry id ("<ms>-<n>").
+
+    Uses the same scheme as synchronous appends, so a session keeps its
+    order when MESSAGE_WRITE_BEHIND is toggled. A redelivered entry maps to
+    the same seqs, which makes writes idempotent.
+    """
+    millis, counter = entry_id.split("-")
+    return message_seq(int(millis), int(counter), index)
+
+class MessageWriter:
+    """Write-behind persistence of chat messages through a Redis Stream.
+
+    ``enqueue`` appends a turn to the stream and returns. ``run`` is a
+    consumer-group worker that drains the stream in batches into Postgres
+    with one multi-row insert per batch, acknowledging entries only after
+    the commit. Entries left pending by a crashed worker are claimed after
+    ``claim_idle_ms``, so delivery is at-least-once; the seq derived from
+    the entry id makes replays idempotent.
+
+    When a batch fails its entries are retried one by one; an entry that can
+    never be written is moved to ``dead_letter_stream`` and acknowledged, so
+    it cannot stall the entries behind it.
+    """
+
+    def __init__(
+        self,
+        stream: str = "chat_messages:stream",
+        group: str = "chat_message_writers",
+        batch_size: int = 500,
+        block_ms: int = 1000,
+        claim_idle_ms: int = 60000,
+        max_len: int = 1000000,
+        dead_letter_stream: str = "chat_messages:dead_letter"
+    ):
+        self.stream = stream
+        self.group = group
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_len = max_len
+        self.dead_letter_stream = dead_letter_stream
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+
+    async def enqueue(
+        self,
+        session_id: UUID,
+        instance_id: UUID,
+        messages: Sequence[Message]
+    ) -> None:
+        # Instance ids come from clients; an unknown one would fail the flush
+        if not await self._instance_exists(instance_id):
+            raise InstanceNotFoundException(str(instance_id))
+
+        fields = {
+            "session_id": str(session_id),
+            "instance_id": str(instance_id),
+            "messages": json.dumps([
+                {
+                    "role": message.role,
+                    "content": message.content,
+                    "timestamp": message.timestamp.isoformat()
+                }
+                for message in messages
+            ])
+        }
+        try:
+            await redis_client.redis.xadd(
+                self.stream,
+                fields,
+                maxlen=self.max_len,
+                approximate=True
+            )
+        except RedisError as e:
+            # Without Redis, write through so the turn is not lost
+            logger.warning(f"Message stream unavailable, writing directly: {str(e)}")
+            entry_id = f"{int(time.time() * 1000)}-{random.getrandbits(16)}"
+            await self._write([(entry_id, fields)])
+
+    async def run(self) -> None:
+        """Drain the stream until cancelled."""
+        group_ready = False
+        # Start with entries this consumer read but never acknowledged
+        backlog = True
+        last_claim = 0.0
+
+        while True:
+            try:
+                if not group_ready:
+                    await self._ensure_group()
+                    group_ready = True
+
+                if time.monotonic() - last_claim > self.claim_idle_ms / 1000:
+                    await self._claim_stale()
+                    last_claim = time.monotonic()
+
+                entries = await self._read("0" if backlog else ">")
+                if backlog and not entries:
+                    backlog = False
+                    continue
+                if entries:
+                    await self._flush(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                MESSAGE_FLUSH_FAILURES.inc()
+                logger.error(f"Message flush failed: {str(e)}")
+                # Unacknowledged entries are retried from the pending list
+                backlog = True
+                await asyncio.sleep(1)
+
+    async def _ensure_group(self) -> None:
+        try:
+            await redis_client.redis.xgroup_create(
+                self.stream,
+                self.group,
+                id="0",
+                mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, start: str) -> List[Tuple[str, Dict[str, str]]]:
+        response = await redis_client.redis.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: start},
+            count=self.batch_size,
+            # Pending entries are returned immediately; only block for new ones
+            block=None if start == "0" else self.block_ms
+        )
+        if not response:
+            return []
+        return await self._live_entries(response[0][1])
+
+    async def _claim_stale(self) -> None:
+        # Take over entries another worker read but never acknowledged
+        _, entries, *_ = await redis_client.redis.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            count=self.batch_size
+        )
+        entries = await self._live_entries(entries)
+        if entries:
+            await self._flush(entries)
+
+    async def _live_entries(
+        self,
+        entries: List[Tuple[str, Optional[Dict[str, str]]]]
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        # Entries trimmed from the stream while pending come back without
+        # fields; acknowledge them so they leave the pending list
+        trimmed = [entry_id for entry_id, fields in entries if not fields]
+        if trimmed:
+            await redis_client.redis.xack(self.stream, self.group, *trimmed)
+        return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+    async def _instance_exists(self, instance_id: UUID) -> bool:
+        async def load() -> bool:
+            async with AsyncSessionLocal() as db:
+                return await db.scalar(
+                    select(DBInstance.id).where(DBInstance.id == instance_id)
+                ) is not None
+
+        try:
+            return await cache_manager.get_or_set(
+                f"instance_exists:{instance_id}",
+                load,
+                300,
+                tags=[f"instance:{instance_id}"]
+            )
+        except RedisError:
+            # enqueue() falls back to writing directly; check the database
+            return await load()
+
+    async def _flush(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        try:
+            await self._write(entries)
+        except _POISON_ERRORS as e:
+            logger.warning(f"Message batch failed, retrying entries one by one: {str(e)}")
+            entries = await self._write_each(entries)
+
+        if not entries:
+            return
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with redis_client.redis.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            await pipe.execute()
+
+        now_ms = time.time() * 1000
+        MESSAGE_FLUSH_BATCH_SIZE.observe(len(entries))
+        for entry_id in entry_ids:
+            MESSAGE_FLUSH_LAG.observe(max(now_ms - int(entry_id.split("-")[0]), 0) / 1000)
+
+    async def _write_each(
+        self,
+        entries: List[Tuple[str, Dict[str, str]]]
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        """Write entries individually; returns those written.
+
+        Transient errors still propagate, leaving the batch pending.
+        """
+        written = []
+        for entry in entries:
+            try:
+                await self._write([entry])
+            except _POISON_ERRORS as e:
+                await self._dead_letter(entry, e)
+            else:
+                written.append(entry)
+        return written
+
+    async def _dead_letter(self, entry: Tuple[str, Dict[str, str]], error: Exception) -> None:
+        entry_id, fields = entry
+        logger.error(f"Moving message stream entry {entry_id} to {self.dead_letter_stream}: {str(error)}")
+        async with redis_client.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.dead_letter_stream,
+                {**fields, "entry_id": entry_id, "error": str(error)[:1000]},
+                maxlen=self.max_len,
+                approximate=True
+            )
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+        MESSAGE_DEAD_LETTERS.inc()
+
+    async def _write(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        rows: List[Dict[str, Any]] = []
+        for entry_id, fields in entries:
+            session_id = UUID(fields["session_id"])
+            instance_id = UUID(fields["instance_id"])
+            for index, message in enumerate(json.loads(fields["messages"])):
+                rows.append({
+                    "session_id": session_id,
+                    "seq": stream_seq(entry_id, index),
+                    "instance_id": instance_id,
+                    "role": message["role"],
+                    "content": message["content"],
+                    "created_at": datetime.fromisoformat(message["timestamp"])
+                })
+
+        async with AsyncSessionLocal() as db:
+            await ChatMessageRepository(db).insert_messages(rows)
+            await db.commit()
+
+message_writer = MessageWriter(
+    stream=settings.MESSAGE_STREAM_KEY,
+    batch_size=settings.MESSAGE_FLUSH_BATCH_SIZE,
+    block_ms=settings.MESSAGE_FLUSH_BLOCK_MS,
+    claim_idle_ms=settings.MESSAGE_FLUSH_CLAIM_IDLE_MS,
+    max_len=settings.MESSAGE_STREAM_MAXLEN,
+    dead_letter_stream=settings.MESSAGE_DEAD_LETTER_STREAM
+)
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Optional
+import re
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+GREETING = "greeting"
+
+_GREETING_WORDS = {
+    "hi", "hello", "hey", "hallo", "hola", "bonjour", "ciao", "yo",
+    "thanks", "thank", "thx", "bye", "goodbye", "morning", "evening"
+}
+_WORD = re.compile(r"\w+")
+
+class ModelRouter:
+    """Chooses which Ollama models serve a request, in fallback order.
+
+    Requests are classified into a route: ``greeting`` for short
+    salutations, otherwise the instance's ``behavior.response_length``
+    (concise, balanced or detailed). The route's model list comes from the
+    instance's ``behavior.model_routes``, then the global ``routes`` table,
+    and the default model is always tried last.
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        routes: Optional[Dict[str, List[str]]] = None,
+        greeting_max_words: int = 4
+    ):
+        self.default_model = default_model
+        self.routes = routes or {}
+        self.greeting_max_words = greeting_max_words
+
+    def route(
+        self,
+        message: str,
+        instance_settings: Optional[Dict[str, Any]] = None
+    ) -> str:
+        words = _WORD.findall(message.casefold())
+        if words and len(words) <= self.greeting_max_words and words[0] in _GREETING_WORDS:
+            return GREETING
+        return self._behavior(instance_settings).get("response_length") or "balanced"
+
+    def candidates(
+        self,
+        message: str,
+        instance_settings: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        route = self.route(message, instance_settings)
+        instance_routes = self._behavior(instance_settings).get("model_routes") or {}
+
+        models = instance_routes.get(route) or self.routes.get(route) or []
+        ordered: List[str] = []
+        for model in [*models, self.default_model]:
+            if model not in ordered:
+                ordered.append(model)
+        return ordered
+
+    @staticmethod
+    def _behavior(instance_settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        behavior = (instance_settings or {}).get("behavior")
+        return behavior if isinstance(behavior, dict) else {}
+
+model_router = ModelRouter(
+    default_model=settings.LLM_MODEL,
+    routes=settings.LLM_MODEL_ROUTES
+)
@@ -0,0 +1,159 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import math
+
+from pydantic import ValidationError
+
+from app.core.config import get_settings
+from app.models.chat import Message
+from app.models.instance_settings import InstanceSettings
+
+settings = get_settings()
+
+TONE_INSTRUCTIONS = {
+    "professional": "Use a professional, courteous tone.",
+    "friendly": "Use a warm, friendly tone.",
+    "technical": "Use precise, technical language.",
+    "casual": "Use a relaxed, conversational tone."
+}
+
+LENGTH_INSTRUCTIONS = {
+    "concise": "Keep answers short: one to three sentences.",
+    "balanced": "Keep answers focused, a short paragraph at most unless more is needed.",
+    "detailed": "Give thorough, well-structured answers."
+}
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token for English text)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+class CompiledSystemPrompt:
+    def __init__(self, text: str, tokens: int, version: str):
+        self.text = text
+        self.tokens = tokens
+        self.version = version
+
+class PromptBuilder:
+    """Builds token-budgeted prompts from per-instance settings.
+
+    The system prompt for an instance depends only on its settings, so it is
+    compiled once and cached under a fingerprint of those settings (instances
+    with identical settings share an entry). History
+    is then filled from newest to oldest until the token budget is spent.
+    """
+
+    def __init__(
+        self,
+        max_context_tokens: int = 2048,
+        reserved_response_tokens: int = 512,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        cache_size: int = 1024
+    ):
+        self.max_context_tokens = max_context_tokens
+        self.reserved_response_tokens = reserved_response_tokens
+        self.count_tokens = count_tokens
+        self.cache_size = cache_size
+        self._compiled: "OrderedDict[str, CompiledSystemPrompt]" = OrderedDict()
+
+    def system_prompt(
+        self,
+        instance_settings: Optional[Dict[str, Any]] = None
+    ) -> CompiledSystemPrompt:
+        version = self.settings_version(instance_settings or {})
+
+        compiled = self._compiled.get(version)
+        if compiled is not None:
+            self._compiled.move_to_end(version)
+            return compiled
+
+        try:
+            parsed = InstanceSettings(**(instance_settings or {}))
+        except ValidationError:
+            parsed = InstanceSettings()
+        text = self._compile(parsed)
+        compiled = CompiledSystemPrompt(text, self.count_tokens(text), version)
+
+        self._compiled[version] = compiled
+        if len(self._compiled) > self.cache_size:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    def build(
+        self,
+        message: str,
+        history: List[Message],
+        system_prompt: CompiledSystemPrompt,
+        context: Optional[Dict] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        header = system_prompt.text
+        if context:
+            header += f"\nWebsite context: {context.get('website_info', '')}."
+            header += f"\nCurrent page: {context.get('current_page', '')}."
+        if summary:
+            header += f"\n\nSummary of the earlier conversation:\n{summary}"
+
+        question = f"User: {message}\nAssistant:"
+
+        budget = (
+            self.max_context_tokens
+            - self.reserved_response_tokens
+            - system_prompt.tokens
+            - self.count_tokens(header[len(system_prompt.text):])
+            - self.count_tokens(question)
+        )
+
+        # Fill history from newest to oldest until the budget runs out
+        turns: List[str] = []
+        for msg in reversed(history):
+            turn = f"{msg.role.capitalize()}: {msg.content}"
+            cost = self.count_tokens(turn) + 1
+            if cost > budget:
+                break
+            turns.append(turn)
+            budget -= cost
+        turns.reverse()
+
+        prompt = header + "\n\n"
+        if turns:
+            prompt += "Chat history:\n" + "\n".join(turns) + "\n\n"
+        return prompt + question
+
+    def build_turn(self, message: str, context: Optional[Dict] = None) -> str:
+        """Prompt for a single new turn appended to a reused Ollama context."""
+        prompt = "\n"
+        if context and context.get("current_page"):
+            prompt += f"(Current page: {context['current_page']}.)\n"
+        return prompt + f"User: {message}\nAssistant:"
+
+    @staticmethod
+    def settings_version(instance_settings: Dict[str, Any]) -> str:
+        """Fingerprint of the settings sections that shape the system prompt."""
+        relevant = {
+            section: instance_settings.get(section)
+            for section in ("identity", "behavior")
+        }
+        payload = json.dumps(relevant, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _compile(self, instance_settings: InstanceSettings) -> str:
+        identity = instance_settings.identity
+        behavior = instance_settings.behavior
+
+        lines = [
+            f"You are {identity.name}, an AI assistant helping users on a website.",
+            identity.description,
+            TONE_INSTRUCTIONS.get(behavior.tone, ""),
+            LENGTH_INSTRUCTIONS.get(behavior.response_length, ""),
+            f"Reply in the language with code '{behavior.language}' "
+            "unless the user writes in another language.",
+            f"If you cannot help, say: \"{behavior.fallback_message}\""
+        ]
+        return "\n".join(line for line in lines if line)
+
+prompt_builder = PromptBuilder(
+    max_context_tokens=settings.LLM_CONTEXT_TOKENS,
+    reserved_response_tokens=settings.LLM_RESPONSE_TOKENS
+)
@@ -0,0 +1,230 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from uuid import UUID
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+from app.core.cache import cache_manager
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import SEMANTIC_CACHE_REQUESTS
+from app.services.llm_service import LLMService
+
+settings = get_settings()
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(message: str) -> str:
+    """Lexically normalize a question so trivial variants share a cache key."""
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+class SemanticIndex:
+    """Bounded in-memory index of cached answers for one instance.
+
+    Question vectors are stored L2-normalized in a preallocated matrix so a
+    lookup is a single matrix-vector product followed by an argmax.
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted when the index is full.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # normalized question -> (slot, response), in LRU order
+        self._entries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_exact(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        slot, response = entry
+        if self._expires_at[slot] <= time.time():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return response
+
+    def search(
+        self,
+        vector: np.ndarray,
+        threshold: float
+    ) -> Optional[Tuple[str, float]]:
+        """Return the most similar live answer and its cosine similarity."""
+        if self._vectors is None or not self._entries:
+            return None
+        if vector.shape[0] != self._vectors.shape[1]:
+            return None
+
+        scores = self._vectors @ self._unit(vector)
+        # Empty and expired slots can never match
+        scores[self._expires_at <= time.time()] = -np.inf
+
+        slot = int(np.argmax(scores))
+        score = float(scores[slot])
+        if score < threshold:
+            return None
+
+        key = self._slot_keys[slot]
+        self._entries.move_to_end(key)
+        return self._entries[key][1], score
+
+    def add(self, key: str, vector: Optional[np.ndarray], response: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if not self._free_slots:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+        slot = self._free_slots.pop()
+        if vector is not None:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.max_entries, vector.shape[0]),
+                    dtype=np.float32
+                )
+            if vector.shape[0] == self._vectors.shape[1]:
+                self._vectors[slot] = self._unit(vector)
+
+        self._slot_keys[slot] = key
+        self._expires_at[slot] = time.time() + self.ttl
+        self._entries[key] = (slot, response)
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        slot, _ = self._entries.pop(key)
+        if self._vectors is not None:
+            self._vectors[slot] = 0.0
+        self._expires_at[slot] = 0.0
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return vector.astype(np.float32)
+        return (vector / norm).astype(np.float32)
+
+class SemanticCache:
+    """Two-tier per-instance response cache.
+
+    The lexical tier matches questions that are identical after
+    normalization. The semantic tier embeds the question through Ollama and
+    returns the closest cached answer above the similarity threshold.
+    """
+
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl: int = 3600
+    ):
+        self.llm_service = llm_service or LLMService()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes: Dict[UUID, SemanticIndex] = {}
+
+    async def lookup(
+        self,
+        instance_id: UUID,
+        message: str
+    ) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return a cached answer, or None and the question embedding.
+
+        The embedding is returned on a miss so the caller can pass it back to
+        store() without embedding the question twice.
+        """
+        index = self._indexes.get(instance_id)
+        key = normalize_message(message)
+
+        if index is not None:
+            response = index.get_exact(key)
+            if response is not None:
+                SEMANTIC_CACHE_REQUESTS.labels(tier="lexical", result="hit").inc()
+                return response, None
+        SEMANTIC_CACHE_REQUESTS.labels(tier="lexical", result="miss").inc()
+
+        vector = await self._embed(message)
+        if vector is None:
+            return None, None
+
+        if index is not None:
+            match = index.search(vector, self.threshold)
+            if match is not None:
+                SEMANTIC_CACHE_REQUESTS.labels(tier="semantic", result="hit").inc()
+                return match[0], vector
+        SEMANTIC_CACHE_REQUESTS.labels(tier="semantic", result="miss").inc()
+
+        return None, vector
+
+    async def store(
+        self,
+        instance_id: UUID,
+        message: str,
+        response: str,
+        vector: Optional[np.ndarray] = None
+    ) -> None:
+        """Cache an answer; without a vector only the lexical tier can match."""
+        index = self._indexes.get(instance_id)
+        if index is None:
+            index = self._indexes[instance_id] = SemanticIndex(
+                self.max_entries,
+                self.ttl
+            )
+        index.add(normalize_message(message), vector, response)
+
+    def invalidate(self, instance_id: UUID) -> None:
+        index = self._indexes.pop(instance_id, None)
+        if index is not None:
+            index.clear()
+
+    def clear(self) -> None:
+        for instance_id in list(self._indexes):
+            self.invalidate(instance_id)
+
+    async def _embed(self, message: str) -> Optional[np.ndarray]:
+        try:
+            return np.asarray(
+                await self.llm_service.embed(message),
+                dtype=np.float32
+            )
+        except Exception as e:
+            # The lexical tier keeps working without embeddings
+            logger.warning(f"Semantic cache embedding failed: {str(e)}")
+            return None
+
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=settings.SEMANTIC_CACHE_TTL
+)
+
+def _invalidate_instance(tag: str) -> None:
+    # Answers were generated under the instance's previous settings
+    kind, _, instance_id = tag.partition(":")
+    if kind == "instance":
+        semantic_cache.invalidate(UUID(instance_id))
+
+cache_manager.on_tag_invalidated(_invalidate_instance)
+# Tag invalidations may have been missed along with the L1 ones
+cache_manager.on_clear_local(semantic_cache.clear)
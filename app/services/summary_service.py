@@ -0,0 +1,136 @@
+from typing import Callable, List, Optional, Set
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from app.core.admission import BATCH, priority
+from app.core.background import run_in_background
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import CONVERSATION_SUMMARIES
+from app.core.redis import redis_client
+from app.models.chat import ConversationSummary, Message
+from app.services.history_buffer import epoch_millis
+from app.services.llm_service import LLMService
+from app.services.prompt_builder import estimate_tokens
+
+settings = get_settings()
+
+class ConversationSummarizer:
+    """Keeps a rolling summary of long conversations.
+
+    Once the messages not yet covered by the summary exceed ``trigger_tokens``,
+    everything but the ``keep_recent`` newest messages is folded into the
+    stored summary by a background task. Prompts then use the summary plus the
+    uncovered messages, so their size stays bounded however long the session.
+    """
+
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        trigger_tokens: int = 1024,
+        keep_recent: int = 6,
+        ttl: int = 86400,
+        count_tokens: Callable[[str], int] = estimate_tokens
+    ):
+        self.llm_service = llm_service or LLMService()
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent = keep_recent
+        self.ttl = ttl
+        self.count_tokens = count_tokens
+        self._running: Set[UUID] = set()
+
+    async def get(self, session_id: UUID) -> Optional[ConversationSummary]:
+        try:
+            cached = await redis_client.get(self._key(session_id))
+        except RedisError as e:
+            logger.warning(f"Could not load conversation summary: {str(e)}")
+            return None
+        if not cached:
+            return None
+        return ConversationSummary.parse_raw(cached)
+
+    def uncovered(
+        self,
+        history: List[Message],
+        summary: Optional[ConversationSummary]
+    ) -> List[Message]:
+        """Messages newer than the summary, in chronological order.
+
+        Compared in whole milliseconds: history read from the Redis buffer
+        carries no finer timestamps than that, history read from Postgres
+        does, and a summary outlives the buffer.
+        """
+        if summary is None:
+            return history
+        covered_until = epoch_millis(summary.covered_until)
+        return [msg for msg in history if epoch_millis(msg.timestamp) > covered_until]
+
+    def schedule_if_needed(
+        self,
+        session_id: UUID,
+        history: List[Message],
+        summary: Optional[ConversationSummary]
+    ) -> bool:
+        """Start a background summarization if the session has grown too long."""
+        pending = self.uncovered(history, summary)
+        if len(pending) <= self.keep_recent or session_id in self._running:
+            return False
+
+        tokens = sum(self.count_tokens(msg.content) for msg in pending)
+        if tokens < self.trigger_tokens:
+            return False
+
+        self._running.add(session_id)
+        run_in_background(
+            self._summarize(session_id, summary, pending[:-self.keep_recent]),
+            name=f"summarize:{session_id}"
+        )
+        return True
+
+    async def _summarize(
+        self,
+        session_id: UUID,
+        previous: Optional[ConversationSummary],
+        messages: List[Message]
+    ) -> None:
+        lock_key = f"chat_summary_lock:{session_id}"
+        try:
+            # Only one worker summarizes a given session at a time
+            if not await redis_client.redis.set(lock_key, "1", nx=True, ex=120):
+                return
+
+            try:
+                # Summaries are never on a user's critical path
+                with priority(BATCH):
+                    text = await self.llm_service.summarize(
+                        previous.summary if previous else None,
+                        messages
+                    )
+                summary = ConversationSummary(
+                    summary=text,
+                    covered_until=messages[-1].timestamp
+                )
+                await redis_client.set_with_ttl(
+                    self._key(session_id),
+                    summary.json(),
+                    self.ttl
+                )
+                CONVERSATION_SUMMARIES.labels(status="success").inc()
+            except Exception:
+                CONVERSATION_SUMMARIES.labels(status="error").inc()
+                raise
+            finally:
+                await redis_client.delete(lock_key)
+        finally:
+            self._running.discard(session_id)
+
+    @staticmethod
+    def _key(session_id: UUID) -> str:
+        return f"chat_summary:{session_id}"
+
+conversation_summarizer = ConversationSummarizer(
+    trigger_tokens=settings.SUMMARY_TRIGGER_TOKENS,
+    keep_recent=settings.SUMMARY_KEEP_RECENT_MESSAGES,
+    ttl=settings.SUMMARY_TTL
+)
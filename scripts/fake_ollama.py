@@ -0,0 +1,311 @@
+"""Deterministic stand-in for the Ollama HTTP API.
+
+Implements /api/generate (streaming and non-streaming), /api/embeddings and
+/api/tags with configurable speed and failure rate, so LLMService and
+ChatService can be benchmarked and tested without a real model. Responses,
+embeddings and context arrays depend only on the request and the seed.
+
+Run from the repository root:
+
+    python -m scripts.fake_ollama --port 11434 --tokens-per-second 40 --ttft 0.2
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    "the assistant can help you find pricing plans account settings orders "
+    "shipping returns support hours contact details and answers to common "
+    "questions about this website please let me know what you need"
+).split()
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_VOCAB_SIZE = 32000
+
+@dataclass
+class FakeOllamaConfig:
+    tokens_per_second: float = 0.0  # 0 disables generation delay
+    ttft: float = 0.0  # seconds before the first token
+    error_rate: float = 0.0  # share of generate/embedding calls that fail
+    response_tokens: int = 32
+    max_context: int = 4096  # tokens kept in returned context arrays
+    embedding_dim: int = 768
+    models: List[str] = field(
+        default_factory=lambda: ["llama2:latest", "nomic-embed-text:latest"]
+    )
+    seed: int = 0
+
+def tokenize(text: str) -> List[int]:
+    """Stable fake token ids: one per word or punctuation mark."""
+    return [
+        zlib.crc32(token.encode()) % _VOCAB_SIZE
+        for token in _TOKEN.findall(text)
+    ]
+
+class FakeOllama:
+    def __init__(self, config: Optional[FakeOllamaConfig] = None):
+        self.config = config or FakeOllamaConfig()
+        self._random = random.Random(self.config.seed)
+        self.requests: Dict[str, int] = {}
+        self.app = self._build_app()
+
+    def response_for(self, model: str, prompt: str, limit: Optional[int] = None) -> List[str]:
+        """Words the fake model answers with for a prompt."""
+        count = self.config.response_tokens
+        if limit is not None and limit >= 0:
+            count = min(count, limit)
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode()).digest()
+        rng = random.Random(digest)
+        return [rng.choice(_WORDS) for _ in range(count)]
+
+    def embedding_for(self, model: str, prompt: str) -> List[float]:
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode()).digest()
+        rng = random.Random(digest)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.config.embedding_dim)]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Ollama")
+
+        @app.get("/api/tags")
+        async def tags():
+            self._count("tags")
+            return {
+                "models": [
+                    {"name": name, "model": name, "size": 0}
+                    for name in self.config.models
+                ]
+            }
+
+        @app.post("/api/embeddings")
+        async def embeddings(request: Request):
+            self._count("embeddings")
+            body = await request.json()
+            error = self._check(body.get("model", ""))
+            if error is not None:
+                return error
+            return {"embedding": self.embedding_for(body["model"], body.get("prompt", ""))}
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            self._count("generate")
+            body = await request.json()
+            model = body.get("model", "")
+            error = self._check(model)
+            if error is not None:
+                return error
+
+            prompt = body.get("prompt", "")
+            context = list(body.get("context") or [])
+            limit = (body.get("options") or {}).get("num_predict")
+            words = self.response_for(model, prompt, limit)
+
+            if body.get("stream", True):
+                return StreamingResponse(
+                    self._stream(model, prompt, context, words),
+                    media_type="application/x-ndjson"
+                )
+
+            started = time.monotonic()
+            await self._sleep_generation(len(words))
+            return self._final_chunk(
+                model,
+                prompt,
+                context,
+                words,
+                time.monotonic() - started,
+                response=" ".join(words)
+            )
+
+        return app
+
+    async def _stream(
+        self,
+        model: str,
+        prompt: str,
+        context: List[int],
+        words: List[str]
+    ) -> AsyncIterator[str]:
+        started = time.monotonic()
+        if self.config.ttft:
+            await asyncio.sleep(self.config.ttft)
+
+        for i, word in enumerate(words):
+            if i and self.config.tokens_per_second:
+                await asyncio.sleep(1 / self.config.tokens_per_second)
+            chunk = {
+                "model": model,
+                "created_at": self._now(),
+                "response": word if i == 0 else f" {word}",
+                "done": False
+            }
+            yield json.dumps(chunk) + "\n"
+
+        final = self._final_chunk(
+            model,
+            prompt,
+            context,
+            words,
+            time.monotonic() - started,
+            response=""
+        )
+        yield json.dumps(final) + "\n"
+
+    def _final_chunk(
+        self,
+        model: str,
+        prompt: str,
+        context: List[int],
+        words: List[str],
+        elapsed: float,
+        response: str
+    ) -> Dict[str, Any]:
+        prompt_tokens = tokenize(prompt)
+        # Like Ollama, the context holds the whole conversation so far
+        new_context = context + prompt_tokens + tokenize(" ".join(words))
+        eval_duration = max(int((elapsed - self.config.ttft) * 1e9), 1)
+        return {
+            "model": model,
+            "created_at": self._now(),
+            "response": response,
+            "done": True,
+            "done_reason": "stop",
+            "context": new_context[-self.config.max_context:],
+            "total_duration": int(elapsed * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt_tokens),
+            "prompt_eval_duration": int(self.config.ttft * 1e9),
+            "eval_count": len(words),
+            "eval_duration": eval_duration
+        }
+
+    async def _sleep_generation(self, tokens: int) -> None:
+        delay = self.config.ttft
+        if self.config.tokens_per_second and tokens > 1:
+            delay += (tokens - 1) / self.config.tokens_per_second
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _check(self, model: str) -> Optional[JSONResponse]:
+        names = set(self.config.models)
+        if names and model not in names and f"{model}:latest" not in names:
+            return JSONResponse(
+                status_code=404,
+                content={"error": f"model '{model}' not found, try pulling it first"}
+            )
+        if self.config.error_rate and self._random.random() < self.config.error_rate:
+            return JSONResponse(
+                status_code=500,
+                content={"error": "fake ollama: injected failure"}
+            )
+        return None
+
+    def _count(self, endpoint: str) -> None:
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+class FakeOllamaServer:
+    """Runs a FakeOllama on a local port in a background thread.
+
+    Usable as a context manager; ``url`` is the base URL to configure as an
+    Ollama backend.
+    """
+
+    def __init__(
+        self,
+        config: Optional[FakeOllamaConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        self.fake = FakeOllama(config)
+        self.host = host
+        self.port = port or self._free_port(host)
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.fake.app, host=host, port=self.port, log_level="warning")
+        )
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Ollama server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @staticmethod
+    def _free_port(host: str) -> int:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            return sock.getsockname()[1]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--ttft", type=float, default=0.0, help="seconds to first token")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-tokens", type=int, default=32)
+    parser.add_argument("--max-context", type=int, default=4096)
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=FakeOllamaConfig().models,
+        help="models reported by /api/tags; others get 404"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        FakeOllamaConfig(
+            tokens_per_second=args.tokens_per_second,
+            ttft=args.ttft,
+            error_rate=args.error_rate,
+            response_tokens=args.response_tokens,
+            max_context=args.max_context,
+            embedding_dim=args.embedding_dim,
+            models=args.models,
+            seed=args.seed
+        )
+    )
+    uvicorn.run(fake.app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
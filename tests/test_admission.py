@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+
+from app.core.admission import BATCH, INTERACTIVE, AdmissionController, priority
+from app.core.exceptions import ServiceOverloadedException
+
+
+def make_controller(max_concurrency=1, max_queue=1, queue_timeout=1.0):
+    return AdmissionController(
+        name="test",
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+        queue_timeout=queue_timeout,
+        retry_after=3
+    )
+
+
+async def test_limits_concurrency_and_hands_slots_to_waiters():
+    controller = make_controller(max_concurrency=2, max_queue=10)
+    running = 0
+    peak = 0
+
+    async def work():
+        nonlocal running, peak
+        async with controller.admit():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[work() for _ in range(8)])
+
+    assert peak == 2
+    assert controller.in_flight == 0
+    assert controller.queue_depth == 0
+
+
+async def test_sheds_when_queue_is_full():
+    controller = make_controller(max_concurrency=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.admit():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceOverloadedException) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.headers == {"Retry-After": "3"}
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert controller.in_flight == 0
+
+
+async def test_sheds_after_queue_deadline():
+    controller = make_controller(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+    await controller.acquire()
+
+    with pytest.raises(ServiceOverloadedException):
+        await controller.acquire()
+
+    assert controller.queue_depth == 0
+    controller.release()
+    assert controller.in_flight == 0
+
+
+async def test_interactive_waiters_are_served_before_batch():
+    controller = AdmissionController(
+        name="test",
+        max_concurrency=2,
+        max_queue=10,
+        queue_timeout=1.0,
+        retry_after=3,
+        batch_max_concurrency=1
+    )
+    order = []
+    release = asyncio.Event()
+
+    async def work(lane, label):
+        with priority(lane):
+            async with controller.admit():
+                order.append(label)
+                await release.wait()
+
+    with priority(INTERACTIVE):
+        await controller.acquire()
+    batch_holder = asyncio.create_task(work(BATCH, "batch-1"))
+    await asyncio.sleep(0)
+    # The batch lane is at its limit, so this one waits even with no queue
+    batch_waiter = asyncio.create_task(work(BATCH, "batch-2"))
+    await asyncio.sleep(0)
+    interactive_waiter = asyncio.create_task(work(INTERACTIVE, "interactive"))
+    await asyncio.sleep(0)
+
+    assert order == ["batch-1"]
+    controller.release(INTERACTIVE)
+    await asyncio.sleep(0.01)
+    assert order == ["batch-1", "interactive"]
+
+    release.set()
+    await asyncio.gather(batch_holder, batch_waiter, interactive_waiter)
+    assert order[-1] == "batch-2"
+    assert controller.in_flight == 0
@@ -0,0 +1,83 @@
+import asyncio
+import httpx
+import pytest
+
+from app.core.exceptions import LLMRequestException, LLMServiceException
+from app.services.backend_pool import BackendPool, CircuitBreaker
+
+
+def make_pool(*urls, **kwargs):
+    return BackendPool(list(urls), **kwargs)
+
+
+async def test_routes_to_backend_with_fewest_outstanding_requests():
+    pool = make_pool("http://a", "http://b")
+
+    async with pool.acquire() as first:
+        async with pool.acquire() as second:
+            assert {first.url, second.url} == {"http://a", "http://b"}
+
+
+def test_prefers_backends_with_the_model_loaded():
+    pool = make_pool("http://a", "http://b")
+    pool.backends[0].models = {"other:latest"}
+    pool.backends[1].models = {"llama2:latest"}
+    pool.backends[1].outstanding = 2
+
+    assert pool.select("llama2").url == "http://b"
+    assert pool.select("other").url == "http://a"
+
+
+async def test_failing_backend_is_ejected_and_readmitted():
+    pool = make_pool("http://a", "http://b", failure_threshold=2, recovery_timeout=0.05)
+    failing, healthy = pool.backends
+    # Keep routing onto the failing backend until it is ejected
+    healthy.outstanding = 100
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            async with pool.acquire() as backend:
+                assert backend is failing
+                raise httpx.ConnectTimeout("timeout")
+
+    assert failing.breaker.state == CircuitBreaker.OPEN
+    assert pool.select() is healthy
+
+    await asyncio.sleep(0.06)
+    async with pool.acquire() as backend:
+        assert backend is failing
+    assert failing.breaker.state == CircuitBreaker.CLOSED
+    assert failing.breaker.weight < 1.0
+
+
+async def test_rejected_requests_and_untracked_calls_keep_the_breaker_closed():
+    pool = make_pool("http://a", failure_threshold=1)
+    breaker = pool.backends[0].breaker
+
+    with pytest.raises(LLMRequestException):
+        async with pool.acquire("missing-model"):
+            raise LLMRequestException("model 'missing-model' not found")
+    with pytest.raises(httpx.ConnectError):
+        async with pool.acquire("embedder", track_health=False):
+            raise httpx.ConnectError("refused")
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_raises_when_no_backend_is_available():
+    pool = make_pool("http://a", failure_threshold=1, recovery_timeout=60)
+    pool.backends[0].breaker.record_failure()
+
+    with pytest.raises(LLMServiceException):
+        pool.select()
+
+
+def test_ollama_errors_are_classified_by_cause():
+    from app.core.exceptions import LLMBackendException
+    from app.services.llm_service import LLMService
+
+    assert isinstance(LLMService._api_error(404, '{"error":"model not found"}'), LLMRequestException)
+    assert isinstance(LLMService._api_error(400, "bad request"), LLMRequestException)
+    assert isinstance(LLMService._api_error(500, 'model "x" not found, try pulling it first'), LLMRequestException)
+    assert isinstance(LLMService._api_error(503, "overloaded"), LLMBackendException)
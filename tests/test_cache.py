@@ -0,0 +1,344 @@
+import asyncio
+import json
+import random
+import time
+
+from app.core import cache, singleflight
+from app.core.cache import CacheManager, LocalCache, refresh_due
+from app.core.cache_codecs import CacheEntry
+
+
+class FakeRedisConnection:
+    def __init__(self, client):
+        self.client = client
+        self.published = []
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.client.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+    def pipeline(self, transaction=True):
+        return FakeCounterPipeline(self.client)
+
+
+class FakeCounterPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.keys = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def incr(self, key):
+        self.keys.append(key)
+
+    async def execute(self):
+        for key in self.keys:
+            self.client.counters[key] = self.client.counters.get(key, 0) + 1
+        return [self.client.counters[key] for key in self.keys]
+
+
+class FakeRedisClient:
+    def __init__(self):
+        self.data = {}
+        self.counters = {}
+        self.leases = {}
+        self.reads = 0
+        self.redis = FakeRedisConnection(self)
+
+    async def mget_bytes(self, keys):
+        self.reads += 1
+        return [self.counters.get(key, self.data.get(key)) for key in keys]
+
+    async def get_bytes(self, key):
+        self.reads += 1
+        return self.data.get(key)
+
+    async def get_bytes_or_lease(self, key, lease_key, token, lease_ttl_ms):
+        self.reads += 1
+        if key in self.data:
+            return self.data[key], False
+        if lease_key in self.leases:
+            return None, False
+        self.leases[lease_key] = token
+        return None, True
+
+    async def set_bytes_with_ttl(self, key, value, ttl_seconds):
+        self.data[key] = value
+
+
+def fake_lease():
+    leases = set()
+
+    async def set_nx(key, value, nx=False, px=None):
+        if key in leases:
+            return None
+        leases.add(key)
+        return True
+
+    return set_nx
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2, ttl=60)
+    local.set("a", b"1")
+    local.set("b", b"2")
+    local.get("a")
+    local.set("c", b"3")
+
+    assert local.get("b") is None
+    assert local.get("a") == b"1"
+    assert local.get("c") == b"3"
+
+
+def test_local_cache_ttl_is_capped_by_max_staleness():
+    manager = CacheManager(
+        l1_policies={"hot": {"max_entries": 10, "ttl": 600}},
+        l1_max_staleness=5
+    )
+
+    assert manager._local("hot:key").ttl == 5
+    assert manager._local("cold:key") is None
+
+
+async def test_l1_serves_hot_keys_without_redis(monkeypatch):
+    client = FakeRedisClient()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager(l1_policies={"hot": {"max_entries": 10, "ttl": 30}})
+    calls = 0
+
+    async def getter():
+        nonlocal calls
+        calls += 1
+        return {"value": calls}
+
+    assert await manager.get_or_set("hot:key", getter) == {"value": 1}
+    reads = client.reads
+    first = await manager.get_or_set("hot:key", getter)
+    first["value"] = 99
+
+    # Served from L1 as a fresh copy
+    assert await manager.get_or_set("hot:key", getter) == {"value": 1}
+    assert client.reads == reads
+    assert calls == 1
+
+    # Keys without a policy always go to Redis
+    await manager.get_or_set("cold:key", getter)
+    await manager.get_or_set("cold:key", getter)
+    assert client.reads == reads + 2
+
+
+async def test_invalidate_drops_everywhere_and_broadcasts(monkeypatch):
+    client = FakeRedisClient()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager(
+        l1_policies={"hot": {"max_entries": 10, "ttl": 30}},
+        invalidation_channel="invalidate"
+    )
+
+    async def getter():
+        return "old"
+
+    await manager.get_or_set("hot:key", getter)
+    await manager.invalidate("hot:key")
+
+    assert "hot:key" not in client.data
+    assert manager._local("hot:key").get("hot:key") is None
+    assert client.redis.published == [("invalidate", {"keys": ["hot:key"]})]
+
+
+async def test_invalidating_a_tag_retires_all_its_entries(monkeypatch):
+    client = FakeRedisClient()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager(invalidation_channel="invalidate")
+    invalidated = []
+    manager.on_tag_invalidated(invalidated.append)
+    version = "old"
+
+    async def getter():
+        return version
+
+    tags = ["instance:1"]
+    assert await manager.get_or_set("reply:a", getter, tags=tags) == "old"
+    assert await manager.get_or_set("reply:b", getter, tags=tags) == "old"
+    assert await manager.get_or_set("reply:c", getter, tags=["instance:2"]) == "old"
+
+    version = "new"
+    await manager.invalidate_tags("instance:1")
+
+    assert await manager.get_or_set("reply:a", getter, tags=tags) == "new"
+    assert await manager.get_or_set("reply:b", getter, tags=tags) == "new"
+    assert await manager.get_or_set("reply:c", getter, tags=["instance:2"]) == "old"
+    assert invalidated == ["instance:1"]
+    assert client.redis.published == [("invalidate", {"tags": {"instance:1": 1}})]
+
+
+async def test_tag_generations_are_read_in_one_round_trip(monkeypatch):
+    client = FakeRedisClient()
+    client.counters = {"cache:tag:instance:1": 3, "cache:tag:locale:de": 1}
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager()
+
+    key, _, _ = await manager._tagged_key("reply:abc", ["instance:1", "locale:de"])
+    again, _, _ = await manager._tagged_key("reply:abc", ["instance:1", "locale:de"])
+
+    assert key == again == "reply:g3.1:abc"
+    assert client.reads == 1
+
+
+async def test_tagged_hit_is_one_round_trip(monkeypatch):
+    client = FakeRedisClient()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager()
+
+    async def getter():
+        return "value"
+
+    tags = ["instance:1"]
+    await manager.get_or_set("reply:a", getter, tags=tags)
+    # A fresh worker knows no tag generations yet
+    manager.clear_local()
+    client.reads = 0
+
+    assert await manager.get_or_set("reply:a", getter, tags=tags) == "value"
+    assert client.reads == 1
+
+
+async def test_single_flight_miss_reads_and_leases_in_one_round_trip(monkeypatch):
+    client = FakeRedisClient()
+    client.redis.set = fake_lease()
+
+    async def release(script, numkeys, key, token):
+        return int(client.leases.pop(key, None) == token)
+
+    async def publish(channel, message):
+        pass
+
+    client.redis.eval = release
+    client.redis.publish = publish
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(singleflight, "redis_client", client)
+    manager = CacheManager()
+    await manager._tagged_key("reply:a", ["instance:1"])
+    client.reads = 0
+    calls = 0
+
+    async def getter():
+        nonlocal calls
+        calls += 1
+        return "value"
+
+    assert await manager.get_or_set("reply:a", getter, single_flight_enabled=True, tags=["instance:1"]) == "value"
+    assert client.reads == 1
+    assert calls == 1
+    # The lease was taken by the lookup and released by the leader
+    assert client.leases == {}
+
+
+def test_tag_bumps_from_other_workers_are_applied_once():
+    manager = CacheManager()
+    invalidated = []
+    manager.on_tag_invalidated(invalidated.append)
+
+    manager._apply_invalidation({"tags": {"instance:1": 2}})
+    manager._apply_invalidation({"tags": {"instance:1": 2}})
+    manager._apply_invalidation(["legacy:key"])
+
+    assert invalidated == ["instance:1"]
+    assert manager._tag_generations["instance:1"][1] == 2
+
+
+async def test_stale_value_is_served_while_one_refresh_runs(monkeypatch):
+    client = FakeRedisClient()
+    client.redis.set = fake_lease()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager()
+    calls = 0
+
+    async def getter():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert await manager.get_or_set("key", getter, ttl=60, stale_ttl=30) == 1
+    # Expire the value but stay within the stale window
+    entry = manager.entry_codec.decode(client.data["key"])
+    client.data["key"] = manager.entry_codec.encode(entry._replace(expires_at=time.time() - 1))
+
+    results = await asyncio.gather(*[
+        manager.get_or_set("key", getter, ttl=60, stale_ttl=30)
+        for _ in range(5)
+    ])
+    await asyncio.sleep(0.05)
+
+    assert results == [1] * 5
+    assert calls == 2
+    assert await manager.get_or_set("key", getter, ttl=60, stale_ttl=30) == 2
+
+
+async def test_background_refresh_uses_refresher(monkeypatch):
+    client = FakeRedisClient()
+    client.redis.set = fake_lease()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager()
+    calls = []
+
+    async def getter():
+        calls.append("getter")
+        return "request"
+
+    async def refresher():
+        calls.append("refresher")
+        return "refreshed"
+
+    assert await manager.get_or_set("key", getter, ttl=60, stale_ttl=30, refresher=refresher) == "request"
+    entry = manager.entry_codec.decode(client.data["key"])
+    client.data["key"] = manager.entry_codec.encode(entry._replace(expires_at=time.time() - 1))
+
+    assert await manager.get_or_set("key", getter, ttl=60, stale_ttl=30, refresher=refresher) == "request"
+    await asyncio.sleep(0.01)
+
+    assert calls == ["getter", "refresher"]
+    assert await manager.get_or_set("key", getter, ttl=60, stale_ttl=30, refresher=refresher) == "refreshed"
+
+
+def test_xfetch_refreshes_earlier_for_slow_values():
+    now = 1000.0
+    fast = CacheEntry("v", expires_at=now + 10, delta=0.01)
+    slow = CacheEntry("v", expires_at=now + 10, delta=5.0)
+
+    random.seed(0)
+    fast_refreshes = sum(refresh_due(fast, 1.0, now) for _ in range(1000))
+    slow_refreshes = sum(refresh_due(slow, 1.0, now) for _ in range(1000))
+
+    assert fast_refreshes == 0
+    assert slow_refreshes > 0
+    assert refresh_due(fast, 1.0, now + 10)
+
+
+
+async def test_warm_fills_the_entry_through_refresh(monkeypatch):
+    client = FakeRedisClient()
+    monkeypatch.setattr(cache, "redis_client", client)
+    manager = CacheManager()
+    calls = []
+
+    async def refresh(message):
+        calls.append("refresh")
+        return message.upper()
+
+    @manager.cache_response(prefix="reply", key_builder=lambda message: message, refresh=refresh)
+    async def reply(message):
+        calls.append("reply")
+        return message
+
+    assert await reply.warm("hi") == "HI"
+    assert await reply("hi") == "HI"
+    assert calls == ["refresh"]
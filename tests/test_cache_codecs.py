@@ -0,0 +1,64 @@
+import math
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.core import cache_codecs
+from app.core.cache_codecs import CacheEntry, Compression, EntryCodec
+from app.models.chat import ChatResponse
+
+
+def test_json_roundtrip_keeps_expiry_header():
+    codec = EntryCodec()
+    value = {"session": str(uuid4()), "turns": [1, 2, 3]}
+
+    entry = codec.decode(codec.encode(CacheEntry(value, 123.5, 0.25)))
+
+    assert entry == CacheEntry(value, 123.5, 0.25)
+
+
+def test_pydantic_models_decode_to_their_class():
+    codec = EntryCodec()
+    response = ChatResponse(session_id=uuid4(), response="Hello")
+
+    entry = codec.decode(codec.encode(CacheEntry(response, 1.0, 0.0)))
+
+    assert isinstance(entry.value, ChatResponse)
+    assert entry.value == response
+
+
+def test_msgpack_payloads_are_readable_by_json_writers():
+    pytest.importorskip("msgpack")
+    writer = EntryCodec(codec="msgpack")
+    reader = EntryCodec(codec="json")
+    value = {"at": datetime(2024, 1, 1), "items": ["a", "b"]}
+
+    blob = writer.encode(CacheEntry(value, 1.0, 0.0))
+
+    assert reader.decode(blob).value == {"at": "2024-01-01T00:00:00", "items": ["a", "b"]}
+
+
+def test_only_large_payloads_are_compressed(monkeypatch):
+    fake = Compression(7, "fake", lambda data: b"packed" + data, lambda data: data[6:])
+    monkeypatch.setitem(cache_codecs._COMPRESSIONS, "fake", fake)
+    monkeypatch.setitem(cache_codecs._COMPRESSIONS_BY_ID, 7, fake)
+    codec = EntryCodec(compression="fake", compression_min_bytes=100)
+
+    small = codec.encode(CacheEntry("hi", 1.0, 0.0))
+    large = codec.encode(CacheEntry("x" * 200, 1.0, 0.0))
+
+    assert b"packed" not in small
+    assert b"packed" in large
+    assert codec.decode(large).value == "x" * 200
+
+
+def test_legacy_and_unknown_values():
+    codec = EntryCodec()
+
+    assert codec.decode(b'{"a": 1}') == CacheEntry({"a": 1}, math.inf, 0.0)
+    assert codec.decode(b'{"v": "x", "x": 5.0, "d": 0.1}') == CacheEntry({"v": "x", "x": 5.0, "d": 0.1}, math.inf, 0.0)
+    # A codec id this worker does not know reads as a miss
+    blob = bytearray(codec.encode(CacheEntry("x", 1.0, 0.0)))
+    blob[1] = 99
+    assert codec.decode(bytes(blob)) is None
@@ -0,0 +1,65 @@
+from uuid import uuid4
+
+from app.core.admission import BATCH, current_priority
+from app.services import cache_warmer as warmer_module
+from app.services.cache_warmer import CacheWarmer
+
+
+class FakeChatService:
+    def __init__(self, cached):
+        self.cached = cached
+        self.lanes = set()
+
+    async def warm_reply(self, instance_id, message):
+        self.lanes.add(current_priority())
+        if message == "boom":
+            raise RuntimeError("LLM down")
+        return message not in self.cached
+
+
+async def test_warm_instance_reports_each_question(monkeypatch):
+    warmer = CacheWarmer(top_questions=3, concurrency=2)
+    warmer._chat_service = FakeChatService(cached={"Opening hours?"})
+
+    async def lease(instance_id):
+        return True
+
+    async def release(instance_id):
+        pass
+
+    async def questions(instance_id):
+        return ["What does it cost?", "Opening hours?", "boom"]
+
+    monkeypatch.setattr(warmer, "_acquire_lease", lease)
+    monkeypatch.setattr(warmer, "_release_lease", release)
+    monkeypatch.setattr(warmer, "_questions", questions)
+
+    results = await warmer.warm_instance(uuid4())
+
+    assert results == {"generated": 1, "cached": 1, "failed": 1}
+    assert warmer.chat_service.lanes == {BATCH}
+
+
+async def test_questions_merge_lexical_variants(monkeypatch):
+    class FakeRepository:
+        def __init__(self, db):
+            pass
+
+        async def top_user_messages(self, instance_id, since, limit):
+            return [("Pricing?", 5), ("What are your hours", 4), ("pricing", 3), ("!!!", 9)]
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def scalar(self, query):
+            return True
+
+    monkeypatch.setattr(warmer_module, "ChatMessageRepository", FakeRepository)
+    monkeypatch.setattr(warmer_module, "AsyncSessionLocal", FakeSession)
+    warmer = CacheWarmer(top_questions=5)
+
+    assert await warmer._questions(uuid4()) == ["Pricing?", "What are your hours"]
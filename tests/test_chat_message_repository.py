@@ -0,0 +1,42 @@
+import pytest
+from uuid import uuid4
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import Message
+from app.services.chat_message_repository import ChatMessageRepository
+
+@pytest.mark.asyncio
+async def test_append_allocates_increasing_seqs(db_session: AsyncSession, test_instance):
+    repository = ChatMessageRepository(db_session)
+    session_id = uuid4()
+
+    first = await repository.append(
+        session_id,
+        test_instance.id,
+        [Message(role="user", content="hi"), Message(role="assistant", content="hello")]
+    )
+    second = await repository.append(
+        session_id,
+        test_instance.id,
+        [Message(role="user", content="prices?")]
+    )
+
+    assert first < second
+    messages = await repository.last_messages(session_id, limit=10)
+    assert [message.content for message in messages] == ["hi", "hello", "prices?"]
+
+@pytest.mark.asyncio
+async def test_last_messages_pages_backwards(db_session: AsyncSession, test_instance):
+    repository = ChatMessageRepository(db_session)
+    session_id = uuid4()
+    await repository.append(
+        session_id,
+        test_instance.id,
+        [Message(role="user", content=str(i)) for i in range(10)]
+    )
+
+    newest = await repository.last_messages(session_id, limit=3)
+    older = await repository.last_messages(session_id, limit=3, before_seq=newest[0].seq)
+
+    assert [message.content for message in newest] == ["7", "8", "9"]
+    assert [message.content for message in older] == ["4", "5", "6"]
@@ -0,0 +1,150 @@
+from datetime import date, datetime
+from uuid import uuid4
+
+from app.services.chat_retention_service import (
+    ChatRetentionService,
+    partition_name,
+    partition_start
+)
+
+
+class FakeResult:
+    rowcount = 0
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeDB:
+    def __init__(self, rows=()):
+        self.statements = []
+        self.rows = rows
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement))
+        return FakeResult(self.rows)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+async def no_default_partition():
+    return False
+
+
+async def default_partition():
+    return True
+
+
+def test_partitions_follow_iso_weeks():
+    start = partition_start(datetime(2024, 3, 21, 18, 30))
+
+    assert start == date(2024, 3, 18)
+    assert partition_name(start) == "chat_messages_w20240318"
+
+
+async def test_ensure_partitions_creates_missing_weeks_ahead():
+    db = FakeDB()
+    service = ChatRetentionService(db, partitions_ahead=2)
+
+    async def partitions():
+        return {"chat_messages_w20240318": date(2024, 3, 18)}
+
+    service._partitions = partitions
+    service._has_default_partition = no_default_partition
+
+    created = await service.ensure_partitions(now=datetime(2024, 3, 21))
+
+    assert created == ["chat_messages_w20240325", "chat_messages_w20240401"]
+    assert "FROM ('2024-03-25') TO ('2024-04-01')" in db.statements[0]
+
+
+async def test_drops_only_weeks_past_the_longest_retention():
+    db = FakeDB()
+    service = ChatRetentionService(db, max_retention_days=365)
+
+    async def retention():
+        return {uuid4(): 7, uuid4(): 30}
+
+    async def partitions():
+        return {
+            "chat_messages_w20240205": date(2024, 2, 5),
+            "chat_messages_w20240212": date(2024, 2, 12),
+            "chat_messages_w20240219": date(2024, 2, 19),
+        }
+
+    service._instance_retention = retention
+    service._partitions = partitions
+    service._has_default_partition = default_partition
+
+    # 30 days before 2024-03-20 is 2024-02-19
+    dropped = await service.drop_expired_partitions(now=datetime(2024, 3, 20))
+
+    assert dropped == ["chat_messages_w20240205", "chat_messages_w20240212"]
+    # Detached before the drop, so the parent is never locked by DROP TABLE
+    detach = db.statements.index("ALTER TABLE chat_messages DETACH PARTITION chat_messages_w20240205")
+    assert db.statements[detach + 1] == "DROP TABLE IF EXISTS chat_messages_w20240205"
+
+
+async def test_rows_in_the_default_partition_get_their_week_created():
+    db = FakeDB()
+    service = ChatRetentionService(db, partitions_ahead=0)
+
+    async def partitions():
+        return {"chat_messages_w20240318": date(2024, 3, 18)}
+
+    async def default_weeks():
+        return [date(2024, 3, 11)]
+
+    service._partitions = partitions
+    service._has_default_partition = default_partition
+    service._default_partition_weeks = default_weeks
+
+    created = await service.ensure_partitions(now=datetime(2024, 3, 21))
+
+    assert created == ["chat_messages_w20240311"]
+    assert "DELETE FROM chat_messages_default" in db.statements[1]
+    assert db.statements[2].startswith("ALTER TABLE chat_messages ATTACH PARTITION chat_messages_w20240311")
+
+
+async def test_malformed_retention_settings_fall_back_to_the_default():
+    valid, malformed, missing = uuid4(), uuid4(), uuid4()
+    db = FakeDB(rows=[
+        (valid, {"compliance": {"data_retention_days": "30"}}),
+        (malformed, {"compliance": {"data_retention_days": "forever"}}),
+        (missing, {"compliance": None}),
+    ])
+
+    retention = await ChatRetentionService(db)._instance_retention()
+
+    assert retention == {valid: 30, malformed: 90, missing: 90}
+
+
+async def test_hourly_purge_leaves_messages_to_partition_drops():
+    db = FakeDB()
+    service = ChatRetentionService(db)
+    longest, shorter = uuid4(), uuid4()
+
+    async def retention():
+        return {longest: 90, shorter: 7}
+
+    service._instance_retention = retention
+
+    await service.purge_expired(now=datetime(2024, 3, 20))
+
+    message_deletes = [s for s in db.statements if s.startswith("DELETE FROM chat_messages")]
+    session_deletes = [s for s in db.statements if s.startswith("DELETE FROM chat_sessions")]
+    # Only the shorter retention purges message rows
+    assert len(message_deletes) == 1
+    # Sessions with messages left are kept, so no delete cascades to them
+    assert len(session_deletes) == 2
+    assert all("NOT (EXISTS (SELECT *" in s and "FROM chat_messages" in s for s in session_deletes)
@@ -1 +1,41 @@
- 
\ No newline at end of file
+import asyncio
+from uuid import uuid4
+
+from app.core.admission import BATCH, current_priority
+from app.core.exceptions import ServiceOverloadedException
+from app.models.chat import ChatRequest, ChatResponse
+from app.services.chat_service import ChatService
+
+
+async def test_process_batch_bounds_parallelism_and_reports_failures():
+    service = ChatService()
+    running = 0
+    peak = 0
+    lanes = set()
+
+    async def fake_process_message(instance_id, message, session_id=None, context=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        lanes.add(current_priority())
+        await asyncio.sleep(0.01)
+        running -= 1
+        if message == "busy":
+            raise ServiceOverloadedException("overloaded")
+        return ChatResponse(session_id=uuid4(), response=message.upper())
+
+    service.process_message = fake_process_message
+    instance_id = uuid4()
+    requests = [
+        ChatRequest(instance_id=instance_id, message=message)
+        for message in ["a", "b", "busy", "c", "d", "e"]
+    ]
+
+    results = [result async for result in service.process_batch(requests, parallelism=2)]
+
+    assert peak == 2
+    assert lanes == {BATCH}
+    assert sorted(result.index for result in results) == list(range(6))
+    by_index = {result.index: result for result in results}
+    assert by_index[0].response == "A"
+    assert by_index[2].status == "shed"
@@ -0,0 +1,53 @@
+from uuid import uuid4
+
+from app.services import context_store
+from app.services.context_store import (
+    SessionContext,
+    SessionContextStore,
+    pack_context,
+    unpack_context
+)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get_bytes(self, key):
+        return self.data.get(key)
+
+    async def set_bytes_with_ttl(self, key, value, ttl_seconds):
+        self.data[key] = value
+
+
+def test_pack_roundtrip():
+    context = SessionContext([1, 2, 70000, 2**32 - 1], "llama2:abc", "0123456789abcdef")
+    restored = unpack_context(pack_context(context))
+
+    assert restored.tokens == context.tokens
+    assert restored.fingerprint == "llama2:abc"
+    assert restored.marker == "0123456789abcdef"
+
+
+async def test_context_reused_only_when_conversation_matches(monkeypatch):
+    monkeypatch.setattr(context_store, "redis_client", FakeRedis())
+    store = SessionContextStore(ttl=60, max_tokens=100)
+    session_id = uuid4()
+
+    await store.save(session_id, "model:v1", [5, 6, 7], "Hello there!")
+
+    assert await store.get(session_id, "model:v1", "Hello there!") == [5, 6, 7]
+    # System prompt changed
+    assert await store.get(session_id, "model:v2", "Hello there!") is None
+    # Last reply was not produced from this context
+    assert await store.get(session_id, "model:v1", "Something else") is None
+
+
+async def test_context_dropped_when_window_is_full(monkeypatch):
+    monkeypatch.setattr(context_store, "redis_client", FakeRedis())
+    store = SessionContextStore(ttl=60, max_tokens=3)
+    session_id = uuid4()
+
+    await store.save(session_id, "model:v1", [1, 2, 3], "reply")
+
+    assert await store.get(session_id, "model:v1", "reply") is None
@@ -0,0 +1,52 @@
+import httpx
+
+from app.services.backend_pool import BackendPool
+from app.services.llm_service import LLMService
+
+
+def make_service(fake_ollama):
+    service = LLMService()
+    service.backends = BackendPool([fake_ollama.url])
+    return service
+
+
+async def test_generate_is_deterministic_and_returns_context(fake_ollama):
+    service = make_service(fake_ollama)
+
+    first = await service._generate("User: hello\nAssistant:")
+    second = await service._generate("User: hello\nAssistant:")
+
+    assert first["response"] == second["response"]
+    assert first["eval_count"] == fake_ollama.fake.config.response_tokens
+    followup = await service._generate("User: more\nAssistant:", first["context"])
+    assert followup["context"][:len(first["context"])] == first["context"]
+
+
+async def test_stream_matches_non_streaming_response(fake_ollama):
+    fake_ollama.fake.config.tokens_per_second = 500
+    service = make_service(fake_ollama)
+
+    tokens = [token async for token in service.stream_response("What are your hours?", [])]
+    complete = await service.generate_response("What are your hours?", [])
+
+    assert len(tokens) == fake_ollama.fake.config.response_tokens
+    assert "".join(tokens).strip() == complete
+
+
+async def test_embeddings_and_failures(fake_ollama):
+    service = make_service(fake_ollama)
+    vector = await service.embed("opening hours")
+    assert len(vector) == fake_ollama.fake.config.embedding_dim
+
+    fake_ollama.fake.config.error_rate = 1.0
+    async with httpx.AsyncClient(base_url=fake_ollama.url) as client:
+        response = await client.post(
+            "/api/generate",
+            json={"model": "llama2", "prompt": "hi", "stream": False}
+        )
+        missing = await client.post(
+            "/api/embeddings",
+            json={"model": "unknown", "prompt": "hi"}
+        )
+    assert response.status_code == 500
+    assert missing.status_code == 404
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from uuid import uuid4
+
+from app.core.exceptions import GenerationCancelledException
+from app.core.metrics import CHAT_CANCELLATIONS
+from app.services.generation_tracker import GenerationTracker
+
+
+async def test_newer_message_supersedes_running_reply():
+    tracker = GenerationTracker()
+    session_id = uuid4()
+
+    async def reply(text, delay):
+        await asyncio.sleep(delay)
+        return text
+
+    first = asyncio.create_task(tracker.run(session_id, reply("first", 1)))
+    await asyncio.sleep(0)
+    second = await tracker.run(session_id, reply("second", 0))
+
+    assert second == "second"
+    with pytest.raises(GenerationCancelledException):
+        await first
+
+
+async def test_cancelling_caller_cancels_the_reply():
+    tracker = GenerationTracker()
+    work_cancelled = asyncio.Event()
+
+    async def reply():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            work_cancelled.set()
+            raise
+
+    caller = asyncio.create_task(tracker.run(uuid4(), reply()))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    assert work_cancelled.is_set()
+
+
+async def test_superseded_stream_stops_producing():
+    tracker = GenerationTracker()
+    session_id = uuid4()
+    closed = asyncio.Event()
+
+    async def tokens():
+        try:
+            for i in range(100):
+                yield i
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    received = []
+
+    async def consume():
+        async for token in tracker.stream(session_id, tokens()):
+            received.append(token)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0.03)
+    assert tracker.cancel(session_id)
+
+    with pytest.raises(GenerationCancelledException):
+        await consumer
+    assert closed.is_set()
+    assert 0 < len(received) < 100
+
+
+async def test_superseded_caller_is_counted_as_superseded():
+    tracker = GenerationTracker()
+    superseded = CHAT_CANCELLATIONS.labels(reason="superseded")
+    disconnected = CHAT_CANCELLATIONS.labels(reason="disconnected")
+    before = (superseded._value.get(), disconnected._value.get())
+
+    async def tokens():
+        while True:
+            yield 1
+            await asyncio.sleep(0.01)
+
+    async def consume():
+        async for _ in tracker.stream(None, tokens()):
+            pass
+
+    caller = asyncio.create_task(consume())
+    await asyncio.sleep(0.02)
+    tracker.supersede(caller)
+
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    assert superseded._value.get() == before[0] + 1
+    assert disconnected._value.get() == before[1]
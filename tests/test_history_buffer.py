@@ -0,0 +1,101 @@
+from datetime import datetime
+from uuid import uuid4
+
+from app.models.chat import Message
+from app.services import history_buffer
+from app.services.history_buffer import (
+    SessionHistoryBuffer,
+    decode_message,
+    encode_message
+)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def lpush(self, key, *values):
+        items = self.lists.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def lpushx(self, key, *values):
+        if key not in self.lists:
+            return 0
+        return self.lpush(key, *values)
+
+    def ltrim(self, key, start, end):
+        if key in self.lists:
+            self.lists[key] = self.lists[key][start:end + 1]
+        return True
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:end + 1]
+
+    def expire(self, key, ttl):
+        return key in self.lists
+
+    def delete(self, key):
+        return int(self.lists.pop(key, None) is not None)
+
+
+class FakeClient:
+    def __init__(self):
+        self.redis = FakeRedis()
+
+
+def test_encoding_roundtrip():
+    message = Message(role="assistant", content="Hé \"there\"", timestamp=datetime(2024, 5, 1, 8, 30, 0, 123000))
+
+    entry = encode_message(message)
+    restored = decode_message(entry)
+
+    assert entry.startswith('["a",')
+    assert restored == message
+    assert decode_message("not json") is None
+
+
+async def test_buffer_is_capped_and_read_in_one_round_trip(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(history_buffer, "redis_client", client)
+    buffer = SessionHistoryBuffer(capacity=4, ttl=60)
+    session_id = uuid4()
+    messages = [Message(role="user", content=str(i)) for i in range(6)]
+
+    # Appending needs an existing buffer
+    assert await buffer.append(session_id, messages[:2]) is False
+    await buffer.fill(session_id, messages[:2])
+    assert await buffer.append(session_id, messages[2:]) is True
+
+    client.redis.round_trips = 0
+    recent = await buffer.recent(session_id)
+
+    assert [m.content for m in recent] == ["2", "3", "4", "5"]
+    assert client.redis.round_trips == 1
+    assert [m.content for m in await buffer.recent(session_id, limit=2)] == ["4", "5"]
@@ -0,0 +1,37 @@
+import random
+
+from app.core.hot_keys import CountMinSketch, HotKeyTracker
+
+
+def test_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {}
+    rng = random.Random(1)
+    for _ in range(2000):
+        key = f"key:{rng.randrange(200)}"
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(key)
+
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+
+
+def test_tracker_ranks_the_hottest_keys_first():
+    tracker = HotKeyTracker(k=5)
+    rng = random.Random(7)
+    for _ in range(5000):
+        # Key i is requested roughly 1/(i+1) as often as key 0
+        key = f"chat_reply:{int(rng.paretovariate(1.0)) - 1}"
+        tracker.add(key)
+
+    top = [key for key, _ in tracker.top(3)]
+
+    assert top == ["chat_reply:0", "chat_reply:1", "chat_reply:2"]
+
+
+def test_counts_decay_over_time():
+    tracker = HotKeyTracker(k=2, decay_every=10)
+    for _ in range(9):
+        tracker.add("old")
+    tracker.add("old")
+
+    assert tracker.top(1) == [("old", 5)]
@@ -0,0 +1,58 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app.core.config import get_settings
+from app.core.http_client import OllamaHTTPClient
+
+settings = get_settings()
+
+
+async def test_client_is_shared_until_closed():
+    http_client = OllamaHTTPClient()
+
+    client = http_client.client
+    assert http_client.client is client
+    assert client.timeout.write == settings.OLLAMA_WRITE_TIMEOUT
+
+    await http_client.aclose()
+    assert http_client.client is not client
+    await http_client.aclose()
+
+
+async def test_pool_stats_track_connections(fake_ollama):
+    http_client = OllamaHTTPClient()
+    assert http_client.pool_stats() == {"active": 0, "idle": 0, "pending": 0}
+
+    fake_ollama.fake.config.tokens_per_second = 20
+    async with http_client.client.stream(
+        "POST",
+        f"{fake_ollama.url}/api/generate",
+        json={"model": "llama2", "prompt": "hello", "stream": True}
+    ) as response:
+        busy = http_client.pool_stats()
+        await response.aread()
+    await asyncio.sleep(0)
+
+    assert busy["active"] == 1
+    assert http_client.pool_stats() == {"active": 0, "idle": 1, "pending": 0}
+    # The gauges read the most recently created client
+    assert REGISTRY.get_sample_value("ollama_http_pool_connections", {"state": "idle"}) == 1
+    await http_client.aclose()
+
+
+async def test_pool_stats_survive_changed_internals():
+    http_client = OllamaHTTPClient()
+    http_client.client
+
+    class ChangedPool:
+        @property
+        def connections(self):
+            raise RuntimeError("no longer supported")
+
+    transport = http_client._transport
+    pool, transport._pool = transport._pool, ChangedPool()
+
+    assert http_client.pool_stats() == {"active": 0, "idle": 0, "pending": 0}
+    transport._pool = pool
+    await http_client.aclose()
@@ -0,0 +1,142 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.core.exceptions import InstanceNotFoundException
+from app.services import message_writer as writer_module
+from app.services.message_writer import MessageWriter, stream_seq
+
+
+class FakeRepository:
+    rows = []
+
+    def __init__(self, db):
+        pass
+
+    async def insert_messages(self, rows):
+        FakeRepository.rows.extend(rows)
+        return {}
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def test_stream_seq_follows_entry_order():
+    seqs = [
+        stream_seq("1700000000000-0", 0),
+        stream_seq("1700000000000-0", 1),
+        stream_seq("1700000000000-1", 0),
+        stream_seq("1700000000001-0", 0),
+    ]
+
+    assert seqs == sorted(seqs)
+    assert len(set(seqs)) == len(seqs)
+    # Redelivery of the same entry yields the same keys
+    assert stream_seq("1700000000000-1", 0) == seqs[2]
+
+
+async def test_write_builds_rows_with_stream_seqs(monkeypatch):
+    FakeRepository.rows = []
+    monkeypatch.setattr(writer_module, "ChatMessageRepository", FakeRepository)
+    monkeypatch.setattr(writer_module, "AsyncSessionLocal", FakeSession)
+    session_id = uuid4()
+    instance_id = uuid4()
+    sent_at = datetime(2024, 1, 1, 12, 0, 0)
+    fields = {
+        "session_id": str(session_id),
+        "instance_id": str(instance_id),
+        "messages": writer_module.json.dumps([
+            {"role": "user", "content": "hi", "timestamp": sent_at.isoformat()},
+            {"role": "assistant", "content": "hello", "timestamp": sent_at.isoformat()},
+        ])
+    }
+
+    await MessageWriter()._write([("1700000000000-3", fields)])
+
+    rows = FakeRepository.rows
+    assert [row["role"] for row in rows] == ["user", "assistant"]
+    assert [row["seq"] for row in rows] == [
+        stream_seq("1700000000000-3", 0),
+        stream_seq("1700000000000-3", 1),
+    ]
+    assert rows[0]["session_id"] == session_id
+    assert rows[0]["created_at"] == sent_at
+
+
+def test_stream_seqs_sort_after_synchronous_seqs_of_earlier_turns():
+    from app.services.chat_message_repository import message_seq
+
+    synchronous = message_seq(1700000000000, 0xFFFF, 1)
+    write_behind = stream_seq("1700000000001-0", 0)
+
+    assert synchronous < write_behind
+
+
+class FakeStreamPipeline:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args))
+        return queue
+
+    async def execute(self):
+        pass
+
+
+class FakeStreamRedis:
+    def __init__(self):
+        self.calls = []
+
+    def pipeline(self, transaction=True):
+        return FakeStreamPipeline(self.calls)
+
+
+async def test_poison_entries_are_dead_lettered_without_blocking_the_batch(monkeypatch):
+    FakeRepository.rows = []
+    monkeypatch.setattr(writer_module, "ChatMessageRepository", FakeRepository)
+    monkeypatch.setattr(writer_module, "AsyncSessionLocal", FakeSession)
+    fake_redis = FakeStreamRedis()
+    monkeypatch.setattr(writer_module.redis_client, "redis", fake_redis)
+    messages = writer_module.json.dumps([
+        {"role": "user", "content": "hi", "timestamp": datetime(2024, 1, 1).isoformat()}
+    ])
+    good = ("1700000000000-0", {"session_id": str(uuid4()), "instance_id": str(uuid4()), "messages": messages})
+    poison = ("1700000000000-1", {"session_id": str(uuid4()), "instance_id": "unknown", "messages": messages})
+    writer = MessageWriter(dead_letter_stream="dead")
+
+    await writer._flush([good, poison])
+
+    assert [row["seq"] for row in FakeRepository.rows] == [stream_seq(good[0], 0)]
+    dead = [args for name, args in fake_redis.calls if name == "xadd"]
+    assert dead[0][0] == "dead" and dead[0][1]["entry_id"] == poison[0]
+    acked = [args[2:] for name, args in fake_redis.calls if name == "xack"]
+    assert acked == [(poison[0],), (good[0],)]
+
+
+async def test_enqueue_rejects_unknown_instances(monkeypatch):
+    writer = MessageWriter()
+
+    async def instance_exists(instance_id):
+        return False
+
+    monkeypatch.setattr(writer, "_instance_exists", instance_exists)
+
+    with pytest.raises(InstanceNotFoundException):
+        await writer.enqueue(uuid4(), uuid4(), [])
@@ -0,0 +1,44 @@
+from app.services.model_router import GREETING, ModelRouter
+
+
+def make_router():
+    return ModelRouter(
+        default_model="llama2",
+        routes={
+            "greeting": ["tiny"],
+            "concise": ["small", "tiny"],
+            "detailed": ["large"]
+        }
+    )
+
+
+def test_routes_greetings_and_response_length():
+    router = make_router()
+    concise = {"behavior": {"response_length": "concise"}}
+
+    assert router.route("Hello there!") == GREETING
+    assert router.route("Hello, how do I reset my password on this site?") == "balanced"
+    assert router.route("What are your prices?", concise) == "concise"
+
+
+def test_candidates_end_with_default_model():
+    router = make_router()
+
+    assert router.candidates("hi") == ["tiny", "llama2"]
+    assert router.candidates("Which plans exist?") == ["llama2"]
+    assert router.candidates(
+        "Which plans exist?",
+        {"behavior": {"response_length": "concise"}}
+    ) == ["small", "tiny", "llama2"]
+
+
+def test_instance_routes_override_global_table():
+    router = make_router()
+    instance_settings = {
+        "behavior": {
+            "response_length": "detailed",
+            "model_routes": {"detailed": ["custom", "llama2"]}
+        }
+    }
+
+    assert router.candidates("Explain your refund policy", instance_settings) == ["custom", "llama2"]
@@ -0,0 +1,48 @@
+from app.models.chat import Message
+from app.models.instance_settings import get_default_settings
+from app.services.prompt_builder import PromptBuilder
+
+
+def test_system_prompt_reflects_behavior_settings():
+    builder = PromptBuilder()
+    settings = get_default_settings()
+    settings["behavior"]["tone"] = "professional"
+    settings["behavior"]["response_length"] = "concise"
+    settings["behavior"]["language"] = "de"
+
+    prompt = builder.system_prompt(settings).text
+
+    assert "professional" in prompt
+    assert "one to three sentences" in prompt
+    assert "'de'" in prompt
+
+
+def test_system_prompt_is_compiled_once_per_settings_version():
+    builder = PromptBuilder()
+    settings = get_default_settings()
+
+    first = builder.system_prompt(settings)
+    assert builder.system_prompt(settings) is first
+
+    settings["behavior"]["tone"] = "casual"
+    assert builder.system_prompt(settings) is not first
+
+
+def test_history_is_filled_newest_first_within_budget():
+    builder = PromptBuilder(
+        max_context_tokens=200,
+        reserved_response_tokens=0,
+        count_tokens=lambda text: len(text.split())
+    )
+    system_prompt = builder.system_prompt({})
+    history = [
+        Message(role="user", content=f"message {i} " + "word " * 10)
+        for i in range(20)
+    ]
+
+    prompt = builder.build("latest question", history, system_prompt)
+
+    assert "message 19" in prompt
+    assert "message 0 " not in prompt
+    assert prompt.index("message 18") < prompt.index("message 19")
+    assert prompt.endswith("User: latest question\nAssistant:")
@@ -0,0 +1,214 @@
+import os
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core import middleware, rate_limit
+from app.core.config import get_settings
+from app.core.middleware import RateLimitMiddleware
+from app.core.rate_limit import (
+    _RATE_LIMIT_SCRIPT,
+    KeyLookupLimitExceeded,
+    RateLimit,
+    RateLimitResult,
+    RateLimiter,
+    TOKEN_BUCKET,
+    default_limits,
+    rate_limit_policy
+)
+from app.models.instance_settings import RateLimitSettings
+
+settings = get_settings()
+
+
+def test_instances_override_default_limits():
+    limits = default_limits(RateLimitSettings(requests_per_minute=5, algorithm=TOKEN_BUCKET))
+
+    assert limits == [
+        RateLimit(5, 60, TOKEN_BUCKET),
+        RateLimit(settings.RATE_LIMIT_PER_HOUR, 3600, TOKEN_BUCKET)
+    ]
+
+
+async def test_all_windows_are_checked_in_one_call():
+    limiter = RateLimiter()
+    calls = []
+
+    async def script(keys, args):
+        calls.append((keys, args))
+        # admitted, then remaining/reset/retry (ms) per window
+        return [1, 7, 30000, 0, 2, 1800000, 0]
+
+    limiter._script = script
+    limits = [RateLimit(10, 60), RateLimit(100, 3600)]
+
+    result = await limiter.hit("instance:1", limits)
+
+    assert calls == [(
+        ["rate_limit:instance:1:sliding_window:60", "rate_limit:instance:1:sliding_window:3600"],
+        ["sliding_window", 10, 60000, "sliding_window", 100, 3600000]
+    )]
+    assert result.allowed
+    assert result.limit == limits[1]
+    assert result.remaining == 2
+
+
+async def test_rejected_requests_get_429_with_retry_after(monkeypatch):
+    limiter = RateLimiter()
+    replies = iter([[1, 4, 20000, 0], [0, 0, 20000, 1500]])
+
+    async def script(keys, args):
+        return next(replies)
+
+    async def policy(api_key, client_ip):
+        return "instance:1", [RateLimit(5, 60)]
+
+    limiter._script = script
+    monkeypatch.setattr(middleware, "rate_limiter", limiter)
+    monkeypatch.setattr(middleware, "rate_limit_policy", policy)
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    client = TestClient(app)
+    admitted = client.get("/ping", headers={"X-API-Key": "key"})
+    rejected = client.get("/ping", headers={"X-API-Key": "key"})
+
+    assert admitted.status_code == 200
+    assert admitted.headers["X-RateLimit-Limit"] == "5"
+    assert admitted.headers["X-RateLimit-Remaining"] == "4"
+    assert admitted.headers["X-RateLimit-Reset"] == "20"
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "2"
+    assert rejected.headers["X-RateLimit-Remaining"] == "0"
+
+
+class FakeCacheManager:
+    def __init__(self):
+        self.values = {}
+        self.tags = {}
+
+    async def get_or_set(self, key, getter, ttl=None, tags=()):
+        if key not in self.values:
+            self.values[key] = await getter()
+            self.tags[key] = list(tags)
+        return self.values[key]
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def fake_policy_store(monkeypatch, instances, lookups_allowed=True):
+    lookups = []
+
+    class FakeInstanceService:
+        def __init__(self, db):
+            pass
+
+        async def get_instance_by_api_key(self, api_key):
+            lookups.append(api_key)
+            return instances.get(api_key)
+
+        async def get_instance(self, instance_id):
+            return next(i for i in instances.values() if i.id == instance_id)
+
+    class FakeLimiter:
+        async def hit(self, identity, limits):
+            return RateLimitResult(lookups_allowed, limits[0], 0, 60, 0 if lookups_allowed else 30)
+
+    cache = FakeCacheManager()
+    monkeypatch.setattr(rate_limit, "cache_manager", cache)
+    monkeypatch.setattr(rate_limit, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(rate_limit, "InstanceService", FakeInstanceService)
+    monkeypatch.setattr(rate_limit, "rate_limiter", FakeLimiter())
+    return cache, lookups
+
+
+async def test_unknown_keys_are_looked_up_once(monkeypatch):
+    _, lookups = fake_policy_store(monkeypatch, {})
+
+    first = await rate_limit_policy("unknown", "10.0.0.1")
+    second = await rate_limit_policy("unknown", "10.0.0.1")
+
+    assert first == second
+    assert first[0].startswith("key:")
+    assert first[1] == default_limits()
+    assert lookups == ["unknown"]
+
+
+async def test_clients_resolving_too_many_keys_are_limited(monkeypatch):
+    _, lookups = fake_policy_store(monkeypatch, {}, lookups_allowed=False)
+
+    with pytest.raises(KeyLookupLimitExceeded) as error:
+        await rate_limit_policy("random", "10.0.0.1")
+
+    assert error.value.result.retry_after == 30
+    assert lookups == []
+
+
+async def test_instance_policy_is_tagged_with_the_instance(monkeypatch):
+    class Instance:
+        id = uuid.uuid4()
+        settings = {"rate_limits": {"requests_per_minute": 5}}
+
+    cache, _ = fake_policy_store(monkeypatch, {"key": Instance})
+
+    identity, limits = await rate_limit_policy("key", "10.0.0.1")
+
+    assert identity == f"instance:{Instance.id}"
+    assert limits[0] == RateLimit(5, 60, settings.RATE_LIMIT_ALGORITHM)
+    assert cache.tags[f"rate_limit_policy:{Instance.id}"] == [f"instance:{Instance.id}"]
+
+
+@pytest.fixture
+async def redis_limiter():
+    # Runs the Lua script on a real Redis; set REDIS_TEST_URL to choose one
+    redis = aioredis.from_url(os.environ.get("REDIS_TEST_URL", "redis://localhost:6379/15"))
+    try:
+        await redis.ping()
+    except (RedisError, OSError):
+        await redis.aclose()
+        pytest.skip("Redis is not available")
+
+    limiter = RateLimiter(prefix=f"test_rate_limit:{uuid.uuid4()}")
+    limiter._script = redis.register_script(_RATE_LIMIT_SCRIPT)
+    yield limiter
+    async for key in redis.scan_iter(f"{limiter.prefix}:*"):
+        await redis.delete(key)
+    await redis.aclose()
+
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", TOKEN_BUCKET])
+async def test_script_admits_up_to_the_limit(redis_limiter, algorithm):
+    limits = [RateLimit(3, 60, algorithm)]
+
+    results = [await redis_limiter.hit("client", limits) for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    assert 0 < results[3].retry_after <= 60
+
+
+async def test_script_counts_rejected_requests_in_no_window(redis_limiter):
+    limits = [RateLimit(100, 3600), RateLimit(1, 60)]
+
+    assert (await redis_limiter.hit("client", limits)).allowed
+    rejected = await redis_limiter.hit("client", limits)
+
+    assert not rejected.allowed
+    assert rejected.limit == limits[1]
+    # The rejected request did not use up the hourly quota
+    assert (await redis_limiter.hit("client", [limits[0]])).remaining == 98
@@ -0,0 +1,70 @@
+from app.core.redis import RedisClient
+
+
+class FakePipeline:
+    def __init__(self, connection):
+        self.connection = connection
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.calls.append((key, ttl, value))
+
+    async def execute(self):
+        self.connection.round_trips += 1
+        self.connection.stored.extend(self.calls)
+        return [True] * len(self.calls)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.round_trips = 0
+        self.stored = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+async def test_increment_and_check_is_one_script_call():
+    client = RedisClient()
+    calls = []
+    counts = iter([1, 2, 3])
+
+    async def increment(keys, args):
+        calls.append((keys, args))
+        return next(counts)
+
+    client._increment = increment
+
+    results = [await client.increment_and_check("rl", 60, max_requests=2) for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert calls == [(["rl"], [60000])] * 3
+
+
+async def test_get_bytes_or_lease_reports_the_lease():
+    client = RedisClient()
+
+    async def get_or_lease(keys, args):
+        assert keys == ["value", "lease"] and args == ["token", 5000]
+        return [None, 1]
+
+    client._get_or_lease = get_or_lease
+
+    assert await client.get_bytes_or_lease("value", "lease", "token", 5000) == (None, True)
+
+
+async def test_mset_bytes_with_ttl_pipelines_all_keys():
+    client = RedisClient()
+    client.raw = FakeConnection()
+
+    await client.mset_bytes_with_ttl({"a": b"1", "b": b"2"}, 30)
+
+    assert client.raw.round_trips == 1
+    assert client.raw.stored == [("a", 30, b"1"), ("b", 30, b"2")]
+    assert await client.mget_bytes([]) == []
@@ -0,0 +1,80 @@
+import numpy as np
+from uuid import uuid4
+
+from app.services.semantic_cache import SemanticCache, SemanticIndex, normalize_message
+
+
+class FakeEmbeddingService:
+    """Returns fixed vectors for known questions"""
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def embed(self, text):
+        return self.vectors[text]
+
+
+def test_normalize_message():
+    assert normalize_message("What are your opening hours?") == "what are your opening hours"
+    assert normalize_message("  what are   YOUR opening hours ") == "what are your opening hours"
+
+
+def test_index_returns_nearest_answer_above_threshold():
+    index = SemanticIndex(max_entries=10, ttl=60)
+    index.add("a", np.array([1.0, 0.0]), "answer a")
+    index.add("b", np.array([0.0, 1.0]), "answer b")
+
+    assert index.search(np.array([0.9, 0.1]), threshold=0.9)[0] == "answer a"
+    assert index.search(np.array([1.0, 1.0]), threshold=0.9) is None
+
+
+def test_index_evicts_least_recently_used():
+    index = SemanticIndex(max_entries=2, ttl=60)
+    index.add("a", np.array([1.0, 0.0]), "answer a")
+    index.add("b", np.array([0.0, 1.0]), "answer b")
+    index.get_exact("a")
+    index.add("c", np.array([1.0, 1.0]), "answer c")
+
+    assert len(index) == 2
+    assert index.get_exact("a") == "answer a"
+    assert index.get_exact("b") is None
+
+
+def test_index_ignores_expired_entries():
+    index = SemanticIndex(max_entries=2, ttl=-1)
+    index.add("a", np.array([1.0, 0.0]), "answer a")
+
+    assert index.get_exact("a") is None
+    assert index.search(np.array([1.0, 0.0]), threshold=0.5) is None
+
+
+async def test_cache_tiers_are_isolated_per_instance():
+    embeddings = FakeEmbeddingService({
+        "What are your opening hours?": [1.0, 0.0, 0.0],
+        "When are you open?": [0.95, 0.05, 0.0],
+        "Do you ship abroad?": [0.0, 0.0, 1.0],
+    })
+    cache = SemanticCache(llm_service=embeddings, threshold=0.9)
+    instance_id = uuid4()
+
+    response, vector = await cache.lookup(instance_id, "What are your opening hours?")
+    assert response is None
+    await cache.store(instance_id, "What are your opening hours?", "9 to 5", vector)
+
+    assert (await cache.lookup(instance_id, "what are your opening hours"))[0] == "9 to 5"
+    assert (await cache.lookup(instance_id, "When are you open?"))[0] == "9 to 5"
+    assert (await cache.lookup(instance_id, "Do you ship abroad?"))[0] is None
+    assert (await cache.lookup(uuid4(), "When are you open?"))[0] is None
+
+
+async def test_clearing_local_cache_state_drops_semantic_indexes():
+    from app.core.cache import CacheManager
+
+    cache = SemanticCache(llm_service=FakeEmbeddingService({}))
+    manager = CacheManager()
+    manager.on_clear_local(cache.clear)
+    instance_id = uuid4()
+    await cache.store(instance_id, "Opening hours?", "9 to 5")
+
+    manager.clear_local()
+
+    assert (await cache.lookup(instance_id, "opening hours"))[0] is None
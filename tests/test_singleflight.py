@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.admission import BATCH, priority
+from app.core.singleflight import SingleFlight
+
+
+class UnavailableRedis:
+    """Redis stand-in that fails every call, forcing process-local mode"""
+    async def set(self, *args, **kwargs):
+        raise RedisConnectionError("redis unavailable")
+
+
+@pytest.fixture
+def local_single_flight(monkeypatch):
+    from app.core import singleflight
+    monkeypatch.setattr(singleflight.redis_client, "redis", UnavailableRedis())
+    return SingleFlight(lease_ttl=1.0, wait_timeout=1.0)
+
+
+async def test_concurrent_calls_share_one_computation(local_single_flight):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def load():
+        return None
+
+    results = await asyncio.gather(*[
+        local_single_flight.do("key", compute, load) for _ in range(10)
+    ])
+
+    assert results == ["answer"] * 10
+    assert calls == 1
+
+
+async def test_errors_propagate_to_followers(local_single_flight):
+    async def compute():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def load():
+        return None
+
+    results = await asyncio.gather(
+        *[local_single_flight.do("key", compute, load) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_follower_takes_over_when_leader_is_cancelled(local_single_flight):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    async def load():
+        return None
+
+    leader = asyncio.create_task(local_single_flight.do("key", compute, load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(local_single_flight.do("key", compute, load))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_interactive_call_does_not_wait_for_a_queued_batch_call(local_single_flight):
+    admitted = asyncio.Event()
+
+    async def queued_batch():
+        # Stands in for a batch generation waiting for an LLM slot
+        await admitted.wait()
+        return "batch"
+
+    async def interactive():
+        return "interactive"
+
+    async def load():
+        return None
+
+    with priority(BATCH):
+        batch = asyncio.create_task(local_single_flight.do("key", queued_batch, load))
+    await asyncio.sleep(0)
+
+    result = await asyncio.wait_for(local_single_flight.do("key", interactive, load), 1)
+
+    assert result == "interactive"
+    assert not batch.done()
+    admitted.set()
+    assert await batch == "batch"
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.models.chat import ConversationSummary, Message
+from app.services import summary_service
+from app.services.summary_service import ConversationSummarizer
+
+
+def make_history(count, start=datetime(2024, 1, 1)):
+    return [
+        Message(
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i} " + "word " * 20,
+            timestamp=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+
+def test_uncovered_skips_summarized_messages():
+    summarizer = ConversationSummarizer(llm_service=object())
+    history = make_history(10)
+    summary = ConversationSummary(summary="...", covered_until=history[3].timestamp)
+
+    assert summarizer.uncovered(history, summary) == history[4:]
+    assert summarizer.uncovered(history, None) == history
+
+
+def test_summaries_from_buffered_history_cover_database_history():
+    summarizer = ConversationSummarizer(llm_service=object())
+    # Postgres keeps microseconds; the Redis buffer keeps milliseconds
+    stored = make_history(6, start=datetime(2024, 1, 1, 12, 0, 0, 123456))
+    buffered = [
+        Message(
+            role=message.role,
+            content=message.content,
+            timestamp=message.timestamp.replace(microsecond=123000)
+        )
+        for message in stored
+    ]
+    summary = ConversationSummary(summary="...", covered_until=buffered[3].timestamp)
+
+    assert summarizer.uncovered(stored, summary) == stored[4:]
+    assert summarizer.uncovered(buffered, summary) == buffered[4:]
+
+
+def test_schedules_summary_only_past_threshold(monkeypatch):
+    scheduled = []
+
+    def fake_run_in_background(coro, name):
+        scheduled.append(name)
+        coro.close()
+
+    monkeypatch.setattr(summary_service, "run_in_background", fake_run_in_background)
+    summarizer = ConversationSummarizer(
+        llm_service=object(),
+        trigger_tokens=200,
+        keep_recent=4
+    )
+    session_id = "session"
+
+    assert not summarizer.schedule_if_needed(session_id, make_history(5), None)
+    assert summarizer.schedule_if_needed(session_id, make_history(30), None)
+    # A summary for this session is already running
+    assert not summarizer.schedule_if_needed(session_id, make_history(30), None)
+    assert scheduled == ["summarize:session"]